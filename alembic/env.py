@@ -11,7 +11,10 @@ from alembic import context
 # access to the values within the .ini file in use.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from infrastructure.orm import Base
+from infrastructure.database import SQLALCHEMY_DATABASE_URL
 config = context.config
+# The app's DATABASE_URL setting wins over sqlalchemy.url in alembic.ini
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.render_as_string(hide_password=False).replace("%", "%%"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
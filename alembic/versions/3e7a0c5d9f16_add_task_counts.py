@@ -0,0 +1,43 @@
+"""Add task counts
+
+Revision ID: 3e7a0c5d9f16
+Revises: 8b1d4f6a2c93
+Create Date: 2026-10-18 14:21:47.903415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a0c5d9f16'
+down_revision: Union[str, None] = '8b1d4f6a2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_counts',
+        sa.Column('goal_id', sa.Integer(), nullable=False),
+        sa.Column('account_key', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('max_due_date', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ),
+        sa.PrimaryKeyConstraint('goal_id', 'account_key', 'status')
+    )
+    # Count the existing tasks.
+    op.execute(
+        "INSERT INTO task_counts (goal_id, account_key, status, count, max_due_date) "
+        "SELECT goal_id, COALESCE(account_id, 0), status, COUNT(id), MAX(due_date) FROM tasks "
+        "WHERE goal_id IS NOT NULL AND status IS NOT NULL "
+        "GROUP BY goal_id, COALESCE(account_id, 0), status"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('task_counts')
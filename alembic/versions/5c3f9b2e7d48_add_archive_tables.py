@@ -0,0 +1,77 @@
+"""Add archive tables
+
+Revision ID: 5c3f9b2e7d48
+Revises: a4d2e87b1c05
+Create Date: 2026-10-18 16:10:04.275931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3f9b2e7d48'
+down_revision: Union[str, None] = 'a4d2e87b1c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_sqlite_autoincrement(enabled: bool) -> None:
+    """
+    Rebuilds tasks and task_logs with or without AUTOINCREMENT. Without it SQLite may hand out
+    the id of a deleted row again, which for archived tasks and logs is still in use.
+    PostgreSQL sequences never reuse ids, so there is nothing to do there.
+    """
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in ('tasks', 'task_logs'):
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': enabled}):
+            pass
+    # batch mode cannot reflect expression-based indexes, so the rebuilt tasks table lost this one
+    op.create_index('uq_tasks_goal_account_due', 'tasks',
+                    ['goal_id', sa.text('coalesce(account_id, 0)'), 'due_date'], unique=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('archived_tasks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('goal_id', sa.Integer(), nullable=True),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('due_date', sa.Date(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+        sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_tasks_goal_id', 'archived_tasks', ['goal_id'], unique=False)
+    op.create_table('archived_task_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('from_status', sa.String(), nullable=True),
+        sa.Column('to_status', sa.String(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('output_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['output_id'], ['script_outputs.id'], ),
+        sa.ForeignKeyConstraint(['task_id'], ['archived_tasks.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_task_logs_task_timestamp', 'archived_task_logs', ['task_id', 'timestamp'], unique=False)
+    _set_sqlite_autoincrement(True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived rows go back to the live tables first.
+    op.execute("INSERT INTO tasks (id, goal_id, account_id, due_date, status) "
+               "SELECT id, goal_id, account_id, due_date, status FROM archived_tasks")
+    op.execute("INSERT INTO task_logs (id, task_id, timestamp, from_status, to_status, notes, output_id) "
+               "SELECT id, task_id, timestamp, from_status, to_status, notes, output_id FROM archived_task_logs")
+    _set_sqlite_autoincrement(False)
+    op.drop_index('ix_archived_task_logs_task_timestamp', table_name='archived_task_logs')
+    op.drop_table('archived_task_logs')
+    op.drop_index('ix_archived_tasks_goal_id', table_name='archived_tasks')
+    op.drop_table('archived_tasks')
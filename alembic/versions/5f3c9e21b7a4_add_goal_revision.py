@@ -0,0 +1,30 @@
+"""Add goal revision
+
+Revision ID: 5f3c9e21b7a4
+Revises: d57b9180cd91
+Create Date: 2026-10-18 12:52:40.318906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3c9e21b7a4'
+down_revision: Union[str, None] = 'd57b9180cd91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,50 @@
+"""Add script jobs
+
+Revision ID: 7f1e3a9c2b64
+Revises: e2b7c4a9d031
+Create Date: 2026-10-18 19:02:37.640125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f1e3a9c2b64'
+down_revision: Union[str, None] = 'e2b7c4a9d031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('script_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('leased_by', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_script_jobs_status_priority_run_after', 'script_jobs', ['status', 'priority', 'run_after'], unique=False)
+    op.create_index('ix_script_jobs_status_lease_expires_at', 'script_jobs', ['status', 'lease_expires_at'], unique=False)
+    op.create_index('ix_script_jobs_task_status', 'script_jobs', ['task_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_script_jobs_task_status', table_name='script_jobs')
+    op.drop_index('ix_script_jobs_status_lease_expires_at', table_name='script_jobs')
+    op.drop_index('ix_script_jobs_status_priority_run_after', table_name='script_jobs')
+    op.drop_table('script_jobs')
@@ -0,0 +1,32 @@
+"""Add task list page indexes
+
+Revision ID: 8b1d4f6a2c93
+Revises: 5f3c9e21b7a4
+Create Date: 2026-10-18 13:34:12.507214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1d4f6a2c93'
+down_revision: Union[str, None] = '5f3c9e21b7a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_due_date_id', 'tasks', ['due_date', 'id'], unique=False)
+    op.create_index('ix_tasks_status_due_date_id', 'tasks', ['status', 'due_date', 'id'], unique=False)
+    op.create_index('ix_tasks_goal_due_date_id', 'tasks', ['goal_id', 'due_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_goal_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_status_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_due_date_id', table_name='tasks')
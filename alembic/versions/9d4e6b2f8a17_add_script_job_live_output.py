@@ -0,0 +1,32 @@
+"""Add script job live output
+
+Revision ID: 9d4e6b2f8a17
+Revises: 7f1e3a9c2b64
+Create Date: 2026-10-18 21:14:08.215390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e6b2f8a17'
+down_revision: Union[str, None] = '7f1e3a9c2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('script_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('live_output_json', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('live_lines', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('script_jobs', schema=None) as batch_op:
+        batch_op.drop_column('live_lines')
+        batch_op.drop_column('live_output_json')
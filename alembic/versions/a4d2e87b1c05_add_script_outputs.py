@@ -0,0 +1,41 @@
+"""Add script outputs
+
+Revision ID: a4d2e87b1c05
+Revises: 3e7a0c5d9f16
+Create Date: 2026-10-18 15:02:31.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2e87b1c05'
+down_revision: Union[str, None] = '3e7a0c5d9f16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('script_outputs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('original_size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('task_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('output_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_task_logs_output_id_script_outputs', 'script_outputs', ['output_id'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('task_logs', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_task_logs_output_id_script_outputs', type_='foreignkey')
+        batch_op.drop_column('output_id')
+
+    op.drop_table('script_outputs')
@@ -0,0 +1,46 @@
+"""Drop goal revision counter
+
+Revision ID: a9d3f6c2e184
+Revises: f4c7a2e9b610
+Create Date: 2026-10-19 00:21:07.834512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3f6c2e184'
+down_revision: Union[str, None] = 'f4c7a2e9b610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_sqlite_autoincrement(enabled: bool) -> None:
+    """
+    Rebuilds goals with or without AUTOINCREMENT. Without it SQLite may hand out the id of a
+    deleted goal again, and the new goal would start at a revision cached for the old one.
+    PostgreSQL sequences never reuse ids, so there is nothing to do there.
+    """
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table('goals', recreate='always', table_kwargs={'sqlite_autoincrement': enabled}):
+        pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # goal revisions are incremented in place again, per goal
+    op.execute("DELETE FROM data_versions WHERE name = 'goal_revision'")
+    _set_sqlite_autoincrement(True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _set_sqlite_autoincrement(False)
+    op.execute(
+        "INSERT INTO data_versions (name, version) "
+        "SELECT 'goal_revision', COALESCE(MAX(revision), 0) FROM goals"
+    )
@@ -0,0 +1,46 @@
+"""Add unique index on task goal, account and due date
+
+Revision ID: aacf1bdf7818
+Revises: e26b90e8e8d3
+Create Date: 2026-10-18 10:03:17.552904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aacf1bdf7818'
+down_revision: Union[str, None] = 'e26b90e8e8d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Merge existing duplicates first. The kept task is the one that moved furthest
+    # (anything but Waiting), then the oldest; logs of the dropped ones move over to it.
+    conn = op.get_bind()
+    tasks = conn.execute(sa.text(
+        "SELECT id, goal_id, COALESCE(account_id, 0), due_date FROM tasks "
+        "ORDER BY goal_id, COALESCE(account_id, 0), due_date, status = 'Waiting', id"
+    )).fetchall()
+    kept = {}
+    for task_id, goal_id, account_key, due_date in tasks:
+        key = (goal_id, account_key, due_date)
+        if key not in kept:
+            kept[key] = task_id
+            continue
+        conn.execute(sa.text("UPDATE task_logs SET task_id = :kept WHERE task_id = :dup"),
+                     {"kept": kept[key], "dup": task_id})
+        conn.execute(sa.text("DELETE FROM tasks WHERE id = :dup"), {"dup": task_id})
+
+    op.create_index('uq_tasks_goal_account_due', 'tasks',
+                    ['goal_id', sa.text('coalesce(account_id, 0)'), 'due_date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_tasks_goal_account_due', table_name='tasks')
@@ -0,0 +1,37 @@
+"""Add unique pending script job index
+
+Revision ID: b6c1e0d4f853
+Revises: 9d4e6b2f8a17
+Create Date: 2026-10-18 22:41:53.907214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c1e0d4f853'
+down_revision: Union[str, None] = '9d4e6b2f8a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # duplicates queued before the index existed: all but the oldest pending job are dead-lettered
+    op.execute(
+        "UPDATE script_jobs SET status = 'dead', leased_by = NULL, lease_expires_at = NULL, "
+        "last_error = 'Duplicate of an earlier pending job.' "
+        "WHERE status IN ('queued', 'running') AND id NOT IN ("
+        "SELECT MIN(id) FROM script_jobs WHERE status IN ('queued', 'running') GROUP BY task_id, kind)"
+    )
+    pending = sa.text("status IN ('queued', 'running')")
+    op.create_index('ux_script_jobs_pending_task_kind', 'script_jobs', ['task_id', 'kind'], unique=True,
+                    sqlite_where=pending, postgresql_where=pending)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_script_jobs_pending_task_kind', table_name='script_jobs')
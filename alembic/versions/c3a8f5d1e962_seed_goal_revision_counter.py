@@ -0,0 +1,32 @@
+"""Seed goal revision counter
+
+Revision ID: c3a8f5d1e962
+Revises: b6c1e0d4f853
+Create Date: 2026-10-18 23:12:40.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8f5d1e962'
+down_revision: Union[str, None] = 'b6c1e0d4f853'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # revisions now come from one counter for all goals; it starts above every revision given so far
+    op.execute(
+        "INSERT INTO data_versions (name, version) "
+        "SELECT 'goal_revision', COALESCE(MAX(revision), 0) FROM goals"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM data_versions WHERE name = 'goal_revision'")
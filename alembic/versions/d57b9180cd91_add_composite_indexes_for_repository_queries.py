@@ -0,0 +1,34 @@
+"""Add composite indexes for repository queries
+
+Revision ID: d57b9180cd91
+Revises: 124eb1bde1d7
+Create Date: 2026-10-18 11:26:08.714362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd57b9180cd91'
+down_revision: Union[str, None] = '124eb1bde1d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_goal_account_due', 'tasks', ['goal_id', 'account_id', 'due_date'], unique=False)
+    op.create_index('ix_tasks_status_account_due', 'tasks', ['status', 'account_id', 'due_date'], unique=False)
+    op.create_index('ix_accounts_platform_id', 'accounts', ['platform_id'], unique=False)
+    op.create_index('ix_task_logs_task_timestamp', 'task_logs', ['task_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_logs_task_timestamp', table_name='task_logs')
+    op.drop_index('ix_accounts_platform_id', table_name='accounts')
+    op.drop_index('ix_tasks_status_account_due', table_name='tasks')
+    op.drop_index('ix_tasks_goal_account_due', table_name='tasks')
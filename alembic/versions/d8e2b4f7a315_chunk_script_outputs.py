@@ -0,0 +1,70 @@
+"""Chunk script outputs
+
+Revision ID: d8e2b4f7a315
+Revises: c3a8f5d1e962
+Create Date: 2026-10-18 23:48:05.271940
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e2b4f7a315'
+down_revision: Union[str, None] = 'c3a8f5d1e962'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# OUTPUT_CHUNK_CHARS of infrastructure/script_outputs.py
+CHUNK_CHARS = 65536
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('script_outputs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('chunks_json', sa.Text(), nullable=True))
+
+    # every stored output, compressed whole so far, is recompressed in chunks
+    bind = op.get_bind()
+    outputs = sa.table('script_outputs', sa.column('id', sa.Integer), sa.column('data', sa.LargeBinary),
+                       sa.column('chunks_json', sa.Text))
+    for output_id, in bind.execute(sa.select(outputs.c.id)).fetchall():
+        data = bind.execute(sa.select(outputs.c.data).where(outputs.c.id == output_id)).scalar()
+        text = zlib.decompress(data).decode('utf-8')
+        pieces, chunks, byte_end = [], [], 0
+        for start in range(0, len(text), CHUNK_CHARS):
+            piece = zlib.compress(text[start:start + CHUNK_CHARS].encode('utf-8'))
+            pieces.append(piece)
+            byte_end += len(piece)
+            chunks.append([min(start + CHUNK_CHARS, len(text)), byte_end])
+        bind.execute(outputs.update().where(outputs.c.id == output_id).values(
+            data=b''.join(pieces), chunks_json=json.dumps(chunks)
+        ))
+
+    with op.batch_alter_table('script_outputs', schema=None) as batch_op:
+        batch_op.alter_column('chunks_json', existing_type=sa.Text(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    outputs = sa.table('script_outputs', sa.column('id', sa.Integer), sa.column('data', sa.LargeBinary),
+                       sa.column('chunks_json', sa.Text))
+    for output_id, in bind.execute(sa.select(outputs.c.id)).fetchall():
+        data, chunks_json = bind.execute(
+            sa.select(outputs.c.data, outputs.c.chunks_json).where(outputs.c.id == output_id)
+        ).first()
+        text, byte_start = '', 0
+        for _, byte_end in json.loads(chunks_json):
+            text += zlib.decompress(data[byte_start:byte_end]).decode('utf-8')
+            byte_start = byte_end
+        bind.execute(outputs.update().where(outputs.c.id == output_id).values(
+            data=zlib.compress(text.encode('utf-8'))
+        ))
+
+    with op.batch_alter_table('script_outputs', schema=None) as batch_op:
+        batch_op.drop_column('chunks_json')
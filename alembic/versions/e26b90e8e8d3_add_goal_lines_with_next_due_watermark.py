@@ -0,0 +1,66 @@
+"""Add goal lines with next due watermark
+
+Revision ID: e26b90e8e8d3
+Revises: cb8a12a85b44
+Create Date: 2026-10-18 09:12:41.305118
+
+"""
+import json
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e26b90e8e8d3'
+down_revision: Union[str, None] = 'cb8a12a85b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    goal_lines = op.create_table('goal_lines',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('goal_id', sa.Integer(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('next_due_date', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('goal_lines', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_goal_lines_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_goal_lines_goal_id'), ['goal_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_goal_lines_next_due_date'), ['next_due_date'], unique=False)
+
+    # Backfill one line per account (or one for platform-level and round-robin goals).
+    # Every active line starts out due today, so the first generation run after the
+    # upgrade looks at each goal once and writes its exact next due date.
+    goals = op.get_bind().execute(sa.text(
+        "SELECT id, account_ids_json, task_distribution_strategy, status FROM goals"
+    )).fetchall()
+    rows = []
+    for goal_id, account_ids_json, distribution, status in goals:
+        account_ids = json.loads(account_ids_json) if isinstance(account_ids_json, str) else account_ids_json
+        if not account_ids or distribution == 'all':
+            lines = account_ids or [None]
+        elif distribution == 'round_robin':
+            lines = [None]
+        else:
+            lines = []
+        next_due = date.today() if status == 'Active' else None
+        rows.extend({'goal_id': goal_id, 'account_id': acc_id, 'next_due_date': next_due} for acc_id in lines)
+    if rows:
+        op.bulk_insert(goal_lines, rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('goal_lines', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_goal_lines_next_due_date'))
+        batch_op.drop_index(batch_op.f('ix_goal_lines_goal_id'))
+        batch_op.drop_index(batch_op.f('ix_goal_lines_id'))
+
+    op.drop_table('goal_lines')
@@ -0,0 +1,32 @@
+"""Add task count revisions
+
+Revision ID: f4c7a2e9b610
+Revises: d8e2b4f7a315
+Create Date: 2026-10-18 23:58:41.506213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c7a2e9b610'
+down_revision: Union[str, None] = 'd8e2b4f7a315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('task_counts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+    # commits no longer bump the "data" version
+    op.execute("DELETE FROM data_versions WHERE name = 'data'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('task_counts', schema=None) as batch_op:
+        batch_op.drop_column('revision')
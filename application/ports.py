@@ -1,5 +1,7 @@
-from typing import Protocol, List, Optional, Dict
+from datetime import date, datetime
+from typing import Callable, Protocol, List, Optional, Dict, Set, Tuple, TypeVar
 from domain.models import Platform, Goal, Task, Account, TaskLog
+from .read_models import GoalOption, ScriptJob, ScriptJobOutput, ScriptOutputRange, TaskListItem
 
 # --- Basically all the ports for persistence etc ---
 class IPlatformRepository(Protocol):
@@ -11,24 +13,94 @@ class IAccountRepository(Protocol):
     def save(self, account: Account) -> None: ...
     def get_by_id(self, account_id: int) -> Optional[Account]: ...
     def list_by_platform(self, platform_id: int) -> List[Account]: ...
+    def list_all(self) -> List[Account]: ...
     def delete(self, account_id: int) -> None: ...
     def get_dashboard_summary(self) -> List[Dict]: ...
 
 class ITaskLogRepository(Protocol):
     def save(self, log: TaskLog) -> None: ...
     def list_by_task_id(self, task_id: int) -> List[TaskLog]: ...
+    def list_archived_by_task_id(self, task_id: int) -> List[TaskLog]: ...
+
+class IScriptOutputRepository(Protocol):
+    def save(self, output: str) -> int: ...
+    def get_range(self, output_id: int, offset: int, limit: int) -> Optional[ScriptOutputRange]: ...
+
+class IScriptJobRepository(Protocol):
+    def enqueue(self, task_id: int, kind: str, priority: int, max_attempts: int) -> ScriptJob: ...
+    def get_by_id(self, job_id: int) -> Optional[ScriptJob]: ...
+    def find_pending(self, task_id: int, kind: str) -> Optional[ScriptJob]: ...
+    def list_by_task_id(self, task_id: int) -> List[ScriptJob]: ...
+    def count_pending(self) -> int: ...
+    # Workers: a job is leased to one worker, and only the lease holder can finish it
+    def lease(self, worker: str, limit: int, lease_seconds: int) -> List[ScriptJob]: ...
+    def finish(self, job_id: int, worker: str) -> bool: ...
+    def retry(self, job_id: int, worker: str, error: str, run_after: datetime) -> bool: ...
+    def bury(self, job_id: int, worker: str, error: str) -> bool: ...
+    # The output tail of a running job, written by its worker
+    def get_live_output(self, job_id: int) -> Optional[ScriptJobOutput]: ...
+    def set_live_output(self, job_id: int, worker: str, line_count: int, lines: List[Tuple[str, str]]) -> bool: ...
 
 class IGoalRepository(Protocol):
     def save(self, goal: Goal) -> None: ...
     def get_by_id(self, goal_id: int) -> Optional[Goal]: ...
     def list_all(self) -> List[Goal]: ...
+    def list_options(self) -> List[GoalOption]: ...
     def update(self, goal: Goal) -> None: ...
     def delete(self, goal_id: int) -> None: ...
+    # Moves a batch of the goal's archived tasks back; 0 once none is left
+    def restore_archived(self, goal_id: int) -> int: ...
+    # Next-due watermark of every (goal_id, account_id) line
+    def list_due(self, on: date) -> List[Tuple[Goal, List[Optional[int]]]]: ...
+    def set_next_due_dates(self, next_due: Dict[Tuple[int, Optional[int]], Optional[date]]) -> None: ...
 
 class ITaskRepository(Protocol):
     def save(self, task: Task) -> None: ...
     def get_by_id(self, task_id: int) -> Optional[Task]: ...
+    def get_archived(self, task_id: int) -> Optional[Task]: ...
     def list_all(self) -> List[Task]: ...
+    def list_page(self, status: Optional[str] = None, platform_id: Optional[int] = None,
+                  account_id: Optional[int] = None, goal_id: Optional[int] = None,
+                  due_from: Optional[date] = None, due_to: Optional[date] = None,
+                  after: Optional[Tuple[date, int]] = None, limit: int = 50) -> List[TaskListItem]: ...
     def find_latest_for_goal(self, goal_id: int, account_id: Optional[int]) -> Optional[Task]: ...
     def find_latest_for_goal_any_account(self, goal_id: int) -> Optional[Task]: ...
     def count_completed_for_goal(self, goal_id: int, account_ids: Optional[List[int]]) -> int: ...
+    # Status changes: the task's own columns only, then a compare-and-set UPDATE with its log entry
+    def get_for_transition(self, task_id: int) -> Optional[Task]: ...
+    def transition(self, log: TaskLog) -> bool: ...
+    def get_many_for_transition(self, task_ids: List[int]) -> Dict[int, Task]: ...
+    def transition_all(self, logs: List[TaskLog]) -> Set[int]: ...
+    # Set-based variants for batch generation, keyed by (goal_id, account_id)
+    def save_all(self, tasks: List[Task]) -> None: ...
+    def find_latest_by_line(self, goal_ids: List[int]) -> Dict[Tuple[int, Optional[int]], Task]: ...
+    def count_completed_by_line(self, goal_ids: List[int]) -> Dict[Tuple[int, Optional[int]], int]: ...
+
+
+# --- Transactions ---
+class IUnitOfWork(Protocol):
+    """
+    The repositories of one transaction. Repositories never commit; a use case that
+    writes commits once, when all of its changes are made.
+    """
+    platforms: IPlatformRepository
+    accounts: IAccountRepository
+    goals: IGoalRepository
+    tasks: ITaskRepository
+    logs: ITaskLogRepository
+    outputs: IScriptOutputRepository
+    jobs: IScriptJobRepository
+    # Platforms and accounts are read from a cache; a use case that changes them says so before committing
+    def catalog_changed(self) -> None: ...
+    def commit(self) -> None: ...
+    def rollback(self) -> None: ...
+
+T = TypeVar("T")
+
+class IUnitOfWorkRunner(Protocol):
+    """
+    Runs a function with the unit of work of a new session, and closes the session after.
+    Lets a use case that awaits something slow (a script) do its reads and writes in short
+    transactions, without holding a connection or a thread while it waits.
+    """
+    async def __call__(self, work: Callable[[IUnitOfWork], T]) -> T: ...
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# --- Flat, display-only views built straight from column projections ---
+class TaskListItem(NamedTuple):
+    """One row of the task list with everything the page shows, and nothing it does not."""
+    id: int
+    goal_id: Optional[int]
+    due_date: date
+    status: str
+    account_id: Optional[int]
+    account_username: str  # "Platform-Level" for tasks without an account
+    platform_name: str
+    platform_color: Optional[str]
+    goal_description: Optional[str]
+    goal_context: str
+    execution_strategy: Optional[str]  # strategy names, e.g. "Manual" or "CustomScript"
+    check_strategy: Optional[str]
+
+
+class GoalOption(NamedTuple):
+    """A goal as a choice of the task list's goal filter."""
+    id: int
+    label: str  # its description, or its policy's context string when it has none
+
+
+class TransitionResult(NamedTuple):
+    """Outcome of one task of a bulk status change."""
+    task_id: int
+    ok: bool
+    status: Optional[str]  # the task's status afterwards, when known
+    error: Optional[str] = None
+
+
+class ScriptOutputRange(NamedTuple):
+    """A slice of a stored script output, in characters; next_offset is None at the end."""
+    output_id: int
+    offset: int
+    text: str
+    next_offset: Optional[int]
+    size: int
+    original_size: int  # more than size when the middle of the output was cut
+
+
+class ScriptRun(NamedTuple):
+    """What a script use case needs to run a task's script, read before the run starts."""
+    task_id: int
+    script_content: str
+    env_vars: Dict[str, str]  # the strategy's variables plus TASK_CONTEXT
+
+
+class ScriptJob(NamedTuple):
+    """A queued script run of a task, and where it stands."""
+    id: int
+    task_id: int
+    kind: str  # "execution" or "check"
+    priority: int
+    status: str  # "queued", "running", "done" or "dead"
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+
+class ScriptJobOutput(NamedTuple):
+    """The last lines a running script job printed; lines[i] is its line number first_line + i."""
+    job_id: int
+    status: str
+    attempts: int
+    first_line: int
+    lines: List[Tuple[str, str]]  # (stream, line), the stream being "stdout" or "stderr"
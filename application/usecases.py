@@ -1,27 +1,37 @@
 import json
 from datetime import date, datetime
-from typing import Optional
+from typing import Callable, List, Optional, Set, Tuple
 from domain.models import Platform, Goal, Task, Account, TaskLog
 from domain.policies import FixedInterval, DeadlineDistribution, StateBasedGoal
-from domain.states import InvalidTransition
-from .ports import IPlatformRepository, IGoalRepository, ITaskRepository, IAccountRepository, ITaskLogRepository
+from domain.states import InvalidTransition, ConcurrentTransition
+from .ports import (
+    IPlatformRepository, IGoalRepository, ITaskRepository, IAccountRepository, ITaskLogRepository,
+    IScriptOutputRepository, IScriptJobRepository, IUnitOfWork, IUnitOfWorkRunner
+)
+from .read_models import ScriptJob, ScriptJobOutput, ScriptOutputRange, ScriptRun, TransitionResult
 from domain.strategies import ManualExecution, ScriptExecution, ManualCheck, ScriptCheck
-from infrastructure.script_runner import run_script
+from infrastructure.script_runner import run_script, run_script_async
+
+# Use cases that write take a unit of work and commit it once, at the end of execute().
 
 class CreatePlatformUseCase:
-    def __init__(self, repo: IPlatformRepository): self.repo = repo
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
     def execute(self, name: str, config: Optional[dict] = None):
-        self.repo.save(Platform(id=None, name=name, config=config))
+        self.uow.platforms.save(Platform(id=None, name=name, config=config))
+        self.uow.catalog_changed()
+        self.uow.commit()
 
 class UpdatePlatformUseCase:
-    def __init__(self, repo: IPlatformRepository): self.repo = repo
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
     def execute(self, platform_id: int, name: str, config: dict):
-        platform = self.repo.get_by_id(platform_id)
+        platform = self.uow.platforms.get_by_id(platform_id)
         if not platform:
             raise ValueError("Platform not found")
         platform.name = name
         platform.config = config
-        self.repo.save(platform)
+        self.uow.platforms.save(platform)
+        self.uow.catalog_changed()
+        self.uow.commit()
 
 class ListPlatformsUseCase:
     def __init__(self, repo: IPlatformRepository): self.repo = repo
@@ -34,17 +44,26 @@ class GetPlatformUseCase:
 
 # --- Account Use Cases ---
 class CreateAccountUseCase:
-    def __init__(self, repo: IAccountRepository): self.repo = repo
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
     def execute(self, platform_id: int, username: str, notes: str):
-        self.repo.save(Account(id=None, platform_id=platform_id, username=username, notes=notes))
+        self.uow.accounts.save(Account(id=None, platform_id=platform_id, username=username, notes=notes))
+        self.uow.catalog_changed()
+        self.uow.commit()
 
 class ListAccountsByPlatformUseCase:
     def __init__(self, repo: IAccountRepository): self.repo = repo
     def execute(self, platform_id: int): return self.repo.list_by_platform(platform_id)
 
-class DeleteAccountUseCase:
+class ListAccountsUseCase:
     def __init__(self, repo: IAccountRepository): self.repo = repo
-    def execute(self, account_id: int): self.repo.delete(account_id)
+    def execute(self): return self.repo.list_all()
+
+class DeleteAccountUseCase:
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
+    def execute(self, account_id: int):
+        self.uow.accounts.delete(account_id)
+        self.uow.catalog_changed()
+        self.uow.commit()
 
 class GetDashboardDataUseCase:
     def __init__(self, repo: IAccountRepository): self.repo = repo
@@ -53,7 +72,7 @@ class GetDashboardDataUseCase:
 
 # --- Goal & Task Use Cases ---
 class CreateGoalUseCase:
-    def __init__(self, repo: IGoalRepository): self.repo = repo
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
     def execute(self, data: dict):
         print(data)
         policy_type = data.pop("policy_type")
@@ -89,22 +108,29 @@ class CreateGoalUseCase:
                     catchup_strategy=data.get("catchup_strategy", "all"),
                     execution_strategy=exec_strategy,
                     check_strategy=check_strategy)
-        self.repo.save(goal)
+        self.uow.goals.save(goal)
+        self.uow.commit()
 
 class ListGoalsUseCase:
     def __init__(self, repo: IGoalRepository): self.repo = repo
     def execute(self): return self.repo.list_all()
 
+class ListGoalOptionsUseCase:
+    def __init__(self, repo: IGoalRepository): self.repo = repo
+    def execute(self): return self.repo.list_options()
+
 class GetGoalUseCase:
     def __init__(self, repo: IGoalRepository): self.repo = repo
     def execute(self, goal_id: int): return self.repo.get_by_id(goal_id)
 
 class DeleteGoalUseCase:
-    def __init__(self, repo: IGoalRepository): self.repo = repo
-    def execute(self, goal_id: int): self.repo.delete(goal_id)
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
+    def execute(self, goal_id: int):
+        self.uow.goals.delete(goal_id)
+        self.uow.commit()
 
 class UpdateGoalUseCase:
-    def __init__(self, repo: IGoalRepository): self.repo = repo
+    def __init__(self, uow: IUnitOfWork): self.uow = uow
     def execute(self, goal_id: int, data: dict):
         policy_type = data.pop("policy_type")
         policy = None
@@ -141,183 +167,337 @@ class UpdateGoalUseCase:
                     execution_strategy=exec_strategy,
                     check_strategy=check_strategy)
 
-        self.repo.update(goal)
+        previous = self.uow.goals.get_by_id(goal_id)
+        if previous and goal.needs_task_history(previous):
+            # its archived tasks come back first, one short transaction per batch
+            while self.uow.goals.restore_archived(goal_id):
+                self.uow.commit()
+        self.uow.goals.update(goal)
+        self.uow.commit()
 
 class GenerateDueTasksUseCase:
-    def __init__(self, goal_repo: IGoalRepository, task_repo: ITaskRepository, account_repo: IAccountRepository):
-        self.goal_repo = goal_repo
-        self.task_repo = task_repo
-        self.account_repo = account_repo
-
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+        self.goal_repo = uow.goals
+        self.task_repo = uow.tasks
 
-    def execute(self):
-        active_goals = [g for g in self.goal_repo.list_all() if g.status == "Active"]
+    def execute(self, batch: bool = False):
+        """
+        Generates the due tasks of every goal line whose next-due watermark has been reached,
+        then moves the watermark of each of those lines to its next due date.
 
-        for goal in active_goals:
-            if goal.end_date and goal.end_date < date.today():
-                continue
+        With batch=True the latest task and completed count of every due line are
+        read up front with grouped queries and all new tasks are written with a single
+        bulk insert, instead of a few queries and one insert per line.
+        Both modes produce exactly the same tasks, and commit once.
+        """
+        today = date.today()
+        due_goals = self.goal_repo.list_due(today)
+
+        next_due = {}
+        live_goals = []
+        for goal, lines in due_goals:
+            if goal.end_date and goal.end_date < today:
+                # The goal is over, so its lines will not be due again.
+                next_due.update({(goal.id, acc_id): None for acc_id in lines})
+            else:
+                live_goals.append((goal, lines))
+
+        if not batch:
+            for goal, lines in live_goals:
+                new_tasks = self._tasks_for_goal(
+                    goal, lines, next_due,
+                    self.task_repo.find_latest_for_goal,
+                    self.task_repo.find_latest_for_goal_any_account,
+                    self.task_repo.count_completed_for_goal,
+                )
+                for task in new_tasks:
+                    self.task_repo.save(task)
+            self.goal_repo.set_next_due_dates(next_due)
+            self.uow.commit()
+            return
 
-            if not goal.account_ids or goal.task_distribution_strategy == "all":
-                target_account_ids = goal.account_ids if goal.account_ids else [None]
-                for acc_id in target_account_ids:
-                    latest_task = self.task_repo.find_latest_for_goal(goal.id, acc_id)
-                    last_task_date = latest_task.due_date if latest_task else None
-
-                    num_completed = 0
-                    if isinstance(goal.policy, DeadlineDistribution):
-                        # Count completed for the specific account line
-                        num_completed = self.task_repo.count_completed_for_goal(goal.id, [acc_id] if acc_id else None)
-
-                    new_tasks = goal.generate_tasks(last_task_date=last_task_date, num_completed=num_completed)
-                    for task in new_tasks:
-                        task.account_id = acc_id
-                        self.task_repo.save(task)
-
-            # "round-robin" logic
-            elif goal.task_distribution_strategy == "round_robin":
-                latest_task = self.task_repo.find_latest_for_goal_any_account(goal.id)
+        goal_ids = [goal.id for goal, _ in live_goals]
+        latest_by_line = self.task_repo.find_latest_by_line(goal_ids)
+        completed_by_line = self.task_repo.count_completed_by_line(goal_ids)
+
+        latest_by_goal = {}
+        for (goal_id, _), task in latest_by_line.items():
+            current = latest_by_goal.get(goal_id)
+            if current is None or (task.due_date, task.id) > (current.due_date, current.id):
+                latest_by_goal[goal_id] = task
+
+        def find_latest(goal_id, account_id):
+            return latest_by_line.get((goal_id, account_id))
+
+        def count_completed(goal_id, account_ids):
+            if account_ids is None:
+                return completed_by_line.get((goal_id, None), 0)
+            return sum(completed_by_line.get((goal_id, acc_id), 0) for acc_id in set(account_ids))
+
+        new_tasks = []
+        for goal, lines in live_goals:
+            new_tasks.extend(self._tasks_for_goal(goal, lines, next_due, find_latest, latest_by_goal.get, count_completed))
+        if new_tasks:
+            self.task_repo.save_all(new_tasks)
+        self.goal_repo.set_next_due_dates(next_due)
+        self.uow.commit()
+
+    def _tasks_for_goal(self, goal: Goal, lines: List[Optional[int]], next_due: dict,
+                        find_latest, find_latest_any_account, count_completed) -> List[Task]:
+        """
+        Works out the new tasks of the given lines of one goal, with the account already assigned,
+        and records the next due date of each line in next_due.
+        """
+        new_tasks = []
+        if not goal.account_ids or goal.task_distribution_strategy == "all":
+            target_account_ids = [acc_id for acc_id in goal.schedule_lines() if acc_id in lines]
+            for acc_id in target_account_ids:
+                latest_task = find_latest(goal.id, acc_id)
                 last_task_date = latest_task.due_date if latest_task else None
 
-                next_account_id = goal.account_ids[0] # Default to the first account
-                if latest_task and latest_task.account_id in goal.account_ids:
-                    try:
-                        last_index = goal.account_ids.index(latest_task.account_id)
-                        next_index = (last_index + 1) % len(goal.account_ids)
-                        next_account_id = goal.account_ids[next_index]
-                    except ValueError:
-                        pass
-
                 num_completed = 0
                 if isinstance(goal.policy, DeadlineDistribution):
-                    # for round-robin deadline the count is for the whole group
-                    num_completed = self.task_repo.count_completed_for_goal(goal.id, goal.account_ids)
+                    # Count completed for the specific account line
+                    num_completed = count_completed(goal.id, [acc_id] if acc_id else None)
+
+                line_tasks = goal.generate_tasks(last_task_date=last_task_date, num_completed=num_completed)
+                for task in line_tasks:
+                    task.account_id = acc_id
+                    new_tasks.append(task)
+                next_due[(goal.id, acc_id)] = self._next_due_date(goal, last_task_date, num_completed, line_tasks)
+
+        # "round-robin" logic
+        elif goal.task_distribution_strategy == "round_robin":
+            latest_task = find_latest_any_account(goal.id)
+            last_task_date = latest_task.due_date if latest_task else None
+
+            next_account_id = goal.account_ids[0] # Default to the first account
+            if latest_task and latest_task.account_id in goal.account_ids:
+                try:
+                    last_index = goal.account_ids.index(latest_task.account_id)
+                    next_index = (last_index + 1) % len(goal.account_ids)
+                    next_account_id = goal.account_ids[next_index]
+                except ValueError:
+                    pass
+
+            num_completed = 0
+            if isinstance(goal.policy, DeadlineDistribution):
+                # for round-robin deadline the count is for the whole group
+                num_completed = count_completed(goal.id, goal.account_ids)
+
+            line_tasks = goal.generate_tasks(last_task_date=last_task_date, num_completed=num_completed)
+            for task in line_tasks:
+                task.account_id = next_account_id
+                new_tasks.append(task)
+            next_due[(goal.id, None)] = self._next_due_date(goal, last_task_date, num_completed, line_tasks)
+        return new_tasks
+
+    @staticmethod
+    def _next_due_date(goal: Goal, last_task_date: Optional[date], num_completed: int, new_tasks: List[Task]) -> Optional[date]:
+        if new_tasks:
+            last_task_date = new_tasks[-1].due_date
+        # The new tasks are not completed yet, so they are not counted here.
+        return goal.next_due_date(last_task_date, num_completed)
 
-                new_tasks = goal.generate_tasks(last_task_date=last_task_date, num_completed=num_completed)
-                for task in new_tasks:
-                    task.account_id = next_account_id
-                    self.task_repo.save(task)
 class ListTasksUseCase:
     def __init__(self, repo: ITaskRepository): self.repo = repo
     def execute(self): return self.repo.list_all()
 
+class ListTasksPageUseCase:
+    """One page of task list rows and the (due_date, id) cursor of the next page, None on the last page."""
+    def __init__(self, repo: ITaskRepository): self.repo = repo
+    def execute(self, filters: dict, after: Optional[Tuple[date, int]] = None, page_size: int = 50) -> dict:
+        # one extra row tells whether there is a next page
+        tasks = self.repo.list_page(**filters, after=after, limit=page_size + 1)
+        next_cursor = None
+        if len(tasks) > page_size:
+            tasks = tasks[:page_size]
+            next_cursor = (tasks[-1].due_date, tasks[-1].id)
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+def record_transition(uow: IUnitOfWork, log: TaskLog):
+    """
+    Stores a status change and its log entry. Fails if another writer changed the task
+    after it was read, so two racing writers can never both apply a transition.
+    """
+    if not uow.tasks.transition(log):
+        raise ConcurrentTransition(f"Task {log.task_id} is no longer '{log.from_status}'")
+
 class ProcessTaskCompletionUseCase:
     """
     Completes a task and then checks if this completion also completes the parent goal.
     """
-    def __init__(self, task_repo: ITaskRepository, log_repo: ITaskLogRepository, goal_repo: IGoalRepository):
-        self.task_repo = task_repo
-        self.log_repo = log_repo
-        self.goal_repo = goal_repo
-        self.mark_done_uc = MarkTaskDoneUseCase(task_repo, log_repo)
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+        self.mark_done_uc = MarkTaskDoneUseCase(uow)
 
-    def execute(self, task_id: int, notes: Optional[str] = None, complete_parent_goal: bool = True):
+    def execute(self, task_id: int, notes: Optional[str] = None, complete_parent_goal: bool = True,
+                output_id: Optional[int] = None):
         """
-        Completes a task and conditionally completes the parent goal.
+        Completes a task and conditionally completes the parent goal, in one transaction.
         """
         # 1. Mark the task as done
-        self.mark_done_uc.execute(task_id, notes=notes)
-
-        task = self.task_repo.get_by_id(task_id)
-        if not task: return
-
-        goal = self.goal_repo.get_by_id(task.goal_id)
-        if not goal: return
+        task = self.mark_done_uc.complete(task_id, notes=notes, output_id=output_id)
 
         # 2. Conditionally check if the parent goal should be completed
+        goal = self.uow.goals.get_by_id(task.goal_id)
+        if goal:
+            self._complete_goal(task, goal, complete_parent_goal)
+        self.uow.commit()
+
+    def _complete_goal(self, task: Task, goal: Goal, complete_parent_goal: bool):
         if not complete_parent_goal:
             print(f"Task {task.id} completed, but parent goal {goal.id} will remain active as requested.")
             return
 
         if isinstance(goal.policy, StateBasedGoal):
             goal.status = "Completed"
-            self.goal_repo.update(goal)
+            self.uow.goals.update(goal)
             print(f"Goal {goal.id} has been completed because its state-based task was achieved.")
 
 class MarkTaskDoneUseCase:
-    # Now requires both a task repo and a log repo
-    def __init__(self, task_repo: ITaskRepository, log_repo: ITaskLogRepository):
-        self.task_repo = task_repo
-        self.log_repo = log_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
 
     def execute(self, task_id: int, notes: Optional[str] = None):
-        task = self.task_repo.get_by_id(task_id)
+        self.complete(task_id, notes=notes)
+        self.uow.commit()
+
+    def complete(self, task_id: int, notes: Optional[str] = None, output_id: Optional[int] = None) -> Task:
+        """Completes the task and logs it without committing, for use cases that complete more."""
+        task = self.uow.tasks.get_for_transition(task_id)
         if not task:
             raise ValueError("Task not found")
 
         old_status = task.status.name
         task.complete() # this internally changes the status so we are good
-        self.task_repo.save(task)
 
-        # Create the log entry
+        # Store the change together with its log entry
         log_entry = TaskLog(
             id=None,
             task_id=task.id,
             timestamp=datetime.utcnow(),
             from_status=old_status,
             to_status=task.status.name,
-            notes=notes
+            notes=notes,
+            output_id=output_id
         )
-        self.log_repo.save(log_entry)
+        record_transition(self.uow, log_entry)
+        return task
 
 class StartTaskUseCase:
-    def __init__(self, task_repo: ITaskRepository, log_repo: ITaskLogRepository):
-        self.task_repo = task_repo
-        self.log_repo = log_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
 
     def execute(self, task_id: int):
-        task = self.task_repo.get_by_id(task_id)
+        task = self.uow.tasks.get_for_transition(task_id)
         if not task:
             raise ValueError("Task not found")
 
         old_status = task.status.name
         task.start()
-        self.task_repo.save(task)
 
         log_entry = TaskLog(
             id=None, task_id=task.id, timestamp=datetime.utcnow(),
             from_status=old_status, to_status=task.status.name
         )
-        self.log_repo.save(log_entry)
+        record_transition(self.uow, log_entry)
+        self.uow.commit()
 
 class SkipTaskUseCase:
     """Use case for a user to skip a task."""
-    def __init__(self, task_repo: ITaskRepository, log_repo: ITaskLogRepository):
-        self.task_repo = task_repo
-        self.log_repo = log_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
 
     def execute(self, task_id: int, notes: Optional[str] = None):
-        task = self.task_repo.get_by_id(task_id)
+        task = self.uow.tasks.get_for_transition(task_id)
         if not task:
             raise ValueError("Task not found")
 
         old_status = task.status.name
         task.skip()
-        print(task) # for debug
-        self.task_repo.save(task)
 
         log_entry = TaskLog(id=None, task_id=task.id, timestamp=datetime.utcnow(),
                             from_status=old_status, to_status=task.status.name, notes=notes)
-        self.log_repo.save(log_entry)
+        record_transition(self.uow, log_entry)
+        self.uow.commit()
 
 class FailTaskUseCase:
-    def __init__(self, task_repo: ITaskRepository, log_repo: ITaskLogRepository):
-        self.task_repo = task_repo
-        self.log_repo = log_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
 
-    def execute(self, task_id: int, notes: Optional[str] = None):
-        task = self.task_repo.get_by_id(task_id)
+    def execute(self, task_id: int, notes: Optional[str] = None, output_id: Optional[int] = None):
+        task = self.uow.tasks.get_for_transition(task_id)
         if not task:
             raise ValueError("Task not found")
 
         old_status = task.status.name
         task.fail()
-        self.task_repo.save(task)
 
         log_entry = TaskLog(
             id=None, task_id=task.id, timestamp=datetime.utcnow(),
-            from_status=old_status, to_status=task.status.name, notes=notes
+            from_status=old_status, to_status=task.status.name, notes=notes, output_id=output_id
         )
-        self.log_repo.save(log_entry)
+        record_transition(self.uow, log_entry)
+        self.uow.commit()
+
+class BulkTransitionTasksUseCase:
+    """
+    Applies one transition (start, complete, skip or fail) to many tasks in one transaction.
+    Every task is checked against its state first; tasks that cannot make the transition are
+    reported and left as they are, the others are all changed with batched writes.
+    """
+    ACTIONS = ("start", "complete", "skip", "fail")
+
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+
+    def execute(self, task_ids: List[int], action: str, notes: Optional[str] = None) -> List[TransitionResult]:
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown task action: {action}")
+        task_ids = list(dict.fromkeys(task_ids))  # each task once, in the given order
+        tasks = self.uow.tasks.get_many_for_transition(task_ids)
+
+        results = {}
+        logs = []
+        now = datetime.utcnow()
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            if not task:
+                results[task_id] = TransitionResult(task_id, False, None, "Task not found")
+                continue
+            old_status = task.status.name
+            try:
+                getattr(task, action)()
+            except InvalidTransition as e:
+                results[task_id] = TransitionResult(task_id, False, old_status, str(e))
+                continue
+            logs.append(TaskLog(id=None, task_id=task_id, timestamp=now,
+                                from_status=old_status, to_status=task.status.name, notes=notes))
+
+        applied = self.uow.tasks.transition_all(logs)
+        for log in logs:
+            if log.task_id in applied:
+                results[log.task_id] = TransitionResult(log.task_id, True, log.to_status)
+            else:
+                results[log.task_id] = TransitionResult(
+                    log.task_id, False, None, f"Task {log.task_id} is no longer '{log.from_status}'"
+                )
+
+        if action == "complete":
+            self._complete_state_based_goals({tasks[task_id].goal_id for task_id in applied})
+        self.uow.commit()
+        return [results[task_id] for task_id in task_ids]
+
+    def _complete_state_based_goals(self, goal_ids: Set[int]):
+        """As ProcessTaskCompletionUseCase does for one task: completing a state-based task achieves its goal."""
+        for goal_id in goal_ids:
+            goal = self.uow.goals.get_by_id(goal_id)
+            if goal and isinstance(goal.policy, StateBasedGoal) and goal.status != "Completed":
+                goal.status = "Completed"
+                self.uow.goals.update(goal)
+                print(f"Goal {goal.id} has been completed because its state-based task was achieved.")
 
 class ListTaskLogsUseCase:
     def __init__(self, log_repo: ITaskLogRepository, task_repo: ITaskRepository):
@@ -326,46 +506,91 @@ class ListTaskLogsUseCase:
 
     def execute(self, task_id: int) -> dict:
         task = self.task_repo.get_by_id(task_id)
+        archived = False
+        if not task:
+            # tasks of goals that finished long ago are moved to the archive
+            task = self.task_repo.get_archived(task_id)
+            archived = True
         if not task:
             raise ValueError("Task not found")
 
-        logs = self.log_repo.list_by_task_id(task_id)
-        return {"task": task, "logs": logs}
-
+        if archived:
+            logs = self.log_repo.list_archived_by_task_id(task_id)
+        else:
+            logs = self.log_repo.list_by_task_id(task_id)
+        return {"task": task, "logs": logs, "archived": archived}
+
+class GetScriptOutputUseCase:
+    """A range of the stored output of a script run, for reading long outputs piece by piece."""
+    def __init__(self, repo: IScriptOutputRepository): self.repo = repo
+    def execute(self, output_id: int, offset: int = 0, limit: int = 65536) -> ScriptOutputRange:
+        output = self.repo.get_range(output_id, offset, limit)
+        if not output:
+            raise ValueError("Script output not found")
+        return output
+
+def script_env(uow: IUnitOfWork, task: Task, goal: Goal, env_vars: dict) -> dict:
+    """The environment of a task's script: the strategy's variables plus the task's context as TASK_CONTEXT."""
+    account = uow.accounts.get_by_id(task.account_id) if task.account_id else None
+    platform = uow.platforms.get_by_id(goal.platform_id)
+
+    context = {
+        "task": task.to_dict() if task else None,
+        "goal": goal.to_dict() if goal else None,
+        "account": account.to_dict() if account else None,
+        "platform": platform.to_dict() if platform else None,
+    }
+    env = env_vars.copy()
+    env['TASK_CONTEXT'] = json.dumps(context)
+    return env
+
+
+# The script use cases work in three steps: prepare() reads what the script needs, the script
+# runs with no transaction open, and finish() applies the result. execute() does the three on
+# one unit of work; execute_async() awaits the script and gives each step a session of its own,
+# passing every line the script prints to on_output as it comes.
 class RunExecutionScriptUseCase:
     """Runs an execution script, moving task from Waiting -> In Progress on success."""
-    def __init__(self, task_repo: ITaskRepository, goal_repo: IGoalRepository, log_repo: ITaskLogRepository, account_repo: IAccountRepository, platform_repo: IPlatformRepository):
-        self.task_repo = task_repo
-        self.goal_repo = goal_repo
-        self.log_repo = log_repo
-        self.account_repo = account_repo
-        self.platform_repo = platform_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+        self.task_repo = uow.tasks
+        self.goal_repo = uow.goals
 
     def execute(self, task_id: int):
-        task = self.task_repo.get_by_id(task_id)
+        script = self.prepare(task_id)
+        # For execution, i only care about the exit code, not a keyword.
+        success, logs = run_script(script.script_content, script.env_vars, success_keyword=None)
+        self.finish(task_id, success, logs)
+
+    @staticmethod
+    async def execute_async(run_in_uow: IUnitOfWorkRunner, task_id: int,
+                            on_output: Optional[Callable[[str, str], None]] = None):
+        script = await run_in_uow(lambda uow: RunExecutionScriptUseCase(uow).prepare(task_id))
+        success, logs = await run_script_async(script.script_content, script.env_vars, success_keyword=None,
+                                               on_output=on_output)
+        await run_in_uow(lambda uow: RunExecutionScriptUseCase(uow).finish(task_id, success, logs))
+
+    def prepare(self, task_id: int) -> ScriptRun:
+        task = self.task_repo.get_for_transition(task_id)
+        if not task:
+            raise ValueError("Task not found")
         goal = self.goal_repo.get_by_id(task.goal_id)
+        if not goal:
+            raise ValueError("Goal not found")
         strategy = goal.execution_strategy
 
-        account = self.account_repo.get_by_id(task.account_id) if task.account_id else None
-        platform = self.platform_repo.get_by_id(goal.platform_id)
-
-        context = {
-            "task": task.to_dict() if task else None,
-            "goal": goal.to_dict() if goal else None,
-            "account": account.to_dict() if account else None,
-            "platform": platform.to_dict() if platform else None,
-        }
-        context_json = json.dumps(context)
-
         if not isinstance(strategy, ScriptExecution):
             raise TypeError("Task does not have an execution script.")
         if task.status.name != 'Waiting':
             raise InvalidTransition("Can only execute scripts for tasks in 'Waiting' state.")
 
-        # For execution, i only care about the exit code, not a keyword.
-        script_env = strategy.env_vars.copy()
-        script_env['TASK_CONTEXT'] = context_json
-        success, logs = run_script(strategy.script_content, script_env, success_keyword=None)
+        return ScriptRun(task_id, strategy.script_content, script_env(self.uow, task, goal, strategy.env_vars))
+
+    def finish(self, task_id: int, success: bool, logs: str):
+        # the script ran without holding the task; apply the result only if nobody changed it meanwhile
+        task = self.task_repo.get_for_transition(task_id)
+        if not task or task.status.name != 'Waiting':
+            raise ConcurrentTransition(f"Task {task_id} is no longer 'Waiting'")
 
         old_status = task.status.name
         new_status_name = ""
@@ -373,14 +598,17 @@ class RunExecutionScriptUseCase:
         if success:
             task.start() # move state to In Progress
             new_status_name = task.status.name
+            notes = "Execution script succeeded."
         else:
             task.fail() # move state to Failed
             new_status_name = task.status.name
+            notes = "Execution script failed."
 
-        self.task_repo.save(task)
         log = TaskLog(id=None, task_id=task.id, timestamp=datetime.utcnow(), 
-                      from_status=old_status, to_status=new_status_name, notes=logs)
-        self.log_repo.save(log)
+                      from_status=old_status, to_status=new_status_name, notes=notes,
+                      output_id=self.uow.outputs.save(logs))
+        record_transition(self.uow, log)
+        self.uow.commit()
 
 
 class RunCheckScriptUseCase:
@@ -388,83 +616,136 @@ class RunCheckScriptUseCase:
     Runs a check script, interpreting specific keywords to determine
     the outcome for both the task and the parent goal.
     """
-    def __init__(self, task_repo: ITaskRepository, goal_repo: IGoalRepository, log_repo: ITaskLogRepository, account_repo: IAccountRepository, platform_repo: IPlatformRepository):
-        self.task_repo = task_repo
-        self.goal_repo = goal_repo
-        self.log_repo = log_repo
-        self.account_repo = account_repo
-        self.platform_repo = platform_repo
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+        self.task_repo = uow.tasks
+        self.goal_repo = uow.goals
+        self.output_repo = uow.outputs
 
-        self.process_completion_uc = ProcessTaskCompletionUseCase(task_repo, log_repo, goal_repo)
-        self.fail_task_uc = FailTaskUseCase(task_repo, log_repo)
+        # every outcome goes through exactly one of these, which commits once
+        self.process_completion_uc = ProcessTaskCompletionUseCase(uow)
+        self.fail_task_uc = FailTaskUseCase(uow)
 
     def execute(self, task_id: int):
         """
         Executes the check script for a given task and processes the result.
         """
-        task = self.task_repo.get_by_id(task_id)
+        script = self.prepare(task_id)
+        # TODO: I don't use the success_keyword anymore.
+        # I should modify the run_script function to remove it.
+        success, logs = run_script(script.script_content, script.env_vars, success_keyword=None)
+        self.finish(task_id, success, logs)
+
+    @staticmethod
+    async def execute_async(run_in_uow: IUnitOfWorkRunner, task_id: int,
+                            on_output: Optional[Callable[[str, str], None]] = None):
+        script = await run_in_uow(lambda uow: RunCheckScriptUseCase(uow).prepare(task_id))
+        success, logs = await run_script_async(script.script_content, script.env_vars, success_keyword=None,
+                                               on_output=on_output)
+        await run_in_uow(lambda uow: RunCheckScriptUseCase(uow).finish(task_id, success, logs))
+
+    def prepare(self, task_id: int) -> ScriptRun:
+        task = self.task_repo.get_for_transition(task_id)
         if not task:
-            print(f"Error: Task with ID {task_id} not found.")
-            return
-
+            raise ValueError("Task not found")
         goal = self.goal_repo.get_by_id(task.goal_id)
         if not goal:
-            print(f"Error: Goal for task {task_id} not found.")
-            return
-
+            raise ValueError("Goal not found")
         strategy = goal.check_strategy
-        if not isinstance(strategy, ScriptCheck):
-            print(f"Error: Task {task_id} does not have a check script strategy.")
-            return
 
+        if not isinstance(strategy, ScriptCheck):
+            raise TypeError("Task does not have a check script.")
         if task.status.name != 'In Progress':
-            print(f"Error: Can only run check scripts for tasks in 'In Progress' state. Task {task_id} is '{task.status.name}'.")
-            return
-
-        # --- Prepare and run the script ---
-        account = self.account_repo.get_by_id(task.account_id) if task.account_id else None
-        platform = self.platform_repo.get_by_id(goal.platform_id)
+            raise InvalidTransition("Can only run check scripts for tasks in 'In Progress' state.")
 
-        context = {
-            "task": task.to_dict() if task else None,
-            "goal": goal.to_dict() if goal else None,
-            "account": account.to_dict() if account else None,
-            "platform": platform.to_dict() if platform else None,
-        }
-        context_json = json.dumps(context)
+        return ScriptRun(task_id, strategy.script_content, script_env(self.uow, task, goal, strategy.env_vars))
 
-        script_env = strategy.env_vars.copy()
-        script_env['TASK_CONTEXT'] = context_json
-
-        # TODO: I don't use the success_keyword anymore.
-        # I should modify the run_script function to remove it.
-        success, logs = run_script(strategy.script_content, script_env, success_keyword=None)
+    def finish(self, task_id: int, success: bool, logs: str):
+        # the full output is stored apart; the log notes only say what it meant
+        output_id = self.output_repo.save(logs)
 
         # Case 1: The script itself failed (non-zero exit code, timeout, etc.).
         if not success:
-            notes = f"Check script failed to execute with a non-zero exit code.\n\n{logs}"
-            self.fail_task_uc.execute(task_id, notes=notes)
+            notes = "Check script failed to execute with a non-zero exit code."
+            self.fail_task_uc.execute(task_id, notes=notes, output_id=output_id)
             return
 
         output_lower = logs.lower()
 
         # Case 2: The script explicitly states the overall goal is met.
         if "goal_met" in output_lower:
-            notes = f"Check script returned GOAL_MET.\n\n{logs}"
-            self.process_completion_uc.execute(task_id, notes=notes, complete_parent_goal=True)
+            notes = "Check script returned GOAL_MET."
+            self.process_completion_uc.execute(task_id, notes=notes, complete_parent_goal=True, output_id=output_id)
 
         # Case 3: The script confirms the check was successful, but the goal is not yet met.
         elif "check_success" in output_lower:
-            notes = f"Check script returned CHECK_SUCCESS.\n\n{logs}"
-            self.process_completion_uc.execute(task_id, notes=notes, complete_parent_goal=False)
+            notes = "Check script returned CHECK_SUCCESS."
+            self.process_completion_uc.execute(task_id, notes=notes, complete_parent_goal=False, output_id=output_id)
 
         # Case 4: The script ran but explicitly states its internal logic failed (e.g., API error).
         elif "check_fail" in output_lower:
-            notes = f"Check script returned CHECK_FAIL.\n\n{logs}"
-            self.fail_task_uc.execute(task_id, notes=notes)
+            notes = "Check script returned CHECK_FAIL."
+            self.fail_task_uc.execute(task_id, notes=notes, output_id=output_id)
 
         # Case 5: The script ran but did not provide any of the expected keywords.
         # To avoid ambiguity, this is treated as a failure.
         else:
-            notes = f"Check script ran successfully but did not return a valid keyword (GOAL_MET, CHECK_SUCCESS, or CHECK_FAIL).\n\n{logs}"
-            self.fail_task_uc.execute(task_id, notes=notes)
\ No newline at end of file
+            notes = "Check script ran successfully but did not return a valid keyword (GOAL_MET, CHECK_SUCCESS, or CHECK_FAIL)."
+            self.fail_task_uc.execute(task_id, notes=notes, output_id=output_id)
+
+
+class QueueFull(Exception):
+    """The script job queue is at its depth limit; the run can be asked for again later."""
+    pass
+
+class EnqueueScriptJobUseCase:
+    """
+    Queues a script run of a task for the workers. If a run of the same kind is already
+    queued or running for the task, that job is returned instead of queueing a second one.
+    """
+    KINDS = ("execution", "check")
+
+    def __init__(self, uow: IUnitOfWork, max_depth: int, max_attempts: int):
+        self.uow = uow
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+
+    def execute(self, task_id: int, kind: str, priority: int = 0) -> ScriptJob:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown script job kind: {kind}")
+        if not self.uow.tasks.get_for_transition(task_id):
+            raise ValueError("Task not found")
+
+        pending = self.uow.jobs.find_pending(task_id, kind)
+        if pending:
+            return pending
+        if self.uow.jobs.count_pending() >= self.max_depth:
+            raise QueueFull(f"{self.max_depth} script runs are waiting already.")
+
+        # returns the other job when a concurrent request queued one first
+        job = self.uow.jobs.enqueue(task_id, kind, priority, self.max_attempts)
+        self.uow.commit()
+        return job
+
+class GetScriptJobUseCase:
+    def __init__(self, repo: IScriptJobRepository): self.repo = repo
+    def execute(self, job_id: int) -> ScriptJob:
+        job = self.repo.get_by_id(job_id)
+        if not job:
+            raise ValueError("Script job not found")
+        return job
+
+class GetScriptJobOutputUseCase:
+    """The output tail of a script job; empty unless the job is running."""
+    def __init__(self, repo: IScriptJobRepository): self.repo = repo
+    def execute(self, job_id: int) -> ScriptJobOutput:
+        output = self.repo.get_live_output(job_id)
+        if not output:
+            raise ValueError("Script job not found")
+        return output
+
+class ListScriptJobsUseCase:
+    """The script runs queued for a task, newest first."""
+    def __init__(self, repo: IScriptJobRepository): self.repo = repo
+    def execute(self, task_id: int) -> List[ScriptJob]:
+        return self.repo.list_by_task_id(task_id)
@@ -10,16 +10,27 @@ from .states import TaskState, WaitingState
 from .strategies import ExecutionStrategy, CheckStrategy, ManualExecution, ManualCheck
 
 class TaskLog:
+    __slots__ = ("id", "task_id", "timestamp", "from_status", "to_status", "notes", "output_id",
+                 "output_size", "output_original_size")
+
     def __init__(self, id: Optional[int], task_id: int, timestamp: datetime,
-                 from_status: str, to_status: str, notes: Optional[str] = None):
+                 from_status: str, to_status: str, notes: Optional[str] = None,
+                 output_id: Optional[int] = None):
         self.id = id
         self.task_id = task_id
         self.timestamp = timestamp
         self.from_status = from_status
         self.to_status = to_status
         self.notes = notes
+        # the stored output of the script run that made this change, if any
+        self.output_id = output_id
+        # display only: its size in characters, and what the script wrote before the cap
+        self.output_size: Optional[int] = None
+        self.output_original_size: Optional[int] = None
 
 class Platform:
+    __slots__ = ("id", "name", "config")
+
     def __init__(self, id: int, name: str, config: dict = None):
         self.id = id
         self.name = name
@@ -29,6 +40,8 @@ class Platform:
         return {'id': self.id, 'name': self.name, 'config': self.config}
 
 class Account:
+    __slots__ = ("id", "platform_id", "username", "notes")
+
     def __init__(self, id: Optional[int], platform_id: int, username: str, notes: Optional[str] = None):
         self.id = id
         self.platform_id = platform_id
@@ -43,7 +56,22 @@ class Account:
             'notes': self.notes
         }
 
+def policy_context_string(policy: SchedulingPolicy) -> str:
+    """A one-line description of how a goal with this policy repeats, shown next to its tasks."""
+    policy_name = policy.__class__.__name__
+    if policy_name == "FixedInterval":
+        return f"This is a recurring goal that repeats every {policy.days} day(s)."
+    if policy_name == "DeadlineDistribution":
+        return f"Part of a goal to complete {policy.total} tasks by {policy.deadline.strftime('%B %d, %Y')}."
+    if policy_name == "StateBasedGoal": #<-- Add context for new policy
+        return f"A goal to achieve a specific state, checked every {policy.check_interval_days} day(s)."
+    return "A standalone goal."
+
 class Goal:
+    __slots__ = ("id", "platform_id", "description", "policy", "start_date", "execution_strategy",
+                 "check_strategy", "task_distribution_strategy", "catchup_strategy", "end_date",
+                 "account_ids", "status", "platform_name")
+
     def __init__(self, id: int, platform_id: int, description: str,
                  policy: SchedulingPolicy, start_date: date,
                  execution_strategy: ExecutionStrategy,
@@ -65,17 +93,11 @@ class Goal:
         self.end_date = end_date
         self.account_ids = account_ids or []
         self.status = status
+        # display only, filled in by the repositories
         self.platform_name: Optional[str] = None
 
     def get_context_string(self) -> str:
-        policy_name = self.policy.__class__.__name__
-        if policy_name == "FixedInterval":
-            return f"This is a recurring goal that repeats every {self.policy.days} day(s)."
-        if policy_name == "DeadlineDistribution":
-            return f"Part of a goal to complete {self.policy.total} tasks by {self.policy.deadline.strftime('%B %d, %Y')}."
-        if policy_name == "StateBasedGoal": #<-- Add context for new policy
-            return f"A goal to achieve a specific state, checked every {self.policy.check_interval_days} day(s)."
-        return "A standalone goal."
+        return policy_context_string(self.policy)
 
     def to_dict(self):
         return {
@@ -92,66 +114,90 @@ class Goal:
             "task_distribution_strategy": self.task_distribution_strategy
         }
 
+    def needs_task_history(self, previous: 'Goal') -> bool:
+        """
+        Whether this edit of the goal makes it generate tasks from its whole history again: its
+        schedule changed, or it was not Active before and is now. Other edits leave the
+        history where it is.
+        """
+        if self.status == "Active" and previous.status != "Active":
+            return True
+        return (self.policy.to_dict(), self.start_date, self.end_date, self.account_ids,
+                self.task_distribution_strategy, self.catchup_strategy) != \
+               (previous.policy.to_dict(), previous.start_date, previous.end_date, previous.account_ids,
+                previous.task_distribution_strategy, previous.catchup_strategy)
+
+    def schedule_lines(self) -> List[Optional[int]]:
+        """
+        Returns the account ids of the lines this goal schedules independently.
+        None stands for the platform-level line, or the whole account group of a round-robin goal.
+        """
+        if not self.account_ids or self.task_distribution_strategy == "all":
+            return list(self.account_ids) if self.account_ids else [None]
+        if self.task_distribution_strategy == "round_robin":
+            return [None]
+        return []
+
+    def next_due_date(self, last_task_date: Optional[date], num_completed: int = 0) -> Optional[date]:
+        """
+        Returns the date the next task of a line is due after last_task_date,
+        or None if the line will not generate any more tasks.
+        For DeadlineDistribution this is a lower bound: completing more tasks
+        only pushes the next date further out.
+        """
+        if self.status != "Active":
+            return None
+        if isinstance(self.policy, DeadlineDistribution) and self.policy.freeze and last_task_date:
+            # By the time the next date comes, last_task_date is in the past and
+            # generate_tasks() freezes the line (see below).
+            return None
+        next_date = self.policy.next_due(last_task_date or self.start_date, num_completed)
+        if next_date == date.max or (self.end_date and next_date > self.end_date):
+            return None
+        return next_date
+
     def generate_tasks(self, last_task_date: Optional[date], num_completed: int = 0) -> List['Task']:
         """
         Generates due tasks based on the goal's policy and catch-up strategy.
 
         This method works in three stages:
-        1. Collect all potential due dates from the last task up to today.
-        2. Apply the catch-up strategy ('all' or 'latest') to filter the dates.
+        1. Work out the window the due dates may fall in (up to today and the goal's end date).
+        2. Ask the policy for the due dates in that window, or only the latest one
+           for the 'latest' catch-up strategy.
         3. Create the final list of Task domain objects.
         """
 
-        # --- Stage 1: Collect all potential due dates ---
-        potential_due_dates = []
+        # --- Stage 1: Work out the window ---
+        today = date.today()
+        until = self.end_date if self.end_date and self.end_date < today else today
+
+        # For DeadlineDistribution, the 'freeze' option prevents rescheduling if a task was missed.
+        if isinstance(self.policy, DeadlineDistribution) and self.policy.freeze:
+            if last_task_date and last_task_date < today:
+                # A previous task was due in the past and is not 'Completed' yet.
+                # Stop generating new tasks for this goal line.
+                return []
+
         # The starting point for calculation is either the last task's due date
         # or the goal's start date if no tasks exist yet.
-        current_last_date = last_task_date or self.start_date
-
-        # Determine the very first due date. If no tasks exist yet, we must calculate
-        # from the goal's start_date, not from 'current_last_date' which would be the same.
         # This is critical for DeadlineDistribution to correctly calculate its first interval.
-        if last_task_date:
-            next_due_date = self.policy.next_due(current_last_date, num_completed)
-        else:
-            next_due_date = self.policy.next_due(self.start_date, num_completed)
-
-        while next_due_date <= date.today():
-            # Stop if the due date is past the goal's end date.
-            if self.end_date and next_due_date > self.end_date:
-                break
-
-            # For DeadlineDistribution, the 'freeze' option prevents rescheduling if a task was missed.
-            if isinstance(self.policy, DeadlineDistribution) and self.policy.freeze:
-                if last_task_date and last_task_date < date.today():
-                    # A previous task was due in the past and is not 'Completed' yet.
-                    # Stop generating new tasks for this goal line.
-                    break
-
-            potential_due_dates.append(next_due_date)
-
-            # For the next loop iteration, calculate the next due date from the one we just found.
-            current_last_date = next_due_date
-
-            # This is for DeadlineDistribution: As I generate more tasks in this single run,
-            # I increment the `num_completed` count to correctly shorten the interval for subsequent dates.
-            num_completed_for_next_calc = num_completed + len(potential_due_dates)
-            next_due_date = self.policy.next_due(current_last_date, num_completed_for_next_calc)
-
-        # --- Stage 2: Apply the catch-up strategy to filter the dates ---
-        if not potential_due_dates:
-            return [] # No tasks are due.
-
-        final_due_dates = []
+        current_last_date = last_task_date or self.start_date
 
+        # --- Stage 2: Collect the due dates, applying the catch-up strategy ---
         # This is intentionally NOT applied to DeadlineDistribution, as that policy has
         # its own built-in catch-up logic (shortening intervals).
         if self.catchup_strategy == 'latest' and isinstance(self.policy, FixedInterval):
-            # Only take the single most recent due date.
-            final_due_dates.append(potential_due_dates[-1])
+            # Only take the single most recent due date, without walking to it.
+            latest_due_date = self.policy.last_due_date(current_last_date, until, num_completed)
+            final_due_dates = [latest_due_date] if latest_due_date else []
         else:
             # Default 'all' behavior or any other policy type gets all due tasks.
-            final_due_dates = potential_due_dates
+            # For DeadlineDistribution every generated date counts towards num_completed,
+            # so the interval is recomputed for subsequent dates.
+            final_due_dates = self.policy.due_dates(current_last_date, until, num_completed)
+
+        if not final_due_dates:
+            return [] # No tasks are due.
 
         # --- Stage 3: Create the final list of Task domain objects ---
         tasks_to_create = []
@@ -167,14 +213,21 @@ class Goal:
         return tasks_to_create
 
 class Task:
+    __slots__ = ("id", "goal_id", "due_date", "account_id", "_status",
+                 "goal", "goal_context", "goal_description", "platform_name", "account_username")
+
     def __init__(self, id: Optional[int], goal_id: int, due_date: date, status: TaskState, account_id: Optional[int] = None):
         self.id = id
         self.goal_id = goal_id
         self.due_date = due_date
         self.account_id = account_id
         self._status = status
-        self.goal_context: Optional[str] = None
+        # display only, filled in by the repositories
         self.goal: Optional[Goal] = None
+        self.goal_context: Optional[str] = None
+        self.goal_description: Optional[str] = None
+        self.platform_name: Optional[str] = None
+        self.account_username: Optional[str] = None
 
     def to_dict(self) -> dict:
         return {
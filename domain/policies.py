@@ -1,16 +1,56 @@
 from abc import ABC, abstractmethod
 from datetime import date, timedelta
+from typing import List, Optional
 
 class SchedulingPolicy(ABC):
     @abstractmethod
     def next_due(self, last_date: date, num_completed: int = 0) -> date:
         ...
 
+    def due_dates(self, last_date: date, until: date, num_completed: int = 0) -> List[date]:
+        """
+        Returns every due date after last_date up to and including until, as repeated
+        next_due() calls would. Each generated date counts towards num_completed.
+        """
+        dates = []
+        next_date = self.next_due(last_date, num_completed)
+        while next_date <= until:
+            dates.append(next_date)
+            next_date = self.next_due(next_date, num_completed + len(dates))
+        return dates
+
+    def last_due_date(self, last_date: date, until: date, num_completed: int = 0) -> Optional[date]:
+        """Returns only the last date due_dates() would return, or None if nothing is due."""
+        dates = self.due_dates(last_date, until, num_completed)
+        return dates[-1] if dates else None
+
     def to_dict(self) -> dict:
         """Returns a dictionary representation of the policy."""
         return {'type': self.__class__.__name__}
 
-class FixedInterval(SchedulingPolicy):
+class _EveryNDays(SchedulingPolicy, ABC):
+    """Base for policies that repeat on a fixed number of days, so the schedule is pure arithmetic."""
+    @abstractmethod
+    def _interval(self) -> int:
+        ...
+
+    def next_due(self, last_date: date, num_completed: int = 0) -> date:
+        return last_date + timedelta(days=self._interval())
+
+    def due_dates(self, last_date: date, until: date, num_completed: int = 0) -> List[date]:
+        step = self._interval()
+        first = last_date.toordinal() + step
+        return [date.fromordinal(o) for o in range(first, until.toordinal() + 1, step)]
+
+    def last_due_date(self, last_date: date, until: date, num_completed: int = 0) -> Optional[date]:
+        step = self._interval()
+        first = last_date.toordinal() + step
+        end = until.toordinal()
+        if first > end:
+            return None
+        return date.fromordinal(first + (end - first) // step * step)
+
+class FixedInterval(_EveryNDays):
     def __init__(self, days: int):
         if days <= 0:
             raise ValueError("Interval must be positive")
@@ -21,8 +61,8 @@ class FixedInterval(SchedulingPolicy):
         data['days'] = self.days
         return data
 
-    def next_due(self, last_date: date, num_completed: int = 0) -> date:
-        return last_date + timedelta(days=self.days)
+    def _interval(self) -> int:
+        return self.days
 
 class DeadlineDistribution(SchedulingPolicy):
     def __init__(self, deadline: date, total: int, freeze: bool):
@@ -46,6 +86,21 @@ class DeadlineDistribution(SchedulingPolicy):
 
         return last_date + timedelta(days=interval_days)
 
+    def due_dates(self, last_date: date, until: date, num_completed: int = 0) -> List[date]:
+        # Same rules as next_due(), on day ordinals instead of date objects.
+        current = last_date.toordinal()
+        deadline = self.deadline.toordinal()
+        end = until.toordinal()
+        remaining = self.total - num_completed
+        ordinals = []
+        while remaining > 0 and current < deadline:
+            current += max(1, (deadline - current) // remaining)
+            if current > end:
+                break
+            ordinals.append(current)
+            remaining -= 1
+        return [date.fromordinal(o) for o in ordinals]
+
     def to_dict(self) -> dict:
         data = super().to_dict()
         data.update({
@@ -55,7 +110,7 @@ class DeadlineDistribution(SchedulingPolicy):
         })
         return data
 
-class StateBasedGoal(SchedulingPolicy):
+class StateBasedGoal(_EveryNDays):
     """
     A policy for goals that are met by achieving an external state.
     Generates periodic "check" tasks until the goal's end_date.
@@ -65,11 +120,11 @@ class StateBasedGoal(SchedulingPolicy):
             raise ValueError("Check interval must be positive")
         self.check_interval_days = check_interval_days
 
-    def next_due(self, last_date: date, num_completed: int = 0) -> date:
+    def _interval(self) -> int:
         # This policy doesn't care about num_completed.
-        return last_date + timedelta(days=self.check_interval_days)
+        return self.check_interval_days
 
     def to_dict(self) -> dict:
         data = super().to_dict()
         data['check_interval_days'] = self.check_interval_days
-        return data
\ No newline at end of file
+        return data
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict
 
 if TYPE_CHECKING:
     from .models import Task
@@ -8,8 +8,24 @@ if TYPE_CHECKING:
 class InvalidTransition(Exception):
     pass
 
+class ConcurrentTransition(InvalidTransition):
+    """The task changed status after it was read, so this transition was not applied."""
+    pass
+
 class TaskState(ABC):
+    """
+    A task status and the transitions allowed from it. States hold no data, so every state
+    class has one shared instance: WaitingState() always returns the same object.
+    """
+    __slots__ = ()
     name: str = "Base"
+    _instances: Dict[type, "TaskState"] = {}
+
+    def __new__(cls):
+        instance = TaskState._instances.get(cls)
+        if instance is None:
+            instance = TaskState._instances[cls] = super().__new__(cls)
+        return instance
 
     def start(self, context: "Task"):
         raise InvalidTransition(f"Cannot start from {self.name}")
@@ -24,10 +40,12 @@ class TaskState(ABC):
         raise InvalidTransition(f"Cannot skip from {self.name}")
 
 class SkippedState(TaskState):
+    __slots__ = ()
     name = "Skipped"
     # This is a terminal state, no transitions out.
 
 class WaitingState(TaskState):
+    __slots__ = ()
     name = "Waiting"
     def start(self, context: "Task"):
         context.status = InProgressState()
@@ -35,6 +53,7 @@ class WaitingState(TaskState):
         context.status = SkippedState()
 
 class InProgressState(TaskState):
+    __slots__ = ()
     name = "In Progress"
     def complete(self, context: "Task"):
         context.status = CompletedState()
@@ -44,8 +63,10 @@ class InProgressState(TaskState):
         context.status = SkippedState()
 
 class CompletedState(TaskState):
+    __slots__ = ()
     name = "Completed"
     # Terminal state
 
 class FailedState(TaskState):
+    __slots__ = ()
     name = "Failed"
\ No newline at end of file
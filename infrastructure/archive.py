@@ -0,0 +1,176 @@
+"""
+Archival of the task history of finished goals.
+
+A goal is finished when it is Completed or past its end date. Once it finished more than
+ARCHIVE_AFTER_DAYS ago (no task due and no status change since then), its tasks in a
+terminal status move with their logs from tasks and task_logs to archived_tasks and
+archived_task_logs, so the hot tables and their indexes only hold history that is still
+worked on. The counters keep counting archived tasks, the task log page still shows them,
+and rescheduling or reactivating a goal moves its tasks back.
+
+The row moves (archive_tasks, restore_archived_tasks) and the deletion of a goal's or an
+account's task history are also used by the repositories, in their callers' transactions.
+
+Rows move in batches of ARCHIVE_BATCH_SIZE tasks, one short transaction each, so other
+writers are not locked out for long. The tables are vacuumed and analyzed afterwards.
+
+Run it with:  python -m infrastructure.archive [--days N] [--no-vacuum]
+"""
+import argparse
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from settings import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+from . import orm
+from .data_versions import bump_data_version
+from .database import SessionLocal, engine
+from .task_counters import TERMINAL_STATUSES
+
+TASK_COLUMNS = ["id", "goal_id", "account_id", "due_date", "status"]
+TASK_LOG_COLUMNS = ["id", "task_id", "timestamp", "from_status", "to_status", "notes", "output_id"]
+
+
+def _copy_rows(db: Session, source, target, columns: List[str], where):
+    db.execute(target.insert().from_select(columns, select(*[source.c[c] for c in columns]).where(where)))
+
+
+def archive_tasks(db: Session, task_ids: List[int]):
+    """
+    Moves the given tasks and their logs to the archive tables, ids included, in the caller's
+    transaction. The task counters are left as they are, since they count archived tasks too.
+    """
+    tasks, logs = orm.Task.__table__, orm.TaskLog.__table__
+    archived, archived_logs = orm.ArchivedTask.__table__, orm.ArchivedTaskLog.__table__
+    _copy_rows(db, tasks, archived, TASK_COLUMNS, tasks.c.id.in_(task_ids))
+    _copy_rows(db, logs, archived_logs, TASK_LOG_COLUMNS, logs.c.task_id.in_(task_ids))
+    db.execute(logs.delete().where(logs.c.task_id.in_(task_ids)))
+    db.execute(tasks.delete().where(tasks.c.id.in_(task_ids)))
+
+
+def restore_archived_tasks(db: Session, goal_id: int, limit: Optional[int] = None) -> int:
+    """
+    Moves the archived tasks of a goal (the `limit` oldest ones, or all) and their logs back to
+    tasks and task_logs, in the caller's transaction. Returns the count of tasks moved.
+    """
+    tasks, logs = orm.Task.__table__, orm.TaskLog.__table__
+    archived, archived_logs = orm.ArchivedTask.__table__, orm.ArchivedTaskLog.__table__
+    task_ids = [task_id for task_id, in db.execute(
+        select(archived.c.id).where(archived.c.goal_id == goal_id).order_by(archived.c.id).limit(limit)
+    )]
+    if not task_ids:
+        return 0
+    _copy_rows(db, archived, tasks, TASK_COLUMNS, archived.c.id.in_(task_ids))
+    _copy_rows(db, archived_logs, logs, TASK_LOG_COLUMNS, archived_logs.c.task_id.in_(task_ids))
+    db.execute(archived_logs.delete().where(archived_logs.c.task_id.in_(task_ids)))
+    db.execute(archived.delete().where(archived.c.id.in_(task_ids)))
+    return len(task_ids)
+
+
+def _delete_tasks(db: Session, tasks, logs, where):
+    """Deletes the tasks matching `where` with their logs and script outputs."""
+    task_ids = select(tasks.c.id).where(where).scalar_subquery()
+    output_ids = [output_id for output_id, in db.execute(
+        select(logs.c.output_id).where(logs.c.task_id.in_(task_ids), logs.c.output_id.is_not(None))
+    )]
+    db.execute(logs.delete().where(logs.c.task_id.in_(task_ids)))
+    if output_ids:
+        db.execute(delete(orm.ScriptOutput).where(orm.ScriptOutput.id.in_(output_ids)))
+    db.execute(tasks.delete().where(where))
+
+
+def delete_archived_tasks(db: Session, goal_id: int):
+    """Deletes the archived tasks of a goal with their logs and script outputs."""
+    archived = orm.ArchivedTask.__table__
+    _delete_tasks(db, archived, orm.ArchivedTaskLog.__table__, archived.c.goal_id == goal_id)
+
+
+def delete_account_tasks(db: Session, account_id: int):
+    """Deletes the tasks of an account, archived ones included, with their logs, script outputs, jobs and counters."""
+    tasks, archived = orm.Task.__table__, orm.ArchivedTask.__table__
+    db.execute(delete(orm.ScriptJob).where(
+        orm.ScriptJob.task_id.in_(select(tasks.c.id).where(tasks.c.account_id == account_id))
+    ))
+    _delete_tasks(db, tasks, orm.TaskLog.__table__, tasks.c.account_id == account_id)
+    _delete_tasks(db, archived, orm.ArchivedTaskLog.__table__, archived.c.account_id == account_id)
+    db.execute(delete(orm.TaskCount).where(orm.TaskCount.account_key == account_id))
+
+
+def finished_goal_ids(db: Session, cutoff: date) -> List[int]:
+    """The goals that finished before the cutoff date: no task of theirs is due or changed status since."""
+    candidates = [goal_id for goal_id, in db.query(orm.Goal.id).filter(
+        or_(orm.Goal.status == "Completed", orm.Goal.end_date < cutoff)
+    )]
+    if not candidates:
+        return []
+    recent = {goal_id for goal_id, in db.query(orm.Task.goal_id).filter(
+        orm.Task.goal_id.in_(candidates), orm.Task.due_date >= cutoff
+    ).distinct()}
+    recent |= {goal_id for goal_id, in db.query(orm.Task.goal_id).join(orm.TaskLog).filter(
+        orm.Task.goal_id.in_(candidates), orm.TaskLog.timestamp >= datetime.combine(cutoff, time.min)
+    ).distinct()}
+    return [goal_id for goal_id in candidates if goal_id not in recent]
+
+
+def archive_finished_goals(db: Session, cutoff: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Moves the finished tasks of the goals that finished before the cutoff, committing every batch. Returns the count."""
+    goal_ids = finished_goal_ids(db, cutoff)
+    moved = 0
+    while goal_ids:
+        task_ids = [task_id for task_id, in db.query(orm.Task.id).filter(
+            orm.Task.goal_id.in_(goal_ids), orm.Task.status.in_(TERMINAL_STATUSES)
+        ).order_by(orm.Task.id).limit(batch_size)]
+        if not task_ids:
+            break
+        archive_tasks(db, task_ids)
+        bump_data_version(db, "goals")
+        db.commit()
+        moved += len(task_ids)
+    return moved
+
+
+def compact(bind: Engine) -> None:
+    """Gives the space of the moved rows back and refreshes the planner statistics."""
+    # VACUUM cannot run inside a transaction
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if bind.dialect.name == "sqlite":
+            conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("ANALYZE")
+        else:
+            for table in ("tasks", "task_logs", "archived_tasks", "archived_task_logs"):
+                conn.exec_driver_sql(f"VACUUM ANALYZE {table}")
+
+
+def run_archival(days: int = ARCHIVE_AFTER_DAYS, vacuum: bool = True) -> int:
+    """Archives the goals that finished more than `days` days ago, then compacts the database if anything moved."""
+    db = SessionLocal()
+    try:
+        moved = archive_finished_goals(db, date.today() - timedelta(days=days))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if moved and vacuum:
+        compact(engine)
+    return moved
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive goals that finished more than this many days ago")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM/ANALYZE afterwards")
+    args = parser.parse_args()
+
+    moved = run_archival(args.days, vacuum=not args.no_vacuum)
+    print(f"{moved} tasks archived.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from domain.models import Account, Platform
+
+
+class Catalog(NamedTuple):
+    """All platforms and accounts, as of one version of the catalog."""
+    version: int
+    platforms: Dict[int, Platform]
+    accounts: Dict[int, Account]
+
+
+class CatalogCache:
+    """
+    A thread-safe, process-wide copy of the platform and account catalog.
+
+    The copy is labelled with the catalog version it was loaded at; a lookup for another
+    version is a miss, so catalog changes made by other processes are picked up as long
+    as every change bumps the version. Lookups return the shared catalog; it must not be
+    modified (see the cached repositories). hits and misses count the lookups since the
+    process started (GET /caches).
+    """
+    def __init__(self):
+        self._catalog: Optional[Catalog] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int) -> Optional[Catalog]:
+        with self._lock:
+            if self._catalog is None or self._catalog.version != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._catalog
+
+    def put(self, catalog: Catalog) -> None:
+        with self._lock:
+            # a slow loader must not replace a newer catalog with an older one
+            if self._catalog is None or catalog.version >= self._catalog.version:
+                self._catalog = catalog
+
+    def clear(self) -> None:
+        with self._lock:
+            self._catalog = None
@@ -0,0 +1,19 @@
+"""
+Named counters of changes to parts of the data (the data_versions table), so in-memory copies
+of a part and the ETags of the pages that show it can tell whether they are still current.
+"""
+from sqlalchemy.orm import Session
+
+from . import orm
+from .database import dialect_insert
+
+
+def read_data_version(db: Session, name: str) -> int:
+    return db.query(orm.DataVersion.version).filter(orm.DataVersion.name == name).scalar() or 0
+
+
+def bump_data_version(db: Session, name: str):
+    """Increments the named data version with one upsert, in the caller's transaction."""
+    versions = orm.DataVersion.__table__
+    stmt = dialect_insert(db, versions).values(name=name, version=1)
+    db.execute(stmt.on_conflict_do_update(index_elements=[versions.c.name], set_={"version": versions.c.version + 1}))
@@ -1,11 +1,51 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from settings import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./db/task_tracker.db"
+# Driver used for each backend
+SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql+psycopg"}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def database_url(url: str, drivers: dict) -> URL:
+    """Returns the URL with the driver this app uses for its backend."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return parsed.set(drivername=drivers[backend])
+
+def engine_options(url: URL) -> dict:
+    """Connection options for create_engine."""
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def dialect_insert(db: Session, model):
+    """Returns the INSERT construct of the session's dialect, which supports ON CONFLICT clauses."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Dialect {dialect} not supported")
+
+def insert_ignoring_duplicates(db: Session, model):
+    """
+    Returns an INSERT for the model that skips rows violating a unique constraint
+    (INSERT ... ON CONFLICT DO NOTHING), so concurrent or retried writers never duplicate rows.
+    """
+    return dialect_insert(db, model).on_conflict_do_nothing()
+
+SQLALCHEMY_DATABASE_URL = database_url(DATABASE_URL, SYNC_DRIVERS)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -15,4 +55,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
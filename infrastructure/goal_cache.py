@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RevisionedLRU(Generic[T]):
+    """
+    A thread-safe LRU of values keyed on a row id and valid for one revision of that row.
+
+    A lookup with another revision than the stored one is a miss, so rows changed by
+    other processes are never served stale as long as every change bumps the revision.
+    maxsize 0 turns the cache off. hits and misses count the lookups since the process
+    started (GET /caches).
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, Tuple[int, T]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int, revision: int) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != revision:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: int, revision: int, value: T) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (revision, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: int) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,77 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import orm
+from .database import insert_ignoring_duplicates
+
+
+class LeaderLease:
+    """
+    A lease row in the app database that elects one process as the leader.
+
+    Every process calls try_acquire() periodically; the current holder renews the lease,
+    the others only get it once it has expired. Clocks of the processes are assumed to
+    be roughly in sync, which is fine for lease times of a minute or more.
+    """
+    def __init__(self, session_factory: sessionmaker, name: str = "scheduler", ttl_seconds: int = 90):
+        self.session_factory = session_factory
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Takes or renews the lease. Returns whether this process is the leader now."""
+        now = datetime.utcnow()
+        db: Session = self.session_factory()
+        try:
+            result = db.execute(
+                update(orm.SchedulerLease)
+                .where(orm.SchedulerLease.name == self.name)
+                .where(or_(orm.SchedulerLease.holder == self.holder, orm.SchedulerLease.expires_at < now))
+                .values(holder=self.holder, expires_at=now + self.ttl)
+            )
+            if result.rowcount == 0:
+                # No lease row yet, or somebody else holds it; the insert is a no-op in the latter case.
+                result = db.execute(
+                    insert_ignoring_duplicates(db, orm.SchedulerLease)
+                    .values(name=self.name, holder=self.holder, expires_at=now + self.ttl)
+                )
+            db.commit()
+            self.is_leader = result.rowcount == 1
+        except Exception as e:
+            db.rollback()
+            print(f"Could not acquire lease '{self.name}': {e}")
+            self.is_leader = False
+        finally:
+            db.close()
+        return self.is_leader
+
+    def release(self):
+        """Gives the lease up so another process can take over right away."""
+        if not self.is_leader:
+            return
+        db: Session = self.session_factory()
+        try:
+            db.execute(
+                update(orm.SchedulerLease)
+                .where(orm.SchedulerLease.name == self.name, orm.SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+        self.is_leader = False
+
+    def run_if_leader(self, job):
+        """Wraps a scheduler job so it only runs in the process holding the lease."""
+        def wrapper(*args, **kwargs):
+            if not self.try_acquire():
+                return None
+            return job(*args, **kwargs)
+        wrapper.__name__ = job.__name__
+        return wrapper
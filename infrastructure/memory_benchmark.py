@@ -0,0 +1,109 @@
+"""
+Memory benchmark for the domain objects.
+
+Hydrates a large number of tasks the way the repositories do (a Task with its state and its
+display fields, the strings shared per goal, platform and account), moves a third of them
+to another state, and prints the peak RSS of the process. Each run happens in a child
+process. With --baseline the same run is repeated on the domain package of another git
+revision, to compare the two.
+
+Run it with:  python -m infrastructure.memory_benchmark [--tasks 1000000] [--baseline <git revision>]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+
+def hydrate(count: int) -> list:
+    """Builds `count` tasks as a task list page or a generation run would hold them."""
+    from domain.models import Task
+    from domain.states import CompletedState, InProgressState, WaitingState
+
+    states = [WaitingState(), InProgressState(), CompletedState()]
+    goals = [(f"goal-{g}", f"This is a recurring goal that repeats every {g % 7 + 1} day(s).") for g in range(1000)]
+    platforms = [f"platform-{p}" for p in range(3)]
+    accounts = [f"account-{a}" for a in range(10)]
+    first_day = date(2024, 1, 1).toordinal()
+
+    tasks = []
+    for i in range(count):
+        task = Task(id=i + 1, goal_id=i % 1000 + 1, due_date=date.fromordinal(first_day + i % 730),
+                    status=states[i % 3], account_id=i % 10 or None)
+        task.goal_description, task.goal_context = goals[i % 1000]
+        task.platform_name = platforms[i % 3]
+        task.account_username = accounts[i % 10] if i % 10 else "Platform-Level"
+        tasks.append(task)
+    for task in tasks[::3]:
+        task.start()  # Waiting -> In Progress
+    return tasks
+
+
+def child(count: int, root: str) -> None:
+    sys.path.insert(0, root)
+    startup = peak_rss_kb()
+    started = time.perf_counter()
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")  # status changes print a line each
+    try:
+        tasks = hydrate(count)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print(json.dumps({"tasks": len(tasks), "startup_kb": startup, "peak_kb": peak_rss_kb(),
+                      "seconds": time.perf_counter() - started}))
+
+
+def measure(count: int, root: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--tasks", str(count), "--root", root],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def report(label: str, result: dict) -> None:
+    grown = (result["peak_kb"] - result["startup_kb"]) / 1024
+    print(f"{label:<24} peak RSS {result['peak_kb'] / 1024:8.1f} MiB "
+          f"({grown:.1f} MiB for {result['tasks']:,} tasks, {result['seconds']:.1f} s)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--baseline", help="git revision whose domain package to compare with")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--root", default=ROOT, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.tasks, args.root)
+        return 0
+
+    current = measure(args.tasks, ROOT)
+    report("working tree", current)
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as baseline_root:
+            archive = subprocess.run(["git", "-C", ROOT, "archive", args.baseline, "domain"],
+                                     check=True, capture_output=True).stdout
+            subprocess.run(["tar", "-x", "-C", baseline_root], input=archive, check=True)
+            baseline = measure(args.tasks, baseline_root)
+        report(args.baseline, baseline)
+        saved = (baseline["peak_kb"] - current["peak_kb"]) / 1024
+        print(f"The working tree peaks {saved:.1f} MiB lower than {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
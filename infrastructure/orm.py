@@ -1,5 +1,5 @@
 import json
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, JSON, Text, DateTime
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, JSON, Text, DateTime, Index, LargeBinary, func
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -23,6 +23,8 @@ class Account(Base):
 
 class Goal(Base):
     __tablename__ = "goals"
+    # ids are never reused, so a decoded goal cached under (id, revision) never meets another goal
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
     platform_id = Column(Integer, ForeignKey("platforms.id"))
@@ -35,11 +37,29 @@ class Goal(Base):
     account_ids_json = Column(JSON)
     status = Column(String, default="Active", nullable=False)
     task_distribution_strategy = Column(String, default="all", nullable=False)
+    # bumped in place on every update; caches of the decoded goal are keyed on (id, revision)
+    revision = Column(Integer, default=1, server_default="1", nullable=False)
     platform = relationship("Platform", back_populates="goals")
     tasks = relationship("Task", back_populates="goal", cascade="all, delete-orphan")
+    lines = relationship("GoalLine", back_populates="goal", cascade="all, delete-orphan")
+
+class GoalLine(Base):
+    """
+    One independently scheduled line of a goal, with the date its next task is due.
+    account_id is None for platform-level goals and for the whole account group of
+    round-robin goals. next_due_date is None when the line will not generate more tasks.
+    """
+    __tablename__ = "goal_lines"
+    id = Column(Integer, primary_key=True, index=True)
+    goal_id = Column(Integer, ForeignKey("goals.id"), nullable=False, index=True)
+    account_id = Column(Integer, nullable=True)
+    next_due_date = Column(Date, nullable=True, index=True)
+    goal = relationship("Goal", back_populates="lines")
 
 class Task(Base):
     __tablename__ = "tasks"
+    # ids are never reused, so an archived task keeps its id for good
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     goal_id = Column(Integer, ForeignKey("goals.id"))
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
@@ -49,12 +69,145 @@ class Task(Base):
     account = relationship("Account", back_populates="tasks")
     logs = relationship("TaskLog", back_populates="task", cascade="all, delete-orphan")
 
+# One task per goal line and due date. account_id is coalesced because NULLs never
+# collide in a unique index, and platform-level tasks have no account. A deleted account's
+# tasks are deleted with it rather than left without one, as they would collide here.
+Index("uq_tasks_goal_account_due", Task.goal_id, func.coalesce(Task.account_id, 0), Task.due_date, unique=True)
+# Latest task of a goal line (generation), and per-status counts per account (dashboard).
+Index("ix_tasks_goal_account_due", Task.goal_id, Task.account_id, Task.due_date)
+Index("ix_tasks_status_account_due", Task.status, Task.account_id, Task.due_date)
+# Task list pages, newest first (keyset pagination on due_date, id), unfiltered or by status or goal.
+Index("ix_tasks_due_date_id", Task.due_date, Task.id)
+Index("ix_tasks_status_due_date_id", Task.status, Task.due_date, Task.id)
+Index("ix_tasks_goal_due_date_id", Task.goal_id, Task.due_date, Task.id)
+Index("ix_accounts_platform_id", Account.platform_id)
+
+class TaskCount(Base):
+    """
+    Number of tasks per goal line and status, kept up to date in the transaction of every task
+    insert and status change. account_key is the account id, or 0 for platform-level tasks.
+    max_due_date is the latest due date of the counted tasks; it is only exact for terminal
+    statuses (tasks never leave them), and is only read for Completed. revision goes up by one
+    with every change of the row, so the sum over all counters changes with every committed task
+    insert or status change, without a row that all of them write.
+    """
+    __tablename__ = "task_counts"
+    goal_id = Column(Integer, ForeignKey("goals.id"), primary_key=True)
+    account_key = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    max_due_date = Column(Date, nullable=True)
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+
 class TaskLog(Base):
     __tablename__ = "task_logs"
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     from_status = Column(String)
     to_status = Column(String)
     notes = Column(Text, nullable=True)
+    output_id = Column(Integer, ForeignKey("script_outputs.id"), nullable=True)
     task = relationship("Task", back_populates="logs")
+    output = relationship("ScriptOutput", cascade="all, delete-orphan", single_parent=True)
+
+# A task's history, in order.
+Index("ix_task_logs_task_timestamp", TaskLog.task_id, TaskLog.timestamp)
+
+class ScriptOutput(Base):
+    """
+    Output of one script run, UTF-8 in zlib-compressed chunks stored back to back, so a range
+    is read and decompressed without the rest. chunks_json lists the [character end, byte end]
+    of every chunk. A run longer than the cap keeps its head and tail: original_size is what
+    the script wrote, size what is stored (both in characters).
+    """
+    __tablename__ = "script_outputs"
+    id = Column(Integer, primary_key=True)
+    size = Column(Integer, nullable=False)
+    original_size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    chunks_json = Column(Text, nullable=False)
+
+class ArchivedTask(Base):
+    """
+    A task of a goal that finished long ago, moved out of tasks by the archival job
+    (infrastructure/archive.py) with its id and columns unchanged. The task counters
+    still count it.
+    """
+    __tablename__ = "archived_tasks"
+    id = Column(Integer, primary_key=True)
+    goal_id = Column(Integer, ForeignKey("goals.id"), index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
+    due_date = Column(Date)
+    status = Column(String)
+    goal = relationship("Goal")
+    account = relationship("Account")
+
+class ArchivedTaskLog(Base):
+    """A log entry of an archived task, moved out of task_logs together with the task."""
+    __tablename__ = "archived_task_logs"
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("archived_tasks.id"), nullable=False)
+    timestamp = Column(DateTime)
+    from_status = Column(String)
+    to_status = Column(String)
+    notes = Column(Text, nullable=True)
+    output_id = Column(Integer, ForeignKey("script_outputs.id"), nullable=True)
+    output = relationship("ScriptOutput")
+
+Index("ix_archived_task_logs_task_timestamp", ArchivedTaskLog.task_id, ArchivedTaskLog.timestamp)
+
+class DataVersion(Base):
+    """
+    A counter bumped by every change to some part of the data, so in-memory copies of that
+    part can tell whether they are still current. "catalog" covers platforms and accounts,
+    "goals" covers the goals and which tasks they have (goal writes, and tasks moving to or
+    from the archive). Task status changes bump neither; the task counters track them.
+    """
+    __tablename__ = "data_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class SchedulerLease(Base):
+    """A named lease; only its current holder runs the scheduled jobs until expires_at."""
+    __tablename__ = "scheduler_leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class ScriptJob(Base):
+    """
+    A queued script run of a task (infrastructure/worker.py). Workers lease queued jobs whose
+    run_after has come, highest priority first. A failed attempt is queued again with a later
+    run_after until max_attempts; the job is then dead and stays for inspection. The worker
+    running a job keeps the tail of its output here for /jobs/{id}/stream.
+    """
+    __tablename__ = "script_jobs"
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String, nullable=False)  # "execution" or "check"
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, nullable=False)
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    # while running: the last lines of the script's output, as a JSON list of [stream, line],
+    # and how many lines it printed so far; cleared when the attempt ends
+    live_output_json = Column(Text, nullable=True)
+    live_lines = Column(Integer, nullable=False, default=0, server_default="0")
+
+# Leasing (the due queued jobs by priority, the running jobs whose lease expired), the queue
+# depth, and the pending jobs of a task.
+Index("ix_script_jobs_status_priority_run_after", ScriptJob.status, ScriptJob.priority, ScriptJob.run_after)
+Index("ix_script_jobs_status_lease_expires_at", ScriptJob.status, ScriptJob.lease_expires_at)
+Index("ix_script_jobs_task_status", ScriptJob.task_id, ScriptJob.status)
+# At most one queued or running job per task and kind, so concurrent enqueues cannot both insert.
+Index("ux_script_jobs_pending_task_kind", ScriptJob.task_id, ScriptJob.kind, unique=True,
+      sqlite_where=ScriptJob.status.in_(["queued", "running"]),
+      postgresql_where=ScriptJob.status.in_(["queued", "running"]))
@@ -0,0 +1,200 @@
+"""
+Query-plan regression check for the repositories.
+
+Seeds a throwaway SQLite database, runs every repository query against it, and asks
+SQLite for the plan of each statement that was sent (EXPLAIN QUERY PLAN). A plan step
+that scans a whole table without an index fails the check, unless the query is meant
+to read that table in full (listing pages, for example). Checks can also cap the number
+of statements a call may send, to catch N+1 queries.
+
+Run it with:  python -m infrastructure.query_plans
+"""
+import re
+import sys
+from datetime import date, datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from domain.models import TaskLog
+from . import orm
+from .data_versions import read_data_version
+from .database import Base
+from .repositories import (
+    SQLAlchemyPlatformRepository, SQLAlchemyAccountRepository,
+    SQLAlchemyGoalRepository, SQLAlchemyTaskRepository, SQLAlchemyTaskLogRepository, load_catalog
+)
+from .script_jobs import SQLAlchemyScriptJobRepository
+from .script_outputs import SQLAlchemyScriptOutputRepository
+from .task_counters import read_task_counts_revision, rebuild_task_counts
+
+# "SCAN tasks" and "SCAN tasks USING INDEX ..." read every row of the table;
+# "SCAN tasks USING COVERING INDEX ..." only reads an index and is fine.
+FULL_SCAN = re.compile(r"^SCAN (\w+)\b(?! USING COVERING INDEX)")
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    run: Callable[[dict], object]
+    # tables the query reads in full on purpose
+    full_scan_ok: Set[str] = set()
+    # most statements the call may send (None: no limit)
+    max_statements: Optional[int] = None
+
+
+CHECKS: List[PlanCheck] = [
+    PlanCheck("PlatformRepository.get_by_id", lambda r: r["platforms"].get_by_id(1)),
+    PlanCheck("PlatformRepository.list_all", lambda r: r["platforms"].list_all(), {"platforms"}),
+    PlanCheck("AccountRepository.get_by_id", lambda r: r["accounts"].get_by_id(1)),
+    PlanCheck("AccountRepository.list_by_platform", lambda r: r["accounts"].list_by_platform(1)),
+    PlanCheck("AccountRepository.list_all", lambda r: r["accounts"].list_all(), {"accounts"}),
+    PlanCheck("AccountRepository.get_dashboard_summary", lambda r: r["accounts"].get_dashboard_summary(),
+              {"platforms", "accounts", "task_counts"}),
+    PlanCheck("GoalRepository.get_by_id", lambda r: r["goals"].get_by_id(1)),
+    PlanCheck("GoalRepository.list_all", lambda r: r["goals"].list_all(), {"goals"}),
+    PlanCheck("GoalRepository.list_options", lambda r: r["goals"].list_options(), {"goals"}, max_statements=1),
+    PlanCheck("GoalRepository.list_due", lambda r: r["goals"].list_due(date.today())),
+    PlanCheck("GoalRepository.set_next_due_dates",
+              lambda r: r["goals"].set_next_due_dates({(1, 1): date.today(), (2, None): None})),
+    PlanCheck("TaskRepository.get_by_id", lambda r: r["tasks"].get_by_id(1)),
+    # A status change reads one row and writes with an UPDATE, the log INSERT and the counter upsert.
+    PlanCheck("TaskRepository.get_for_transition", lambda r: r["tasks"].get_for_transition(1), max_statements=1),
+    PlanCheck("TaskRepository.transition",
+              lambda r: r["tasks"].transition(TaskLog(None, 1, datetime.utcnow(), "Waiting", "In Progress")),
+              max_statements=3),
+    PlanCheck("TaskRepository.get_many_for_transition",
+              lambda r: r["tasks"].get_many_for_transition([1, 4, 7]), max_statements=1),
+    PlanCheck("TaskRepository.transition_all",
+              lambda r: r["tasks"].transition_all(
+                  [TaskLog(None, t, datetime.utcnow(), "Waiting", "In Progress") for t in (1, 4, 7)]
+              ), max_statements=3),
+    PlanCheck("TaskRepository.list_all", lambda r: r["tasks"].list_all(), {"tasks"}),
+    # A task list page is one SELECT. Unfiltered and per-platform pages walk ix_tasks_due_date_id
+    # in order and stop at the page size.
+    PlanCheck("TaskRepository.list_page", lambda r: r["tasks"].list_page(), {"tasks"}, max_statements=1),
+    PlanCheck("TaskRepository.list_page (platform)", lambda r: r["tasks"].list_page(platform_id=1), {"tasks"},
+              max_statements=1),
+    PlanCheck("TaskRepository.list_page (next page)",
+              lambda r: r["tasks"].list_page(after=(date.today() - timedelta(days=10), 500)), max_statements=1),
+    PlanCheck("TaskRepository.list_page (status)",
+              lambda r: r["tasks"].list_page(status="Waiting", after=(date.today(), 500)), max_statements=1),
+    PlanCheck("TaskRepository.list_page (goal)", lambda r: r["tasks"].list_page(goal_id=1), max_statements=1),
+    PlanCheck("TaskRepository.list_page (due dates)",
+              lambda r: r["tasks"].list_page(due_from=date.today() - timedelta(days=30), due_to=date.today()),
+              max_statements=1),
+    PlanCheck("TaskRepository.find_latest_for_goal", lambda r: r["tasks"].find_latest_for_goal(1, 1)),
+    PlanCheck("TaskRepository.find_latest_for_goal (platform-level)",
+              lambda r: r["tasks"].find_latest_for_goal(2, None)),
+    PlanCheck("TaskRepository.find_latest_for_goal_any_account",
+              lambda r: r["tasks"].find_latest_for_goal_any_account(1)),
+    PlanCheck("TaskRepository.count_completed_for_goal", lambda r: r["tasks"].count_completed_for_goal(1, [1, 2])),
+    PlanCheck("TaskRepository.find_latest_by_line", lambda r: r["tasks"].find_latest_by_line([1, 2, 3])),
+    PlanCheck("TaskRepository.count_completed_by_line", lambda r: r["tasks"].count_completed_by_line([1, 2, 3])),
+    PlanCheck("TaskLogRepository.list_by_task_id", lambda r: r["logs"].list_by_task_id(1), max_statements=1),
+    PlanCheck("load_catalog", lambda r: load_catalog(r["platforms"].db, 0), {"platforms", "accounts"}, max_statements=1),
+    PlanCheck("read_data_version", lambda r: read_data_version(r["platforms"].db, "catalog")),
+    # one row per goal line and status, far fewer than tasks
+    PlanCheck("read_task_counts_revision", lambda r: read_task_counts_revision(r["platforms"].db), {"task_counts"}),
+    PlanCheck("TaskRepository.get_archived", lambda r: r["tasks"].get_archived(1)),
+    PlanCheck("TaskLogRepository.list_archived_by_task_id", lambda r: r["logs"].list_archived_by_task_id(1),
+              max_statements=1),
+    # The chunk list first, then the bytes of the chunks in range: two statements.
+    PlanCheck("ScriptOutputRepository.get_range", lambda r: r["outputs"].get_range(1, 0, 100), max_statements=2),
+    # Leasing requeues expired jobs (dead ones first) and takes the due ones: three statements.
+    PlanCheck("ScriptJobRepository.lease", lambda r: r["jobs"].lease("worker", 4, 60), max_statements=3),
+    PlanCheck("ScriptJobRepository.finish", lambda r: r["jobs"].finish(1, "worker"), max_statements=1),
+    PlanCheck("ScriptJobRepository.count_pending", lambda r: r["jobs"].count_pending(), max_statements=1),
+    PlanCheck("ScriptJobRepository.find_pending", lambda r: r["jobs"].find_pending(1, "execution"), max_statements=1),
+    PlanCheck("ScriptJobRepository.list_by_task_id", lambda r: r["jobs"].list_by_task_id(1), max_statements=1),
+    PlanCheck("ScriptJobRepository.get_live_output", lambda r: r["jobs"].get_live_output(1), max_statements=1),
+    PlanCheck("ScriptJobRepository.set_live_output", lambda r: r["jobs"].set_live_output(1, "worker", 1, [("stdout", "x")]),
+              max_statements=1),
+]
+
+
+def seed(db) -> None:
+    """Fills the database with enough rows for the plans to be realistic."""
+    today = date.today()
+    db.add_all([orm.Platform(id=p, name=f"platform-{p}", config={}) for p in range(1, 4)])
+    db.add_all([orm.Account(id=a, platform_id=a % 3 + 1, username=f"account-{a}") for a in range(1, 10)])
+    for g in range(1, 31):
+        account_ids = None if g % 2 == 0 else [g % 9 + 1, (g + 1) % 9 + 1]
+        db.add(orm.Goal(
+            id=g, description=f"goal-{g}", platform_id=g % 3 + 1, start_date=today - timedelta(days=400),
+            policy_json='{"type": "FixedInterval", "days": 1}', account_ids_json=account_ids,
+            status="Active", task_distribution_strategy="all", catchup_strategy="all",
+            lines=[orm.GoalLine(account_id=a, next_due_date=today) for a in (account_ids or [None])]
+        ))
+        for a in account_ids or [None]:
+            for d in range(100):
+                db.add(orm.Task(goal_id=g, account_id=a, due_date=today - timedelta(days=d),
+                                status="Completed" if d % 3 else "Waiting"))
+    db.flush()
+    db.add_all([orm.TaskLog(task_id=t, timestamp=datetime.utcnow(), from_status="Waiting", to_status="Completed")
+                for t in range(1, 3000, 2)])
+    db.add_all([orm.ScriptJob(task_id=t, kind="execution", priority=t % 3, status="done" if t % 4 else "queued",
+                              max_attempts=5, run_after=datetime.utcnow()) for t in range(1, 3000, 3)])
+    rebuild_task_counts(db)
+    db.commit()
+
+
+def full_scans(engine, statements: List[Tuple[str, tuple]]) -> Set[str]:
+    """Returns the tables scanned in full by any of the statements."""
+    scanned = set()
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection
+        for statement, parameters in statements:
+            for row in raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall():
+                match = FULL_SCAN.match(row[-1])
+                if match:
+                    # aliases look like tasks_1; subqueries (anon_1) are not tables
+                    table = re.sub(r"_\d+$", "", match.group(1))
+                    if table in Base.metadata.tables:
+                        scanned.add(table)
+    return scanned
+
+
+def run_checks() -> List[str]:
+    """Runs every check and returns a description of each failure."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    seed(db)
+    repos = {
+        "platforms": SQLAlchemyPlatformRepository(db), "accounts": SQLAlchemyAccountRepository(db),
+        "goals": SQLAlchemyGoalRepository(db), "tasks": SQLAlchemyTaskRepository(db),
+        "logs": SQLAlchemyTaskLogRepository(db), "outputs": SQLAlchemyScriptOutputRepository(db),
+        "jobs": SQLAlchemyScriptJobRepository(db),
+    }
+
+    statements: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0]
+        statements.append((statement, tuple(parameters)))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    failures = []
+    for check in CHECKS:
+        statements.clear()
+        db.expire_all()
+        check.run(repos)
+        db.rollback()
+        scanned = full_scans(engine, statements) - check.full_scan_ok
+        if scanned:
+            failures.append(f"{check.name}: full scan of {', '.join(sorted(scanned))}")
+        if check.max_statements is not None and len(statements) > check.max_statements:
+            failures.append(f"{check.name}: {len(statements)} statements, expected at most {check.max_statements}")
+    event.remove(engine, "before_cursor_execute", capture)
+    db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    failures = run_checks()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(CHECKS) - len(failures)}/{len(CHECKS)} repository queries use their indexes.")
+    sys.exit(1 if failures else 0)
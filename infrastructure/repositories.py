@@ -1,12 +1,13 @@
+import copy
 import json
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, case
-from typing import List, Optional, Dict
+from sqlalchemy.orm import Session, joinedload, object_session
+from sqlalchemy import JSON, cast, delete, func, case, update, tuple_, type_coerce
+from typing import List, NamedTuple, Optional, Dict, Set, Tuple
 from datetime import date, datetime
 
 from domain.models import (
     Platform as DomainPlatform, Goal as DomainGoal, Task as DomainTask, 
-    Account as DomainAccount, TaskLog as DomainTaskLog
+    Account as DomainAccount, TaskLog as DomainTaskLog, policy_context_string
 )
 from domain.policies import FixedInterval, DeadlineDistribution, SchedulingPolicy
 from domain.states import SkippedState, WaitingState, InProgressState, CompletedState, FailedState, TaskState
@@ -15,7 +16,17 @@ from domain.strategies import (
     ScriptExecution, ManualCheck, ScriptCheck
 )
 
+from application.read_models import GoalOption, TaskListItem
+from settings import ARCHIVE_BATCH_SIZE, GOAL_CACHE_SIZE
 from . import orm
+from .archive import delete_account_tasks, delete_archived_tasks, restore_archived_tasks
+from .catalog_cache import Catalog, CatalogCache
+from .data_versions import bump_data_version, read_data_version
+from .database import insert_ignoring_duplicates
+from .goal_cache import RevisionedLRU
+from .script_jobs import SQLAlchemyScriptJobRepository
+from .script_outputs import SQLAlchemyScriptOutputRepository
+from .task_counters import add_task_counts
 
 STATE_MAP_TO_DOMAIN: Dict[str, TaskState] = {
     "Waiting": WaitingState(),
@@ -25,6 +36,19 @@ STATE_MAP_TO_DOMAIN: Dict[str, TaskState] = {
     "Skipped": SkippedState(),
 }
 
+def json_text_field(db: Session, column, key: str):
+    """
+    SQL expression for the text value of a top-level key of the JSON document stored in a
+    text column (column ->> key), to select it without loading and decoding the whole document.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return cast(column, JSON)[key].as_string()
+    if dialect == "sqlite":
+        # a CAST would give the text NUMERIC affinity in SQLite; JSON_EXTRACT reads text as is
+        return type_coerce(column, JSON)[key].as_string()
+    raise NotImplementedError(f"Dialect {dialect} not supported")
+
 def orm_to_domain_task(t: orm.Task) -> DomainTask:
     task = DomainTask(
         id=t.id,
@@ -34,13 +58,13 @@ def orm_to_domain_task(t: orm.Task) -> DomainTask:
         account_id=t.account_id
     )
     if t.goal:
-        domain_goal = orm_to_domain_goal(t.goal)
+        domain_goal, context = session_domain_goal(t.goal)
         task.goal_description = domain_goal.description
         if t.goal.platform:
             task.platform_name = t.goal.platform.name
         else:
             task.platform_name = "N/A"
-        task.goal_context = domain_goal.get_context_string()
+        task.goal_context = context
         task.goal = domain_goal
     else:
         task.goal_description = "N/A"
@@ -59,14 +83,37 @@ class SQLAlchemyTaskLogRepository:
             timestamp=log.timestamp,
             from_status=log.from_status,
             to_status=log.to_status,
-            notes=log.notes
+            notes=log.notes,
+            output_id=log.output_id
         )
         self.db.add(orm_log)
-        self.db.commit()
+        self.db.flush()
 
     def list_by_task_id(self, task_id: int) -> List[DomainTaskLog]:
-        orm_logs = self.db.query(orm.TaskLog).filter(orm.TaskLog.task_id == task_id).order_by(orm.TaskLog.timestamp.asc()).all()
-        return [orm_to_domain_task_log(log) for log in orm_logs]
+        """The task's logs, with the sizes of their script outputs (the outputs themselves are not loaded)."""
+        orm_logs = self.db.query(orm.TaskLog).options(
+            joinedload(orm.TaskLog.output).load_only(orm.ScriptOutput.size, orm.ScriptOutput.original_size)
+        ).filter(orm.TaskLog.task_id == task_id).order_by(orm.TaskLog.timestamp.asc()).all()
+        logs = []
+        for orm_log in orm_logs:
+            log = orm_to_domain_task_log(orm_log)
+            log.output_size = orm_log.output.size if orm_log.output else None
+            log.output_original_size = orm_log.output.original_size if orm_log.output else None
+            logs.append(log)
+        return logs
+
+    def list_archived_by_task_id(self, task_id: int) -> List[DomainTaskLog]:
+        """Like list_by_task_id, for a task moved to the archive."""
+        orm_logs = self.db.query(orm.ArchivedTaskLog).options(
+            joinedload(orm.ArchivedTaskLog.output).load_only(orm.ScriptOutput.size, orm.ScriptOutput.original_size)
+        ).filter(orm.ArchivedTaskLog.task_id == task_id).order_by(orm.ArchivedTaskLog.timestamp.asc()).all()
+        logs = []
+        for orm_log in orm_logs:
+            log = orm_to_domain_task_log(orm_log)
+            log.output_size = orm_log.output.size if orm_log.output else None
+            log.output_original_size = orm_log.output.original_size if orm_log.output else None
+            logs.append(log)
+        return logs
 
 STATE_MAP_TO_DOMAIN: Dict[str, TaskState] = {
     "Waiting": WaitingState(),
@@ -83,7 +130,8 @@ def orm_to_domain_task_log(log: orm.TaskLog) -> DomainTaskLog:
         timestamp=log.timestamp,
         from_status=log.from_status,
         to_status=log.to_status,
-        notes=log.notes
+        notes=log.notes,
+        output_id=log.output_id
     )
 
 def orm_to_domain_strategy(strategy_json: str) -> ExecutionStrategy | CheckStrategy:
@@ -115,6 +163,57 @@ def orm_to_domain_policy(policy_json: str) -> SchedulingPolicy:
         return DeadlineDistribution(**data)
     raise NotImplementedError(f"Policy type {policy_type} not implemented")
 
+class GoalJson(NamedTuple):
+    """The decoded JSON columns of a goal. They are never mutated, so sessions can share them."""
+    policy: SchedulingPolicy
+    execution_strategy: ExecutionStrategy
+    check_strategy: CheckStrategy
+
+# Decoded goal JSON shared by all sessions of the process, valid for one revision of the goal
+goal_json_cache: RevisionedLRU[GoalJson] = RevisionedLRU(GOAL_CACHE_SIZE)
+# Session.info key of the per-session identity map: goal id -> (revision, domain goal, context string)
+GOAL_IDENTITY_MAP = "domain_goals"
+# Session.info key of the goals written in the transaction, evicted once it ends
+FORGOTTEN_GOALS = "forgotten_goals"
+
+def decode_goal_json(g: orm.Goal) -> GoalJson:
+    decoded = goal_json_cache.get(g.id, g.revision)
+    if decoded is None:
+        decoded = GoalJson(
+            policy=orm_to_domain_policy(g.policy_json),
+            execution_strategy=orm_to_domain_strategy(g.execution_strategy_json),
+            check_strategy=orm_to_domain_strategy(g.check_strategy_json),
+        )
+        goal_json_cache.put(g.id, g.revision, decoded)
+    return decoded
+
+def session_domain_goal(g: orm.Goal) -> Tuple[DomainGoal, str]:
+    """
+    Returns the domain goal of the row and its context string, built once per session and
+    goal revision: all tasks of a goal loaded in one session share the same instance.
+    """
+    db = object_session(g)
+    if db is None:
+        goal = orm_to_domain_goal(g)
+        return goal, goal.get_context_string()
+    identity_map = db.info.setdefault(GOAL_IDENTITY_MAP, {})
+    entry = identity_map.get(g.id)
+    if entry is None or entry[0] != g.revision:
+        goal = orm_to_domain_goal(g)
+        entry = identity_map[g.id] = (g.revision, goal, goal.get_context_string())
+    return entry[1], entry[2]
+
+def forget_goal(db: Session, goal_id: int):
+    """Drops the goal from the process cache and the session's identity map when the transaction ends."""
+    db.info.setdefault(FORGOTTEN_GOALS, set()).add(goal_id)
+
+def end_goal_transaction(db: Session):
+    """After a commit or rollback, evicts the goals the transaction wrote."""
+    identity_map = db.info.get(GOAL_IDENTITY_MAP, {})
+    for goal_id in db.info.pop(FORGOTTEN_GOALS, ()):
+        goal_json_cache.discard(goal_id)
+        identity_map.pop(goal_id, None)
+
 def orm_to_domain_platform(p: orm.Platform) -> DomainPlatform:
     return DomainPlatform(id=p.id, name=p.name, config=p.config or {})
 
@@ -122,16 +221,17 @@ def orm_to_domain_account(a: orm.Account) -> DomainAccount:
     return DomainAccount(id=a.id, platform_id=a.platform_id, username=a.username, notes=a.notes)
 
 def orm_to_domain_goal(g: orm.Goal) -> DomainGoal:
+    decoded = decode_goal_json(g)
     goal = DomainGoal(
         id=g.id,
         platform_id=g.platform_id,
         description=g.description,
         start_date=g.start_date,
         end_date=g.end_date,
-        policy=orm_to_domain_policy(g.policy_json),
+        policy=decoded.policy,
         account_ids=g.account_ids_json,
-        execution_strategy=orm_to_domain_strategy(g.execution_strategy_json),
-        check_strategy=orm_to_domain_strategy(g.check_strategy_json),
+        execution_strategy=decoded.execution_strategy,
+        check_strategy=decoded.check_strategy,
         task_distribution_strategy=g.task_distribution_strategy,
         catchup_strategy=g.catchup_strategy,
         status=g.status
@@ -151,7 +251,7 @@ class SQLAlchemyPlatformRepository:
         else:
             orm_platform = orm.Platform(name=platform.name, config=platform.config or {})
             self.db.add(orm_platform)
-        self.db.commit()
+        self.db.flush()
     def get_by_id(self, platform_id: int) -> Optional[DomainPlatform]:
         orm_platform = self.db.query(orm.Platform).filter(orm.Platform.id == platform_id).first()
         return orm_to_domain_platform(orm_platform) if orm_platform else None
@@ -163,50 +263,55 @@ class SQLAlchemyAccountRepository:
     def save(self, account: DomainAccount):
         orm_account = orm.Account(platform_id=account.platform_id, username=account.username, notes=account.notes)
         self.db.add(orm_account)
-        self.db.commit()
+        self.db.flush()
     def get_by_id(self, account_id: int) -> Optional[DomainAccount]:
         orm_acc = self.db.query(orm.Account).filter(orm.Account.id == account_id).first()
         return orm_to_domain_account(orm_acc) if orm_acc else None
     def list_by_platform(self, platform_id: int) -> List[DomainAccount]:
         return [orm_to_domain_account(a) for a in self.db.query(orm.Account).filter(orm.Account.platform_id == platform_id).all()]
+    def list_all(self) -> List[DomainAccount]:
+        return [orm_to_domain_account(a) for a in self.db.query(orm.Account).order_by(orm.Account.username).all()]
     def delete(self, account_id: int):
         orm_acc = self.db.query(orm.Account).filter(orm.Account.id == account_id).first()
         if orm_acc:
+            # The account's tasks go with it: as platform-level tasks they would collide with
+            # those of the goal's other lines on uq_tasks_goal_account_due.
+            delete_account_tasks(self.db, account_id)
+            self.db.expire(orm_acc, ["tasks"])
             self.db.delete(orm_acc)
-            self.db.commit()
+            self.db.flush()
 
     def get_dashboard_summary(self) -> List[dict]:
         """
         Generates a dashboard summary with detailed task counts per account.
-        This new version uses conditional aggregation to count multiple task statuses at once.
+        The counts are summed from the task counters, which have one row per goal line and
+        status, so the cost follows the number of lines rather than the size of the task history.
         """
         all_platforms = self.db.query(orm.Platform).options(joinedload(orm.Platform.accounts)).order_by(orm.Platform.name).all()
         platforms_dict = {p.id: {"id": p.id, "name": p.name, "accounts": []} for p in all_platforms}
 
-        # Subquery to get the last completed activity date for each account
-        last_completed_q = self.db.query(
-            orm.Task.account_id, func.max(orm.Task.due_date).label("last_activity_date")
-        ).filter(orm.Task.status == "Completed").group_by(orm.Task.account_id).subquery()
+        def count_of(status: str):
+            return func.sum(case((orm.TaskCount.status == status, orm.TaskCount.count), else_=0))
 
-        # Subquery to get aggregated counts of tasks in various states for each account
+        # Last completed activity date and counts of tasks in various states for each account
         task_counts_q = self.db.query(
-            orm.Task.account_id,
-            func.sum(case((orm.Task.status == "Waiting", 1), else_=0)).label("waiting_count"),
-            func.sum(case((orm.Task.status == "In Progress", 1), else_=0)).label("in_progress_count"),
-            func.sum(case((orm.Task.status == "Failed", 1), else_=0)).label("failed_count"),
-            func.sum(case((orm.Task.status == "Skipped", 1), else_=0)).label("skipped_count")
-        ).group_by(orm.Task.account_id).subquery()
-
-        # Main query joining account info with the two subqueries
+            orm.TaskCount.account_key,
+            func.max(case((orm.TaskCount.status == "Completed", orm.TaskCount.max_due_date))).label("last_activity_date"),
+            count_of("Waiting").label("waiting_count"),
+            count_of("In Progress").label("in_progress_count"),
+            count_of("Failed").label("failed_count"),
+            count_of("Skipped").label("skipped_count")
+        ).group_by(orm.TaskCount.account_key).subquery()
+
+        # Main query joining account info with the counts
         accounts_data = self.db.query(
             orm.Account,
-            last_completed_q.c.last_activity_date,
+            task_counts_q.c.last_activity_date,
             task_counts_q.c.waiting_count,
             task_counts_q.c.in_progress_count,
             task_counts_q.c.failed_count,
             task_counts_q.c.skipped_count
-        ).outerjoin(last_completed_q, orm.Account.id == last_completed_q.c.account_id) \
-         .outerjoin(task_counts_q, orm.Account.id == task_counts_q.c.account_id).all()
+        ).outerjoin(task_counts_q, orm.Account.id == task_counts_q.c.account_key).all()
 
         for account, last_activity, waiting, in_progress, failed, skipped in accounts_data:
             if account.platform_id in platforms_dict:
@@ -220,6 +325,85 @@ class SQLAlchemyAccountRepository:
                 })
         return list(platforms_dict.values())
 
+# Platforms and accounts change rarely and are read everywhere: each process keeps a copy of
+# all of them, valid for one version of the catalog.
+catalog_cache = CatalogCache()
+# Session.info keys: the catalog version the session reads at, and whether it changed the catalog
+CATALOG_VERSION = "catalog_version"
+CATALOG_CHANGED = "catalog_changed"
+
+def load_catalog(db: Session, version: int) -> Catalog:
+    """Reads all platforms with their accounts in one joined query."""
+    orm_platforms = db.query(orm.Platform).options(joinedload(orm.Platform.accounts)).order_by(orm.Platform.id).all()
+    platforms = {p.id: orm_to_domain_platform(p) for p in orm_platforms}
+    accounts = {a.id: orm_to_domain_account(a) for a in sorted(
+        (a for p in orm_platforms for a in p.accounts), key=lambda a: a.id
+    )}
+    return Catalog(version, platforms, accounts)
+
+def session_catalog(db: Session) -> Optional[Catalog]:
+    """
+    The catalog as of the version the session reads at (looked up once per session), from the
+    process cache when it holds that version. None once the session changed the catalog itself,
+    since its uncommitted view must not be cached.
+    """
+    if db.info.get(CATALOG_CHANGED):
+        return None
+    version = db.info.get(CATALOG_VERSION)
+    if version is None:
+        version = db.info[CATALOG_VERSION] = read_data_version(db, "catalog")
+    catalog = catalog_cache.get(version)
+    if catalog is None:
+        catalog = load_catalog(db, version)
+        catalog_cache.put(catalog)
+    return catalog
+
+def mark_catalog_changed(db: Session):
+    """Bumps the catalog version in the session's transaction and drops this process's copy."""
+    bump_data_version(db, "catalog")
+    db.info[CATALOG_CHANGED] = True
+    catalog_cache.clear()
+
+def end_catalog_transaction(db: Session):
+    """After a commit or rollback, the session reads the catalog at the version current then."""
+    db.info.pop(CATALOG_CHANGED, None)
+    db.info.pop(CATALOG_VERSION, None)
+
+# The cached repositories hand out the catalog's own objects in lists, which are only rendered,
+# and a shallow copy from get_by_id, whose callers may set attributes before saving. Nothing
+# changes a platform's config dict in place; an update assigns a new one.
+
+class CachedPlatformRepository(SQLAlchemyPlatformRepository):
+    """Reads platforms from the catalog cache; writes go through to the database."""
+    def get_by_id(self, platform_id: int) -> Optional[DomainPlatform]:
+        catalog = session_catalog(self.db)
+        if catalog is None:
+            return super().get_by_id(platform_id)
+        return copy.copy(catalog.platforms.get(platform_id))
+    def list_all(self) -> List[DomainPlatform]:
+        catalog = session_catalog(self.db)
+        if catalog is None:
+            return super().list_all()
+        return list(catalog.platforms.values())
+
+class CachedAccountRepository(SQLAlchemyAccountRepository):
+    """Reads accounts from the catalog cache; writes and the dashboard counts go to the database."""
+    def get_by_id(self, account_id: int) -> Optional[DomainAccount]:
+        catalog = session_catalog(self.db)
+        if catalog is None:
+            return super().get_by_id(account_id)
+        return copy.copy(catalog.accounts.get(account_id))
+    def list_by_platform(self, platform_id: int) -> List[DomainAccount]:
+        catalog = session_catalog(self.db)
+        if catalog is None:
+            return super().list_by_platform(platform_id)
+        return [a for a in catalog.accounts.values() if a.platform_id == platform_id]
+    def list_all(self) -> List[DomainAccount]:
+        catalog = session_catalog(self.db)
+        if catalog is None:
+            return super().list_all()
+        return sorted(catalog.accounts.values(), key=lambda a: a.username)
+
 class SQLAlchemyGoalRepository:
     def __init__(self, db: Session): self.db = db
     def save(self, goal: DomainGoal):
@@ -244,13 +428,22 @@ class SQLAlchemyGoalRepository:
             catchup_strategy=goal.catchup_strategy,
             status=goal.status
         )
+        orm_goal.lines = self._schedule_lines(goal)
         self.db.add(orm_goal)
-        self.db.commit()
+        bump_data_version(self.db, "goals")
+        self.db.flush()
     def list_all(self) -> List[DomainGoal]:
         orm_goals = self.db.query(orm.Goal).options(
             joinedload(orm.Goal.platform)
         ).order_by(orm.Goal.id.desc()).all()
         return [orm_to_domain_goal(g) for g in orm_goals]
+    def list_options(self) -> List[GoalOption]:
+        """Every goal's id and label, newest first, from a projection: only goals without a description have their policy decoded."""
+        rows = self.db.query(orm.Goal.id, orm.Goal.description, orm.Goal.policy_json).order_by(orm.Goal.id.desc())
+        return [
+            GoalOption(row.id, row.description or policy_context_string(orm_to_domain_policy(row.policy_json)))
+            for row in rows
+        ]
     def get_by_id(self, goal_id: int) -> Optional[DomainGoal]:
         orm_goal = self.db.query(orm.Goal).filter(orm.Goal.id == goal_id).first()
         return orm_to_domain_goal(orm_goal) if orm_goal else None
@@ -281,53 +474,202 @@ class SQLAlchemyGoalRepository:
         orm_goal.check_strategy_json = json.dumps(goal.check_strategy.to_dict())
         orm_goal.task_distribution_strategy = goal.task_distribution_strategy
         orm_goal.catchup_strategy = goal.catchup_strategy
-
-        self.db.commit()
+        orm_goal.lines = self._schedule_lines(goal)
+        # other processes see the new revision and stop using what they decoded before; the
+        # UPDATE sets revision = revision + 1, so concurrent updates never lose an increment
+        orm_goal.revision = orm.Goal.revision + 1
+        bump_data_version(self.db, "goals")
+
+        self.db.flush()
+        forget_goal(self.db, goal.id)
+
+    def restore_archived(self, goal_id: int) -> int:
+        """Moves up to ARCHIVE_BATCH_SIZE archived tasks of the goal back, as the archiver moved them out."""
+        moved = restore_archived_tasks(self.db, goal_id, ARCHIVE_BATCH_SIZE)
+        if moved:
+            bump_data_version(self.db, "goals")
+        return moved
 
     def delete(self, goal_id: int):
         orm_goal = self.db.query(orm.Goal).filter(orm.Goal.id == goal_id).first()
         if orm_goal:
+            self.db.execute(delete(orm.TaskCount).where(orm.TaskCount.goal_id == goal_id))
+            delete_archived_tasks(self.db, goal_id)
             self.db.delete(orm_goal)
-            self.db.commit()
+            bump_data_version(self.db, "goals")
+            self.db.flush()
+            forget_goal(self.db, goal_id)
+
+    def _schedule_lines(self, goal: DomainGoal) -> List[orm.GoalLine]:
+        """
+        Builds the goal's lines with the earliest date each one can be due.
+        That is exact for a new goal; for an edited goal it is a lower bound
+        that the next generation run replaces with the exact date.
+        """
+        next_due = goal.next_due_date(None)
+        return [orm.GoalLine(account_id=acc_id, next_due_date=next_due) for acc_id in goal.schedule_lines()]
+
+    def list_due(self, on: date) -> List[Tuple[DomainGoal, List[Optional[int]]]]:
+        """Returns the active goals with at least one line due on or before the given date, with those lines."""
+        orm_lines = self.db.query(orm.GoalLine).join(orm.GoalLine.goal).options(
+            joinedload(orm.GoalLine.goal).joinedload(orm.Goal.platform)
+        ).filter(
+            orm.GoalLine.next_due_date <= on,
+            orm.Goal.status == "Active"
+        ).all()
+
+        due: Dict[int, Tuple[DomainGoal, List[Optional[int]]]] = {}
+        for line in orm_lines:
+            if line.goal_id not in due:
+                due[line.goal_id] = (orm_to_domain_goal(line.goal), [])
+            due[line.goal_id][1].append(line.account_id)
+        # Sorted here rather than in SQL so the query stays on the next_due_date index.
+        return [due[goal_id] for goal_id in sorted(due, reverse=True)]
+
+    def set_next_due_dates(self, next_due: Dict[Tuple[int, Optional[int]], Optional[date]]):
+        """Moves the watermark of the given (goal_id, account_id) lines with one bulk UPDATE."""
+        if not next_due:
+            return
+        goal_ids = {goal_id for goal_id, _ in next_due}
+        lines = self.db.query(orm.GoalLine.id, orm.GoalLine.goal_id, orm.GoalLine.account_id).filter(
+            orm.GoalLine.goal_id.in_(goal_ids)
+        ).all()
+        params = [
+            {"id": line.id, "next_due_date": next_due[(line.goal_id, line.account_id)]}
+            for line in lines if (line.goal_id, line.account_id) in next_due
+        ]
+        if params:
+            self.db.execute(update(orm.GoalLine), params)
 
 class SQLAlchemyTaskRepository:
     def __init__(self, db: Session): self.db = db
     def save(self, task: DomainTask):
         if task.id:
             orm_task = self.db.query(orm.Task).filter(orm.Task.id == task.id).first()
-            if orm_task:
+            if orm_task and orm_task.status != task.status.name:
+                add_task_counts(self.db, [
+                    (orm_task.goal_id, orm_task.account_id, orm_task.status, -1, None),
+                    (orm_task.goal_id, orm_task.account_id, task.status.name, 1, orm_task.due_date),
+                ])
                 orm_task.status = task.status.name
         else:
-            orm_task = orm.Task(
-                goal_id=task.goal_id, due_date=task.due_date,
-                status=task.status.name, account_id=task.account_id
+            # New tasks only come from generation, which may run concurrently.
+            self.save_all([task])
+            return
+        self.db.flush()
+
+    def get_for_transition(self, task_id: int) -> Optional[DomainTask]:
+        """
+        Loads the task's own columns only, without its goal, platform or account:
+        enough to check a status change against the task states.
+        """
+        return self.get_many_for_transition([task_id]).get(task_id)
+
+    def get_many_for_transition(self, task_ids: List[int]) -> Dict[int, DomainTask]:
+        """Like get_for_transition, for many tasks with one SELECT; keyed by task id."""
+        rows = self.db.query(
+            orm.Task.id, orm.Task.goal_id, orm.Task.due_date, orm.Task.status, orm.Task.account_id
+        ).filter(orm.Task.id.in_(task_ids)).all()
+        return {
+            row.id: DomainTask(
+                id=row.id, goal_id=row.goal_id, due_date=row.due_date,
+                status=STATE_MAP_TO_DOMAIN.get(row.status, WaitingState()), account_id=row.account_id
             )
-            self.db.add(orm_task)
-        self.db.commit()
+            for row in rows
+        }
+
+    def transition(self, log: DomainTaskLog) -> bool:
+        """
+        Moves the task from log.from_status to log.to_status and records the log entry, with
+        one UPDATE ... WHERE status = from_status and one INSERT. The UPDATE is a compare-and-set:
+        if another writer changed the status first it matches no row, nothing is written and
+        False is returned.
+        """
+        return log.task_id in self.transition_all([log])
+
+    def transition_all(self, logs: List[DomainTaskLog]) -> Set[int]:
+        """
+        Applies many status changes as transition() does, batched: one compare-and-set UPDATE
+        per (from, to) pair of statuses, one INSERT for all the log entries and one counter upsert.
+        Returns the ids of the tasks that were changed; the others had been changed by another writer.
+        """
+        task_ids_by_change: Dict[Tuple[str, str], List[int]] = {}
+        for log in logs:
+            task_ids_by_change.setdefault((log.from_status, log.to_status), []).append(log.task_id)
+
+        changed = {}
+        for (from_status, to_status), task_ids in task_ids_by_change.items():
+            rows = self.db.execute(
+                update(orm.Task)
+                .where(orm.Task.id.in_(task_ids), orm.Task.status == from_status)
+                .values(status=to_status)
+                .returning(orm.Task.id, orm.Task.goal_id, orm.Task.account_id, orm.Task.due_date)
+            ).all()
+            changed.update((row.id, row) for row in rows)
+
+        applied = [log for log in logs if log.task_id in changed]
+        if not applied:
+            return set()
+        self.db.execute(orm.TaskLog.__table__.insert(), [
+            {"task_id": log.task_id, "timestamp": log.timestamp, "from_status": log.from_status,
+             "to_status": log.to_status, "notes": log.notes, "output_id": log.output_id}
+            for log in applied
+        ])
+        counts = []
+        for log in applied:
+            task = changed[log.task_id]
+            counts.append((task.goal_id, task.account_id, log.from_status, -1, None))
+            counts.append((task.goal_id, task.account_id, log.to_status, 1, task.due_date))
+        add_task_counts(self.db, counts)
+        return set(changed)
+
+    def save_all(self, tasks: List[DomainTask]):
+        """
+        Inserts new tasks with one bulk INSERT.
+        Tasks that already exist for their (goal, account, due date) are skipped.
+        """
+        if not tasks:
+            return
+        inserted = self.db.execute(
+            insert_ignoring_duplicates(self.db, orm.Task).returning(
+                orm.Task.goal_id, orm.Task.account_id, orm.Task.status, orm.Task.due_date
+            ),
+            [
+                {"goal_id": t.goal_id, "due_date": t.due_date, "status": t.status.name, "account_id": t.account_id}
+                for t in tasks
+            ]
+        ).all()
+        # only the rows actually inserted are counted
+        add_task_counts(self.db, [(row.goal_id, row.account_id, row.status, 1, row.due_date) for row in inserted])
 
     def find_latest_for_goal_any_account(self, goal_id: int) -> Optional[DomainTask]:
         """Finds the most recent task for a goal, irrespective of the account."""
         orm_task = self.db.query(orm.Task)\
             .filter(orm.Task.goal_id == goal_id)\
-            .order_by(orm.Task.due_date.desc())\
+            .order_by(orm.Task.due_date.desc(), orm.Task.id.desc())\
             .first()
         return orm_to_domain_task(orm_task) if orm_task else None
     def get_by_id(self, task_id: int) -> Optional[DomainTask]:
         orm_task = self.db.query(orm.Task).filter(orm.Task.id == task_id).first()
         return orm_to_domain_task(orm_task) if orm_task else None
 
+    def get_archived(self, task_id: int) -> Optional[DomainTask]:
+        """A task moved to the archive by the archival job, with the same details as get_by_id."""
+        orm_task = self.db.query(orm.ArchivedTask).filter(orm.ArchivedTask.id == task_id).first()
+        return orm_to_domain_task(orm_task) if orm_task else None
+
     def count_completed_for_goal(self, goal_id: int, account_ids: Optional[List[int]]) -> int:
         """Counts completed tasks for a goal, for platform-level or specific accounts."""
-        query = self.db.query(func.count(orm.Task.id)).filter(
-            orm.Task.goal_id == goal_id,
-            orm.Task.status == "Completed"
+        query = self.db.query(func.sum(orm.TaskCount.count)).filter(
+            orm.TaskCount.goal_id == goal_id,
+            orm.TaskCount.status == "Completed"
         )
         if account_ids is None:
             # Handles platform-level goals (no accounts associated)
-            query = query.filter(orm.Task.account_id.is_(None))
+            query = query.filter(orm.TaskCount.account_key == 0)
         else:
             # Handles goals with one or more accounts
-            query = query.filter(orm.Task.account_id.in_(account_ids))
+            query = query.filter(orm.TaskCount.account_key.in_(account_ids))
         return query.scalar() or 0
 
     def list_all(self) -> List[DomainTask]:
@@ -337,8 +679,127 @@ class SQLAlchemyTaskRepository:
         ).order_by(orm.Task.due_date.desc()).all()
         return [orm_to_domain_task(t) for t in orm_tasks]
 
+    def list_page(self, status: Optional[str] = None, platform_id: Optional[int] = None,
+                  account_id: Optional[int] = None, goal_id: Optional[int] = None,
+                  due_from: Optional[date] = None, due_to: Optional[date] = None,
+                  after: Optional[Tuple[date, int]] = None, limit: int = 50) -> List[TaskListItem]:
+        """
+        Returns up to `limit` task list rows matching the filters, latest due date first (ties by id).
+        Pages are keyset-paginated on (due_date, id): pass the (due_date, id) of the last task
+        of a page as `after` to get the next one, so a page costs the same however long the history is.
+        The rows come from a single SELECT of only the displayed columns; no entities are loaded.
+        """
+        query = self.db.query(
+            orm.Task.id, orm.Task.goal_id, orm.Task.due_date, orm.Task.status, orm.Task.account_id,
+            orm.Account.username,
+            orm.Platform.name.label("platform_name"), orm.Platform.config.label("platform_config"),
+            orm.Goal.description, orm.Goal.policy_json,
+            json_text_field(self.db, orm.Goal.execution_strategy_json, "type").label("execution_strategy"),
+            json_text_field(self.db, orm.Goal.check_strategy_json, "type").label("check_strategy"),
+        ).select_from(orm.Task) \
+         .outerjoin(orm.Goal, orm.Task.goal_id == orm.Goal.id) \
+         .outerjoin(orm.Platform, orm.Goal.platform_id == orm.Platform.id) \
+         .outerjoin(orm.Account, orm.Task.account_id == orm.Account.id)
+        if status:
+            query = query.filter(orm.Task.status == status)
+        if platform_id:
+            query = query.filter(orm.Goal.platform_id == platform_id)
+        if account_id:
+            query = query.filter(orm.Task.account_id == account_id)
+        if goal_id:
+            query = query.filter(orm.Task.goal_id == goal_id)
+        if due_from:
+            query = query.filter(orm.Task.due_date >= due_from)
+        if due_to:
+            query = query.filter(orm.Task.due_date <= due_to)
+        if after:
+            query = query.filter(tuple_(orm.Task.due_date, orm.Task.id) < tuple_(*after))
+        rows = query.order_by(orm.Task.due_date.desc(), orm.Task.id.desc()).limit(limit).all()
+
+        # policies are decoded once per goal on the page
+        contexts: Dict[int, str] = {}
+        items = []
+        for row in rows:
+            if row.policy_json is not None and row.goal_id not in contexts:
+                contexts[row.goal_id] = policy_context_string(orm_to_domain_policy(row.policy_json))
+            items.append(TaskListItem(
+                id=row.id, goal_id=row.goal_id, due_date=row.due_date, status=row.status,
+                account_id=row.account_id,
+                account_username=row.username or "Platform-Level",
+                platform_name=row.platform_name or "N/A",
+                platform_color=(row.platform_config or {}).get("color"),
+                goal_description=row.description,
+                goal_context=contexts.get(row.goal_id, ""),
+                execution_strategy=row.execution_strategy,
+                check_strategy=row.check_strategy,
+            ))
+        return items
+
     def find_latest_for_goal(self, goal_id: int, account_id: Optional[int]) -> Optional[DomainTask]:
         query = self.db.query(orm.Task).filter(orm.Task.goal_id == goal_id)
         query = query.filter(orm.Task.account_id == account_id) if account_id else query.filter(orm.Task.account_id.is_(None))
-        orm_task = query.order_by(orm.Task.due_date.desc()).first()
+        orm_task = query.order_by(orm.Task.due_date.desc(), orm.Task.id.desc()).first()
         return orm_to_domain_task(orm_task) if orm_task else None
+
+    def find_latest_by_line(self, goal_ids: List[int]) -> Dict[Tuple[int, Optional[int]], DomainTask]:
+        """
+        Finds the most recent task of every (goal_id, account_id) line in one query.
+        Ties on due_date are broken by id, the same way find_latest_for_goal does.
+        The returned tasks are not hydrated with their goal.
+        """
+        if not goal_ids:
+            return {}
+        ranked = self.db.query(
+            orm.Task.id, orm.Task.goal_id, orm.Task.account_id, orm.Task.due_date, orm.Task.status,
+            func.row_number().over(
+                partition_by=(orm.Task.goal_id, orm.Task.account_id),
+                order_by=(orm.Task.due_date.desc(), orm.Task.id.desc())
+            ).label("rn")
+        ).filter(orm.Task.goal_id.in_(goal_ids)).subquery()
+
+        latest = {}
+        for row in self.db.query(ranked).filter(ranked.c.rn == 1).all():
+            latest[(row.goal_id, row.account_id)] = DomainTask(
+                id=row.id, goal_id=row.goal_id, due_date=row.due_date,
+                status=STATE_MAP_TO_DOMAIN.get(row.status, WaitingState()), account_id=row.account_id
+            )
+        return latest
+
+    def count_completed_by_line(self, goal_ids: List[int]) -> Dict[Tuple[int, Optional[int]], int]:
+        """Counts completed tasks of every (goal_id, account_id) line, read from the task counters."""
+        if not goal_ids:
+            return {}
+        rows = self.db.query(orm.TaskCount.goal_id, orm.TaskCount.account_key, orm.TaskCount.count).filter(
+            orm.TaskCount.goal_id.in_(goal_ids),
+            orm.TaskCount.status == "Completed"
+        ).all()
+        return {(goal_id, account_key or None): count for goal_id, account_key, count in rows}
+
+class SQLAlchemyUnitOfWork:
+    """
+    The repositories of one session, written by a single commit.
+    The repositories only flush, so their writes stay visible to later reads in the
+    same transaction; nothing is stored until the use case calls commit().
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self.platforms = CachedPlatformRepository(db)
+        self.accounts = CachedAccountRepository(db)
+        self.goals = SQLAlchemyGoalRepository(db)
+        self.tasks = SQLAlchemyTaskRepository(db)
+        self.logs = SQLAlchemyTaskLogRepository(db)
+        self.outputs = SQLAlchemyScriptOutputRepository(db)
+        self.jobs = SQLAlchemyScriptJobRepository(db)
+
+    def catalog_changed(self):
+        mark_catalog_changed(self.db)
+
+    def commit(self):
+        self.db.commit()
+        end_catalog_transaction(self.db)
+        end_goal_transaction(self.db)
+
+    def rollback(self):
+        self.db.rollback()
+        end_catalog_transaction(self.db)
+        end_goal_transaction(self.db)
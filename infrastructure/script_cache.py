@@ -0,0 +1,129 @@
+"""
+Content-addressed cache of the goals' scripts, compiled.
+
+A script is written once to SCRIPT_CACHE_DIR as <sha256 of its content>.py, next to its bytecode
+(<sha256>.<interpreter tag>.pyc), and every later run of the same content uses these files: the
+isolated runner executes the .pyc, and pooled interpreters load its code object. Files are
+written to a temporary name and renamed into place, so workers sharing the directory never see
+a half written entry, and two workers caching the same script at once only write it twice.
+
+Entries no goal references any more are removed by the nightly prune (or this module's command
+on machines that do not run the web app); one used in the last day is kept, as a run may be
+about to start it.
+
+Run it with:  python -m infrastructure.script_cache [--keep-hours N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import py_compile
+import sys
+import tempfile
+import time
+from typing import Dict, List, Set
+
+from sqlalchemy.orm import Session
+
+from settings import SCRIPT_CACHE_DIR
+from . import orm
+from .database import SessionLocal
+
+KEEP_SECONDS = 24 * 3600
+SUFFIX = f".{sys.implementation.cache_tag}.pyc"
+
+
+def digest(script_content: str) -> str:
+    return hashlib.sha256(script_content.encode("utf-8")).hexdigest()
+
+
+def cached_script(script_content: str) -> str:
+    """Returns the path of the script's compiled file, caching the script first when needed."""
+    directory = os.path.abspath(SCRIPT_CACHE_DIR)
+    source_path = os.path.join(directory, digest(script_content) + ".py")
+    compiled_path = source_path[:-len(".py")] + SUFFIX
+    try:
+        os.utime(source_path)  # marks it used, for the prune
+        if os.path.exists(compiled_path):
+            return compiled_path
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            temp_file.write(script_content)
+        os.replace(temp_path, source_path)
+    # a script that does not compile gets no .pyc; it is run from source and fails with its SyntaxError
+    try:
+        py_compile.compile(source_path, cfile=compiled_path, doraise=True,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    except py_compile.PyCompileError:
+        return source_path
+    return compiled_path
+
+
+def referenced_digests(db: Session) -> Set[str]:
+    """The digests of every script a goal has as its execution or check script."""
+    digests = set()
+    for strategies in db.query(orm.Goal.execution_strategy_json, orm.Goal.check_strategy_json):
+        for strategy_json in strategies:
+            script_content = json.loads(strategy_json or "{}").get("script_content")
+            if script_content:
+                digests.add(digest(script_content))
+    return digests
+
+
+def prune(keep: Set[str], keep_seconds: float = KEEP_SECONDS) -> int:
+    """Removes the cached files of scripts not in `keep` and not used for `keep_seconds`. Returns the count of scripts."""
+    directory = os.path.abspath(SCRIPT_CACHE_DIR)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    entries: Dict[str, List[str]] = {}
+    for name in names:
+        entries.setdefault(name.split(".", 1)[0], []).append(name)
+
+    cutoff = time.time() - keep_seconds
+    removed = 0
+    for script_digest, files in entries.items():
+        if script_digest in keep:
+            continue
+        # a run touches the source only; a leftover temporary file has no source
+        used = os.path.join(directory, script_digest + ".py") if script_digest + ".py" in files else None
+        try:
+            if os.stat(used or os.path.join(directory, files[0])).st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue  # removed by another prune
+        for name in files:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        removed += used is not None
+    return removed
+
+
+def run_prune(keep_seconds: float = KEEP_SECONDS) -> int:
+    """Prunes the cache against the scripts of the goals in the database."""
+    db = SessionLocal()
+    try:
+        keep = referenced_digests(db)
+    finally:
+        db.close()
+    return prune(keep, keep_seconds)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keep-hours", type=float, default=KEEP_SECONDS / 3600,
+                        help="keep unreferenced scripts used within this many hours")
+    args = parser.parse_args()
+
+    removed = run_prune(args.keep_hours * 3600)
+    print(f"{removed} cached scripts removed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
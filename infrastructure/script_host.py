@@ -0,0 +1,130 @@
+"""
+A warm interpreter for the pooled script mode (see script_pool.py); not meant to be run by hand.
+
+Imports the modules named on its command line once, then serves run requests read from stdin:
+a 4-byte length followed by a JSON object {"path", "env"}, the path being the script's cached
+.pyc (or its source, when it does not compile). Every script runs in a fresh namespace, with
+the environment the host started with plus the run's variables, and with file descriptors 1
+and 2 on temporary files, so the output of processes it starts is captured too.
+The reply, on the original stdout, is {"returncode", "stdout", "stderr", "rss_kb"}.
+
+Only the standard library is imported here: the host starts outside the app's import path.
+"""
+import builtins
+import importlib
+import json
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import traceback
+
+PYC_HEADER_SIZE = 16
+
+
+def read_message(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None  # the pool closed the pipe
+    (length,) = struct.unpack(">I", header)
+    return json.loads(stream.read(length))
+
+
+def write_message(stream, message: dict) -> None:
+    data = json.dumps(message).encode("utf-8")
+    stream.write(struct.pack(">I", len(data)) + data)
+    stream.flush()
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # the peak, where /proc is missing
+
+
+def load(path: str):
+    """The code object of a cached script: unmarshalled from the .pyc, which the pool's interpreter wrote."""
+    with open(path, "rb") as script_file:
+        data = script_file.read()
+    if path.endswith(".pyc"):
+        return marshal.loads(data[PYC_HEADER_SIZE:])
+    return compile(data, path, "exec")
+
+
+def exit_code(code) -> int:
+    """The process exit status sys.exit(code) would give."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def run(path: str, env: dict, base_env: dict, base_path: list, quiet: int) -> dict:
+    os.environ.clear()
+    os.environ.update(base_env)
+    os.environ.update(env)
+    # as for a script run from the cache directory: that directory first, not this one
+    sys.path[:] = [os.path.dirname(path)] + base_path[1:]
+    sys.argv[:] = [path]
+    namespace = {"__name__": "__main__", "__file__": path, "__builtins__": builtins}
+
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        try:
+            exec(load(path), namespace)
+            returncode = 0
+        except SystemExit as e:
+            returncode = exit_code(e.code)
+        except BaseException as e:
+            # without the frames of this file, as python prints it for a script it ran
+            tb = e.__traceback__
+            while tb and tb.tb_frame.f_code.co_filename == __file__:
+                tb = tb.tb_next
+            traceback.print_exception(type(e), e, tb)
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(quiet, 1)
+            os.dup2(quiet, 2)
+        out.seek(0)
+        err.seek(0)
+        return {"returncode": returncode,
+                "stdout": out.read().decode("utf-8", errors="replace"),
+                "stderr": err.read().decode("utf-8", errors="replace"),
+                "rss_kb": rss_kb()}
+
+
+def main() -> int:
+    for name in filter(None, sys.argv[1].split(",") if len(sys.argv) > 1 else []):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    # the pipes to the pool move off 0 and 1, which the scripts get as stdin (empty) and stdout
+    incoming = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    quiet = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(quiet, fd)
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    sys.stderr.reconfigure(encoding="utf-8", errors="backslashreplace")
+
+    base_env, base_path = dict(os.environ), list(sys.path)
+    while True:
+        message = read_message(incoming)
+        if message is None:
+            return 0
+        write_message(replies, run(message["path"], message["env"], base_env, base_path, quiet))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+The script job queue (the script_jobs table), filled by the web tier and drained by the
+workers of infrastructure/worker.py.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from application.read_models import ScriptJob, ScriptJobOutput
+from . import orm
+from .database import insert_ignoring_duplicates
+
+
+SCRIPT_JOB_COLUMNS = [getattr(orm.ScriptJob, field) for field in ScriptJob._fields]
+PENDING_JOB_STATUSES = ("queued", "running")
+# an attempt that ends takes its output tail with it; its transcript is in the task log
+NO_LIVE_OUTPUT = {"live_output_json": None, "live_lines": 0}
+
+
+class SQLAlchemyScriptJobRepository:
+    """
+    The script job queue. A job is leased with a compare-and-set UPDATE of queued rows only, over
+    a SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL (SQLite has no row locks and ignores the
+    clause), so every job goes to one worker. Only the worker holding the lease can finish it.
+    """
+    def __init__(self, db: Session): self.db = db
+
+    def _select(self):
+        return self.db.query(*SCRIPT_JOB_COLUMNS)
+
+    def enqueue(self, task_id: int, kind: str, priority: int, max_attempts: int) -> ScriptJob:
+        """
+        Queues a job, unless the task has a queued or running job of the kind already: the
+        unique index on those skips the insert, and the pending job is returned instead.
+        """
+        now = datetime.utcnow()
+        row = self.db.execute(
+            insert_ignoring_duplicates(self.db, orm.ScriptJob).values(
+                task_id=task_id, kind=kind, priority=priority, status="queued", attempts=0,
+                max_attempts=max_attempts, run_after=now, created_at=now
+            ).returning(*SCRIPT_JOB_COLUMNS)
+        ).first()
+        return ScriptJob(*row) if row else self.find_pending(task_id, kind)
+
+    def get_by_id(self, job_id: int) -> Optional[ScriptJob]:
+        row = self._select().filter(orm.ScriptJob.id == job_id).first()
+        return ScriptJob(*row) if row else None
+
+    def find_pending(self, task_id: int, kind: str) -> Optional[ScriptJob]:
+        row = self._select().filter(
+            orm.ScriptJob.task_id == task_id, orm.ScriptJob.status.in_(PENDING_JOB_STATUSES),
+            orm.ScriptJob.kind == kind
+        ).first()
+        return ScriptJob(*row) if row else None
+
+    def list_by_task_id(self, task_id: int) -> List[ScriptJob]:
+        rows = self._select().filter(orm.ScriptJob.task_id == task_id).order_by(orm.ScriptJob.id.desc())
+        return [ScriptJob(*row) for row in rows]
+
+    def count_pending(self) -> int:
+        return self.db.query(func.count()).select_from(orm.ScriptJob).filter(
+            orm.ScriptJob.status.in_(PENDING_JOB_STATUSES)
+        ).scalar()
+
+    def _requeue_expired(self, now: datetime):
+        """The jobs of workers that died: queued again, or dead if that was their last attempt."""
+        expired = (orm.ScriptJob.status == "running", orm.ScriptJob.lease_expires_at < now)
+        self.db.execute(
+            update(orm.ScriptJob).where(*expired, orm.ScriptJob.attempts >= orm.ScriptJob.max_attempts)
+            .values(status="dead", leased_by=None, lease_expires_at=None, finished_at=now,
+                    last_error="The worker running the job stopped before it finished.", **NO_LIVE_OUTPUT)
+        )
+        self.db.execute(
+            update(orm.ScriptJob).where(*expired)
+            .values(status="queued", leased_by=None, lease_expires_at=None, run_after=now,
+                    last_error="The worker running the job stopped before it finished.", **NO_LIVE_OUTPUT)
+        )
+
+    def lease(self, worker: str, limit: int, lease_seconds: int) -> List[ScriptJob]:
+        """Leases up to `limit` due jobs to the worker, highest priority first, oldest first within a priority."""
+        now = datetime.utcnow()
+        self._requeue_expired(now)
+        due = (
+            select(orm.ScriptJob.id)
+            .where(orm.ScriptJob.status == "queued", orm.ScriptJob.run_after <= now)
+            .order_by(orm.ScriptJob.priority.desc(), orm.ScriptJob.run_after, orm.ScriptJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = self.db.execute(
+            update(orm.ScriptJob)
+            .where(orm.ScriptJob.id.in_(due), orm.ScriptJob.status == "queued")
+            .values(status="running", leased_by=worker, lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=orm.ScriptJob.attempts + 1)
+            .returning(*SCRIPT_JOB_COLUMNS)
+        ).all()
+        jobs = [ScriptJob(*row) for row in rows]
+        return sorted(jobs, key=lambda job: (-job.priority, job.run_after, job.id))
+
+    def _held(self, job_id: int, worker: str):
+        return update(orm.ScriptJob).where(
+            orm.ScriptJob.id == job_id, orm.ScriptJob.status == "running", orm.ScriptJob.leased_by == worker
+        )
+
+    def _settle(self, job_id: int, worker: str, **values) -> bool:
+        result = self.db.execute(
+            self._held(job_id, worker).values(leased_by=None, lease_expires_at=None, **NO_LIVE_OUTPUT, **values)
+        )
+        return result.rowcount == 1
+
+    def finish(self, job_id: int, worker: str) -> bool:
+        return self._settle(job_id, worker, status="done", finished_at=datetime.utcnow())
+
+    def retry(self, job_id: int, worker: str, error: str, run_after: datetime) -> bool:
+        return self._settle(job_id, worker, status="queued", last_error=error, run_after=run_after)
+
+    def bury(self, job_id: int, worker: str, error: str) -> bool:
+        """Dead-letters the job: it is not run again, and stays with its last error for inspection."""
+        return self._settle(job_id, worker, status="dead", last_error=error, finished_at=datetime.utcnow())
+
+    def get_live_output(self, job_id: int) -> Optional[ScriptJobOutput]:
+        row = self.db.query(
+            orm.ScriptJob.status, orm.ScriptJob.attempts, orm.ScriptJob.live_lines, orm.ScriptJob.live_output_json
+        ).filter(orm.ScriptJob.id == job_id).first()
+        if not row:
+            return None
+        lines = [tuple(line) for line in json.loads(row.live_output_json or "[]")]
+        return ScriptJobOutput(job_id, row.status, row.attempts, row.live_lines - len(lines), lines)
+
+    def set_live_output(self, job_id: int, worker: str, line_count: int, lines: List[Tuple[str, str]]) -> bool:
+        """Replaces the output tail of the job while the worker holds it; line_count counts all lines printed."""
+        result = self.db.execute(
+            self._held(job_id, worker).values(live_output_json=json.dumps(lines), live_lines=line_count)
+        )
+        return result.rowcount == 1
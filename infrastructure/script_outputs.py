@@ -0,0 +1,85 @@
+"""
+Script outputs (the script_outputs table): the output of every script run is capped and stored
+in independently compressed chunks, so a page of a long output reads only the chunks it shows.
+"""
+import json
+import zlib
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+from sqlalchemy import LargeBinary, func
+from sqlalchemy.orm import Session
+
+from application.read_models import ScriptOutputRange
+from settings import SCRIPT_OUTPUT_MAX_CHARS
+from . import orm
+
+
+def cap_output(output: str, max_chars: int) -> str:
+    """Cuts the middle out of an output longer than max_chars, keeping its head and tail."""
+    if len(output) <= max_chars:
+        return output
+    marker = f"\n\n[... {len(output) - max_chars} characters cut ...]\n\n"
+    head = max_chars // 2
+    return output[:head] + marker + output[len(output) - (max_chars - head):]
+
+
+# characters per compressed chunk of a script output, the page size of the log page
+OUTPUT_CHUNK_CHARS = 65536
+
+
+def compress_chunks(text: str, chunk_chars: int = OUTPUT_CHUNK_CHARS) -> Tuple[bytes, List[List[int]]]:
+    """Compresses the text in chunks of chunk_chars characters. Returns the data and the [character end, byte end] of each chunk."""
+    pieces, chunks, byte_end = [], [], 0
+    for start in range(0, len(text), chunk_chars):
+        piece = zlib.compress(text[start:start + chunk_chars].encode("utf-8"))
+        pieces.append(piece)
+        byte_end += len(piece)
+        chunks.append([min(start + chunk_chars, len(text)), byte_end])
+    return b"".join(pieces), chunks
+
+
+class SQLAlchemyScriptOutputRepository:
+    """Script outputs, stored in zlib-compressed chunks and capped at SCRIPT_OUTPUT_MAX_CHARS per run."""
+    def __init__(self, db: Session): self.db = db
+
+    def save(self, output: str) -> int:
+        stored = cap_output(output, SCRIPT_OUTPUT_MAX_CHARS)
+        data, chunks = compress_chunks(stored)
+        orm_output = orm.ScriptOutput(
+            size=len(stored), original_size=len(output), data=data, chunks_json=json.dumps(chunks)
+        )
+        self.db.add(orm_output)
+        self.db.flush()
+        return orm_output.id
+
+    def get_range(self, output_id: int, offset: int, limit: int) -> Optional[ScriptOutputRange]:
+        """
+        Returns `limit` characters of the output from `offset` on. Only the bytes of the chunks
+        the range overlaps are read and decompressed, so paging through an output costs one pass.
+        """
+        row = self.db.query(
+            orm.ScriptOutput.size, orm.ScriptOutput.original_size, orm.ScriptOutput.chunks_json
+        ).filter(orm.ScriptOutput.id == output_id).first()
+        if not row:
+            return None
+        end = min(offset + limit, row.size)
+        text = ""
+        if offset < end:
+            chunks = json.loads(row.chunks_json)
+            char_ends = [char_end for char_end, _ in chunks]
+            first, last = bisect_right(char_ends, offset), bisect_left(char_ends, end)
+            char_start, byte_start = chunks[first - 1] if first else (0, 0)
+            data = self.db.query(
+                func.substr(orm.ScriptOutput.data, byte_start + 1, chunks[last][1] - byte_start, type_=LargeBinary)
+            ).filter(orm.ScriptOutput.id == output_id).scalar()
+            data, pieces, piece_start = bytes(data), [], byte_start
+            for _, byte_end in chunks[first:last + 1]:
+                pieces.append(zlib.decompress(data[piece_start - byte_start:byte_end - byte_start]).decode("utf-8"))
+                piece_start = byte_end
+            text = "".join(pieces)[offset - char_start:end - char_start]
+        return ScriptOutputRange(
+            output_id=output_id, offset=offset, text=text,
+            next_offset=end if end < row.size else None,
+            size=row.size, original_size=row.original_size
+        )
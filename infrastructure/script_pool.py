@@ -0,0 +1,99 @@
+"""
+Warm interpreters for the pooled script mode (SCRIPT_RUNNER = "pooled").
+
+Starting python for a run costs tens of milliseconds before the script's first line, plus the
+imports every script repeats. In pooled mode a run goes to an idle host process (script_host.py)
+that imported SCRIPT_POOL_PRELOAD when it started, and that runs the script's cached code
+object (script_cache.py) in a fresh namespace.
+Scripts share the host's imported modules, so a script that changes the state of a module can
+affect later runs in the same host; isolated mode (the default) gives every run a new process.
+
+A host is replaced after SCRIPT_POOL_MAX_RUNS runs, once its RSS passes SCRIPT_POOL_MAX_RSS_MB,
+and after a run that timed out or was cancelled: it is then killed with its process group.
+"""
+import asyncio
+import json
+import os
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+from .script_runner import kill_process_group
+
+HOST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_host.py")
+
+
+class Host:
+    """One warm interpreter, running one script at a time."""
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.runs = 0
+        self.rss_kb = 0
+
+    @classmethod
+    async def start(cls, preload: str) -> "Host":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, HOST, preload,  # the interpreter that compiled the cached scripts
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        return cls(process)
+
+    async def run(self, path: str, env: dict) -> Tuple[int, str, str]:
+        data = json.dumps({"path": path, "env": env}).encode("utf-8")
+        self.process.stdin.write(struct.pack(">I", len(data)) + data)
+        await self.process.stdin.drain()
+        try:
+            (length,) = struct.unpack(">I", await self.process.stdout.readexactly(4))
+            reply = json.loads(await self.process.stdout.readexactly(length))
+        except asyncio.IncompleteReadError:
+            returncode = await self.process.wait()
+            raise RuntimeError(f"The pooled interpreter exited during the run, with exit code {returncode}.")
+        self.runs += 1
+        self.rss_kb = reply["rss_kb"]
+        return reply["returncode"], reply["stdout"], reply["stderr"]
+
+    async def close(self):
+        """Lets the host finish: it exits when its stdin closes."""
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 5)
+        except asyncio.TimeoutError:
+            await kill_process_group(self.process)
+
+
+class InterpreterPool:
+    """The warm interpreters of one event loop. Runs are bounded by the runner, so hosts are started on demand."""
+    def __init__(self, preload: str, max_runs: int, max_rss_mb: int):
+        self.preload = preload
+        self.max_runs = max_runs
+        self.max_rss_kb = max_rss_mb * 1024
+        self.idle: List[Host] = []
+
+    async def warm(self, count: int):
+        """Starts hosts until `count` are idle, so the first runs do not wait for them."""
+        started = await asyncio.gather(*(Host.start(self.preload) for _ in range(count - len(self.idle))))
+        self.idle.extend(started)
+
+    async def run(self, path: str, env: dict, timeout: float) -> Tuple[Optional[int], str, str, bool]:
+        """Runs the cached script in an idle host. Returns (returncode, stdout, stderr, timed_out)."""
+        host = self.idle.pop() if self.idle else await Host.start(self.preload)
+        try:
+            returncode, stdout, stderr = await asyncio.wait_for(host.run(path, env), timeout)
+        except asyncio.TimeoutError:
+            await kill_process_group(host.process)
+            return None, "", "", True
+        except BaseException:
+            # cancelled, or the host died: either way it cannot take another run
+            await asyncio.shield(kill_process_group(host.process))
+            raise
+
+        if host.runs >= self.max_runs or host.rss_kb > self.max_rss_kb:
+            await host.close()
+        else:
+            self.idle.append(host)
+        return returncode, stdout, stderr, False
+
+    async def close(self):
+        hosts, self.idle = self.idle, []
+        await asyncio.gather(*(host.close() for host in hosts))
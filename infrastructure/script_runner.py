@@ -1,61 +1,250 @@
-import subprocess
+import asyncio
 import os
-import tempfile
-from typing import Tuple, Optional
+import signal
+import sys
+import weakref
+from collections import deque
+from typing import Callable, Deque, List, Tuple, Optional
 
-def run_script(script_content: str, env_vars: dict, success_keyword: Optional[str] = None) -> Tuple[bool, str]:
+from settings import (
+    SCRIPT_MAX_CONCURRENCY, SCRIPT_OUTPUT_MAX_CHARS, SCRIPT_POOL_MAX_RSS_MB, SCRIPT_POOL_MAX_RUNS, SCRIPT_POOL_PRELOAD,
+    SCRIPT_RUNNER, SCRIPT_TIMEOUT_SECONDS
+)
+from .script_cache import cached_script
+
+# how long a script gets to exit after SIGTERM before its process group is killed
+KILL_GRACE_SECONDS = 5
+# a line longer than this is passed on in pieces
+MAX_LINE_BYTES = 65536
+
+# called with ("stdout" or "stderr", line) for every line a script prints, as it prints it
+OutputCallback = Callable[[str, str], None]
+
+# one semaphore (and interpreter pool) per event loop: asyncio objects cannot be shared between loops
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_pools: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(SCRIPT_MAX_CONCURRENCY)
+    return semaphore
+
+
+def _pool():
+    from .script_pool import InterpreterPool  # it imports kill_process_group from here
+
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = InterpreterPool(SCRIPT_POOL_PRELOAD, SCRIPT_POOL_MAX_RUNS, SCRIPT_POOL_MAX_RSS_MB)
+    return pool
+
+
+async def start_pool() -> None:
+    """In pooled mode, starts the warm interpreters ahead of the first runs."""
+    if SCRIPT_RUNNER == "pooled":
+        await _pool().warm(SCRIPT_MAX_CONCURRENCY)
+
+
+async def close_pool() -> None:
+    """Stops the idle warm interpreters of this event loop, if any."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool:
+        await pool.close()
+
+
+class _Stream:
+    """
+    One output stream of a run. Lines go to the callback as they come; the text is kept up to
+    max_chars, cutting the middle as the stored output would, so a chatty script is not held
+    in memory whole.
+    """
+    def __init__(self, name: str, on_output: Optional[OutputCallback], max_chars: int = SCRIPT_OUTPUT_MAX_CHARS):
+        self.name = name
+        self.on_output = on_output
+        self.head_chars = max_chars // 2
+        self.tail_chars = max_chars - self.head_chars
+        self.head: List[str] = []
+        self.head_size = 0
+        self.tail: Deque[str] = deque()
+        self.tail_size = 0
+        self.cut = 0
+        self.partial = b""
+
+    def feed(self, data: bytes) -> None:
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self._line(line.decode("utf-8", errors="replace") + "\n")
+        if len(self.partial) > MAX_LINE_BYTES:
+            self._line(self.partial.decode("utf-8", errors="replace"))
+            self.partial = b""
+
+    def feed_text(self, text: str) -> None:
+        for line in text.splitlines(True):
+            self._line(line)
+
+    def close(self) -> None:
+        if self.partial:
+            self._line(self.partial.decode("utf-8", errors="replace"))
+            self.partial = b""
+
+    def _line(self, line: str) -> None:
+        if self.on_output:
+            self.on_output(self.name, line)
+        if self.head_size < self.head_chars:
+            kept = line[:self.head_chars - self.head_size]
+            self.head.append(kept)
+            self.head_size += len(kept)
+            line = line[len(kept):]
+        if line:
+            self.tail.append(line)
+            self.tail_size += len(line)
+            while self.tail_size - len(self.tail[0]) >= self.tail_chars:
+                dropped = self.tail.popleft()
+                self.tail_size -= len(dropped)
+                self.cut += len(dropped)
+
+    def text(self) -> str:
+        tail = "".join(self.tail)
+        cut = self.cut + max(0, len(tail) - self.tail_chars)
+        tail = tail[len(tail) - min(len(tail), self.tail_chars):]
+        if not cut:
+            return "".join(self.head) + tail
+        return "".join(self.head) + f"\n\n[... {cut} characters cut ...]\n\n" + tail
+
+
+async def _read(stream: asyncio.StreamReader, output: _Stream) -> None:
+    # what was read so far is kept when the run is cut short
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            output.close()
+            return
+        output.feed(chunk)
+
+
+def _signal_group(process: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)  # the script runs in its own session, so its pid is the group id
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Ends the process and every process it started: SIGTERM to the group, then SIGKILL after a grace period."""
+    _signal_group(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    # also catches children that outlived the script or ignored SIGTERM
+    _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+    await process.wait()
+
+
+async def _run_isolated(script_path: str, env_vars: dict, timeout: float,
+                        stdout: _Stream, stderr: _Stream) -> Tuple[Optional[int], bool]:
+    """Runs the cached script in a new python process, reading its output as it comes. Returns (returncode, timed_out)."""
+    script_env = os.environ.copy()
+    script_env.update(env_vars)
+    process = None
+    timed_out = False
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, script_path,  # the interpreter that compiled it
+            env=script_env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        pieces = [asyncio.ensure_future(_read(process.stdout, stdout)),
+                  asyncio.ensure_future(_read(process.stderr, stderr)),
+                  asyncio.ensure_future(process.wait())]
+        try:
+            done, pending = await asyncio.wait(pieces, timeout=timeout)
+            timed_out = bool(pending)
+            for piece in done:
+                piece.result()
+        finally:
+            for piece in pieces:
+                piece.cancel()
+    finally:
+        # timed out, cancelled or failed half way: nothing of the run may be left behind
+        if process is not None and (timed_out or process.returncode is None):
+            await asyncio.shield(kill_process_group(process))
+    return process.returncode, timed_out
+
+
+async def run_script_async(script_content: str, env_vars: dict, success_keyword: Optional[str] = None,
+                           timeout: float = SCRIPT_TIMEOUT_SECONDS, mode: str = SCRIPT_RUNNER,
+                           on_output: Optional[OutputCallback] = None) -> Tuple[bool, str]:
     """
-    Runs a script and captures its output, with a flexible success condition.
+    Runs a script without blocking the event loop, and captures its output, each stream up to
+    SCRIPT_OUTPUT_MAX_CHARS (the middle of a longer one is cut).
+
+    At most SCRIPT_MAX_CONCURRENCY scripts run at once in this process; further calls wait for
+    a free slot. The script is compiled once and cached (see script_cache.py), and runs in a new
+    process ("isolated") or in a warm interpreter ("pooled", see script_pool.py), in its own
+    process group either way, which is killed when the run takes longer than `timeout` seconds
+    or the awaiting task is cancelled.
 
     Args:
         script_content: The Python code to execute.
         env_vars: A dictionary of environment variables.
         success_keyword: If provided, the script's stdout must contain this keyword for success.
                          If None, only the exit code is checked.
+        timeout: Seconds the script may run, not counting the wait for a slot.
+        mode: "isolated" or "pooled"; SCRIPT_RUNNER by default.
+        on_output: Called with each line of output as it is printed. Pooled runs give their
+                   output when they end, so their lines all come then.
 
     Returns:
         A tuple of (success: bool, logs: str).
     """
-    with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.py', encoding='utf-8') as script_file:
-        script_file.write(script_content)
-        script_path = script_file.name
+    out, err = _Stream("stdout", on_output), _Stream("stderr", on_output)
+    async with _semaphore():
+        try:
+            # compiling a new script is file work; a cached one costs a stat
+            script_path = await asyncio.get_running_loop().run_in_executor(None, cached_script, script_content)
+            if mode == "pooled":
+                returncode, pooled_out, pooled_err, timed_out = await _pool().run(script_path, env_vars, timeout)
+                out.feed_text(pooled_out)
+                err.feed_text(pooled_err)
+            else:
+                returncode, timed_out = await _run_isolated(script_path, env_vars, timeout, out, err)
+        except Exception as e:
+            return False, f"--- SYSTEM ---\nAn unexpected error occurred: {e}"
 
-    script_env = os.environ.copy()
-    script_env.update(env_vars)
-    logs = ""
-    success = False
+    stdout = out.text()
+    logs = f"--- STDOUT ---\n{stdout}\n--- STDERR ---\n{err.text()}"
 
-    try:
-        process = subprocess.run(
-            ['python', script_path],
-            env=script_env,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        stdout = process.stdout
-        stderr = process.stderr
-        logs = f"--- STDOUT ---\n{stdout}\n--- STDERR ---\n{stderr}"
-
-        # Determine success
-        if process.returncode == 0:
-            if success_keyword:
-                # Success requires the keyword in stdout
-                if success_keyword in stdout.strip().split('\n'):
-                    success = True
-                else:
-                    logs += f"\n--- SYSTEM ---\nScript finished, but '{success_keyword}' keyword was not found."
-            else:
-                # Success is just a zero exit code
-                success = True
-        else:
-            logs += f"\n--- SYSTEM ---\nScript failed with exit code: {process.returncode}"
+    if timed_out:
+        return False, logs + f"\n--- SYSTEM ---\nScript execution timed out after {timeout:g} seconds and was killed."
+
+    # Determine success
+    if returncode == 0:
+        if success_keyword:
+            # Success requires the keyword in stdout
+            if success_keyword in stdout.strip().split('\n'):
+                return True, logs
+            return False, logs + f"\n--- SYSTEM ---\nScript finished, but '{success_keyword}' keyword was not found."
+        # Success is just a zero exit code
+        return True, logs
+    return False, logs + f"\n--- SYSTEM ---\nScript failed with exit code: {returncode}"
 
-    except subprocess.TimeoutExpired:
-        logs = "--- SYSTEM ---\nScript execution timed out after 2 minutes."
-    except Exception as e:
-        logs = f"--- SYSTEM ---\nAn unexpected error occurred: {e}"
-    finally:
-        os.remove(script_path)
 
-    return success, logs
\ No newline at end of file
+def run_script(script_content: str, env_vars: dict, success_keyword: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    The blocking form of run_script_async, for callers that have no event loop of their own.
+    Always isolated: a pool would not outlive the call's event loop.
+    """
+    return asyncio.run(run_script_async(script_content, env_vars, success_keyword=success_keyword, mode="isolated"))
@@ -0,0 +1,158 @@
+"""
+The task counters (the task_counts table) and their maintenance.
+
+The counters are kept up to date by the task repository as tasks are inserted and change
+status, with add_task_counts; they also count the tasks moved to the archive. `check` recounts the tasks and
+archived tasks and reports every counter that disagrees; `rebuild` recomputes all counters
+from them, for example after tasks were changed by hand in the database.
+
+Run it with:  python -m infrastructure.task_counters check|rebuild
+"""
+import argparse
+import sys
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from . import orm
+from .data_versions import bump_data_version
+from .database import SessionLocal, dialect_insert
+
+# Tasks never leave these statuses, so the latest due date of their counter is exact.
+TERMINAL_STATUSES = {"Completed", "Failed", "Skipped"}
+
+CounterKey = Tuple[int, int, str]
+
+# (goal_id, account_id, status, change of the count, due date of an added task or None)
+TaskCountChange = Tuple[int, Optional[int], str, int, Optional[date]]
+
+
+def add_task_counts(db: Session, changes: Iterable[TaskCountChange]):
+    """
+    Applies changes to the task counters with one upsert, in the caller's transaction.
+    Changes to the same counter are merged first, since an upsert may touch a row only once.
+    """
+    merged: Dict[Tuple[int, int, str], Tuple[int, Optional[date]]] = {}
+    for goal_id, account_id, status, delta, due_date in changes:
+        key = (goal_id, account_id or 0, status)
+        count, latest = merged.get(key, (0, None))
+        if due_date is not None and (latest is None or due_date > latest):
+            latest = due_date
+        merged[key] = (count + delta, latest)
+    if not merged:
+        return
+
+    counts = orm.TaskCount.__table__
+    stmt = dialect_insert(db, counts)  # the table, so all rows go in one executemany
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[counts.c.goal_id, counts.c.account_key, counts.c.status],
+        set_={
+            "count": counts.c.count + stmt.excluded.count,
+            "revision": counts.c.revision + 1,
+            "max_due_date": case(
+                (or_(counts.c.max_due_date.is_(None), stmt.excluded.max_due_date > counts.c.max_due_date),
+                 stmt.excluded.max_due_date),
+                else_=counts.c.max_due_date
+            ),
+        }
+    )
+    db.execute(stmt, [
+        {"goal_id": goal_id, "account_key": account_key, "status": status, "count": count, "max_due_date": latest}
+        for (goal_id, account_key, status), (count, latest) in merged.items()
+    ])
+
+
+def counted_tasks(goal_ids: Optional[List[int]] = None):
+    """The (goal_id, account_id, status, due_date) rows the task counters count: live and archived tasks."""
+    tasks, archived = orm.Task.__table__, orm.ArchivedTask.__table__
+    live = select(tasks.c.goal_id, tasks.c.account_id, tasks.c.status, tasks.c.due_date)
+    old = select(archived.c.goal_id, archived.c.account_id, archived.c.status, archived.c.due_date)
+    if goal_ids is not None:
+        live = live.where(tasks.c.goal_id.in_(goal_ids))
+        old = old.where(archived.c.goal_id.in_(goal_ids))
+    return union_all(live, old).subquery()
+
+
+def rebuild_task_counts(db: Session, goal_ids: Optional[List[int]] = None):
+    """Recomputes the task counters of the given goals (all goals by default) from the tasks and archived tasks."""
+    tasks = counted_tasks(goal_ids)
+    account_key = func.coalesce(tasks.c.account_id, 0)
+    counts = select(
+        tasks.c.goal_id, account_key, tasks.c.status, func.count(), func.max(tasks.c.due_date)
+    ).where(tasks.c.goal_id.is_not(None), tasks.c.status.is_not(None)) \
+     .group_by(tasks.c.goal_id, account_key, tasks.c.status)
+    clear = delete(orm.TaskCount)
+    if goal_ids is not None:
+        clear = clear.where(orm.TaskCount.goal_id.in_(goal_ids))
+    db.execute(clear)
+    db.execute(orm.TaskCount.__table__.insert().from_select(
+        ["goal_id", "account_key", "status", "count", "max_due_date"], counts
+    ))
+
+
+def read_task_counts_revision(db: Session) -> int:
+    """The sum of the task counters' revisions, which grows with every task insert and status change."""
+    return db.query(func.sum(orm.TaskCount.revision)).scalar() or 0
+
+
+def live_counts(db) -> Dict[CounterKey, Tuple[int, Optional[date]]]:
+    """Counts the tasks and archived tasks per (goal_id, account_key, status)."""
+    tasks = counted_tasks()
+    account_key = func.coalesce(tasks.c.account_id, 0)
+    rows = db.query(
+        tasks.c.goal_id, account_key, tasks.c.status, func.count(), func.max(tasks.c.due_date)
+    ).filter(tasks.c.goal_id.is_not(None), tasks.c.status.is_not(None)) \
+     .group_by(tasks.c.goal_id, account_key, tasks.c.status).all()
+    return {(goal_id, key, status): (count, latest) for goal_id, key, status, count, latest in rows}
+
+
+def stored_counts(db) -> Dict[CounterKey, Tuple[int, Optional[date]]]:
+    """Reads the non-zero task counters."""
+    rows = db.query(orm.TaskCount).filter(orm.TaskCount.count != 0).all()
+    return {(c.goal_id, c.account_key, c.status): (c.count, c.max_due_date) for c in rows}
+
+
+def check(db) -> List[str]:
+    """Returns a description of every counter that disagrees with the tasks."""
+    live, stored = live_counts(db), stored_counts(db)
+    mismatches = []
+    for key in sorted(live.keys() | stored.keys()):
+        live_count, live_latest = live.get(key, (0, None))
+        count, latest = stored.get(key, (0, None))
+        goal_id, account_key, status = key
+        if count != live_count:
+            mismatches.append(f"goal {goal_id}, account {account_key or '-'}, {status}: "
+                              f"counted {count}, tasks have {live_count}")
+        elif status in TERMINAL_STATUSES and latest != live_latest:
+            mismatches.append(f"goal {goal_id}, account {account_key or '-'}, {status}: "
+                              f"latest due date {latest}, tasks have {live_latest}")
+    return mismatches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            rebuild_task_counts(db)
+            # the rebuilt counters start their revisions over
+            bump_data_version(db, "goals")
+            db.commit()
+            print("Task counters rebuilt.")
+            return 0
+        mismatches = check(db)
+        for mismatch in mismatches:
+            print(f"MISMATCH {mismatch}")
+        print(f"{len(mismatches)} task counters disagree with the tasks.")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Worker for the script job queue.
+
+The run endpoints only queue a job (the script_jobs table). A worker leases the jobs that are
+due, highest priority first, and runs up to SCRIPT_MAX_CONCURRENCY scripts at once on its event
+loop. Any number of workers can run, on any machine that reaches the database; --processes
+starts several from one command. A lease lasts as long as a script may run plus a margin, so
+the jobs of a worker that died are queued again once it expires.
+
+A job fails when running it raises (a script that fails only fails its task). It is queued
+again after JOB_RETRY_BASE_SECONDS, doubling with every attempt, and is dead after
+JOB_MAX_ATTEMPTS attempts, or at once when another attempt cannot help (the task is gone, has
+no script, or is no longer in the status its script needs).
+
+With SCRIPT_RUNNER = "pooled", each worker keeps its own warm interpreters (script_pool.py).
+
+SIGTERM or Ctrl-C stops leasing and lets the running scripts finish; a second one kills them.
+
+Run it with:  python -m infrastructure.worker [--processes N] [--poll SECONDS] [--once]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Set, TypeVar
+
+from application.read_models import ScriptJob
+from application.usecases import RunCheckScriptUseCase, RunExecutionScriptUseCase
+from domain.states import InvalidTransition
+from settings import (
+    JOB_RETRY_BASE_SECONDS, SCRIPT_LIVE_FLUSH_SECONDS, SCRIPT_LIVE_OUTPUT_LINES, SCRIPT_MAX_CONCURRENCY,
+    SCRIPT_TIMEOUT_SECONDS
+)
+from .database import SessionLocal
+from .repositories import SQLAlchemyUnitOfWork
+from .script_jobs import SQLAlchemyScriptJobRepository
+from .script_runner import KILL_GRACE_SECONDS, close_pool, start_pool
+
+T = TypeVar("T")
+
+SCRIPT_USE_CASES = {"execution": RunExecutionScriptUseCase, "check": RunCheckScriptUseCase}
+# raised when the task is gone, has no script, or moved on; another attempt would fail the same way
+PERMANENT_ERRORS = (InvalidTransition, TypeError, ValueError)
+LEASE_SECONDS = SCRIPT_TIMEOUT_SECONDS + KILL_GRACE_SECONDS + 60
+MAX_RETRY_DELAY_SECONDS = 3600
+# longer lines are cut in the live view; the stored output has them whole
+MAX_LIVE_LINE_CHARS = 1000
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """JOB_RETRY_BASE_SECONDS after the first attempt, doubling after every further one, at most an hour."""
+    return timedelta(seconds=min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS))
+
+
+def _in_queue(work: Callable[[SQLAlchemyScriptJobRepository], T]) -> T:
+    db = SessionLocal()
+    try:
+        result = work(SQLAlchemyScriptJobRepository(db))
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+
+async def in_queue(work: Callable[[SQLAlchemyScriptJobRepository], T]) -> T:
+    """
+    Runs work(jobs) in a transaction of its own, on a thread so the scripts keep running. Queue
+    bookkeeping commits the session itself, as LeaderLease does: it is no change to the tasks,
+    so it goes without a unit of work.
+    """
+    return await asyncio.to_thread(_in_queue, work)
+
+
+def _in_unit_of_work(work: Callable[[SQLAlchemyUnitOfWork], T]) -> T:
+    db = SessionLocal()
+    try:
+        return work(SQLAlchemyUnitOfWork(db))
+    finally:
+        db.close()
+
+
+async def run_in_unit_of_work(work: Callable[[SQLAlchemyUnitOfWork], T]) -> T:
+    """
+    Runs work(uow) with the unit of work of a new session, on a thread, and closes the session
+    (see IUnitOfWorkRunner): a script use case holds a connection only while it reads or writes.
+    """
+    return await asyncio.to_thread(_in_unit_of_work, work)
+
+
+class LiveOutput:
+    """
+    A ring buffer of the last lines a job's script printed, written to the job's row every
+    SCRIPT_LIVE_FLUSH_SECONDS while it changes, for /jobs/{id}/stream to tail.
+    """
+    def __init__(self, job_id: int, worker: str):
+        self.job_id = job_id
+        self.worker = worker
+        self.lines = deque(maxlen=SCRIPT_LIVE_OUTPUT_LINES)
+        self.count = 0
+        self.flushed = 0
+        self.stopped = asyncio.Event()
+
+    def append(self, stream: str, line: str):
+        self.lines.append((stream, line[:MAX_LIVE_LINE_CHARS]))
+        self.count += 1
+
+    async def flush(self):
+        count, lines = self.count, list(self.lines)
+        if count != self.flushed:
+            await in_queue(lambda jobs: jobs.set_live_output(self.job_id, self.worker, count, lines))
+            self.flushed = count
+
+    async def run(self):
+        """Flushes until stopped; stopping does not cut a write short."""
+        while not self.stopped.is_set():
+            try:
+                await asyncio.wait_for(self.stopped.wait(), SCRIPT_LIVE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"Could not write the live output of job {self.job_id}: {e}")
+
+
+async def run_job(job: ScriptJob, worker: str) -> None:
+    """Runs the job's script use case, then marks the job done, queues it again or dead-letters it."""
+    live = LiveOutput(job.id, worker)
+    flusher = asyncio.ensure_future(live.run())
+    try:
+        await SCRIPT_USE_CASES[job.kind].execute_async(run_in_unit_of_work, job.task_id, on_output=live.append)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if isinstance(e, PERMANENT_ERRORS) or job.attempts >= job.max_attempts:
+            print(f"Job {job.id} ({job.kind} of task {job.task_id}) is dead after {job.attempts} attempt(s): {error}")
+            await in_queue(lambda jobs: jobs.bury(job.id, worker, error))
+        else:
+            run_after = datetime.utcnow() + retry_delay(job.attempts)
+            print(f"Job {job.id} ({job.kind} of task {job.task_id}) failed, retrying at {run_after:%H:%M:%S}: {error}")
+            await in_queue(lambda jobs: jobs.retry(job.id, worker, error, run_after))
+        return
+    finally:
+        live.stopped.set()
+        await flusher
+    await in_queue(lambda jobs: jobs.finish(job.id, worker))
+
+
+class Worker:
+    """Leases due jobs while it has free slots, and runs them concurrently on one event loop."""
+    def __init__(self, concurrency: int = SCRIPT_MAX_CONCURRENCY, poll_seconds: float = 1.0):
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.running: Set[asyncio.Task] = set()
+        self.stopping = False
+        self.wakeup: asyncio.Event = None
+
+    def stop(self):
+        """The first call stops leasing; a second one cancels the running jobs, killing their scripts."""
+        if self.stopping:
+            for task in self.running:
+                task.cancel()
+        self.stopping = True
+        if self.wakeup:
+            self.wakeup.set()
+
+    def _finished(self, task: asyncio.Task):
+        self.running.discard(task)
+        if not task.cancelled() and task.exception():
+            # the job keeps its lease and is queued again when it expires
+            print(f"Could not record the outcome of a job: {task.exception()}")
+        self.wakeup.set()
+
+    async def run(self, once: bool = False) -> int:
+        """Runs jobs until stopped, or with `once` until no job is due or running. Returns how many it started."""
+        self.wakeup = asyncio.Event()
+        started = 0
+        while not self.stopping:
+            jobs = []
+            free = self.concurrency - len(self.running)
+            if free:
+                try:
+                    jobs = await in_queue(lambda repo: repo.lease(self.name, free, LEASE_SECONDS))
+                except Exception as e:
+                    print(f"Could not lease jobs: {e}")
+            for job in jobs:
+                task = asyncio.ensure_future(run_job(job, self.name))
+                self.running.add(task)
+                task.add_done_callback(self._finished)
+            started += len(jobs)
+
+            if once and not jobs and not self.running:
+                break
+            if jobs and len(self.running) < self.concurrency:
+                continue  # more jobs may be due
+            # wait for a free slot, the next poll or a stop
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+        if self.running:
+            print(f"Worker {self.name} waiting for {len(self.running)} running job(s)...")
+            await asyncio.wait(self.running)
+        return started
+
+
+def serve(poll_seconds: float, once: bool) -> int:
+    """Runs one worker in this process until it is stopped."""
+    worker = Worker(poll_seconds=poll_seconds)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await start_pool()
+        try:
+            return await worker.run(once=once)
+        finally:
+            await close_pool()
+
+    print(f"Worker {worker.name} running up to {worker.concurrency} scripts at once.")
+    started = asyncio.run(main())
+    print(f"Worker {worker.name} stopped after {started} job(s).")
+    return started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between looks for due jobs when idle")
+    parser.add_argument("--once", action="store_true", help="exit when no job is due or running")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        serve(args.poll, args.once)
+        return 0
+
+    processes = [multiprocessing.Process(target=serve, args=(args.poll, args.once)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    # Ctrl-C reaches the whole process group; SIGTERM to this process is passed on
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
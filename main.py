@@ -1,52 +1,81 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from infrastructure.database import engine, get_db
+from infrastructure.archive import run_archival
+from infrastructure.database import engine, get_db, SessionLocal
+from infrastructure.leader import LeaderLease
 from infrastructure.orm import Base
-from infrastructure.repositories import (
-    SQLAlchemyGoalRepository,
-    SQLAlchemyTaskRepository,
-    SQLAlchemyAccountRepository,
-)
+from infrastructure.script_cache import run_prune
+from infrastructure.repositories import SQLAlchemyUnitOfWork
 from application.usecases import GenerateDueTasksUseCase
+from ui.conditional_get import conditional_get
 from ui.routers import platforms, goals, tasks, dashboard
+from settings import ARCHIVE_AFTER_DAYS, SCHEDULER_LEASE_SECONDS
 
 # I'm using alembic now so skipping this:
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Task Tracker")
-
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-app.include_router(dashboard.router, tags=["Dashboard"])
-app.include_router(platforms.router, tags=["Platforms & Accounts"])
-app.include_router(goals.router, tags=["Goals"])
-app.include_router(tasks.router, tags=["Tasks"])
-
 def run_daily_task_generation():
     """Job function for the scheduler."""
     print(f"Scheduler running at {__import__('datetime').datetime.now()}: Generating due tasks...")
     db_session = next(get_db())
     try:
-        task_repo = SQLAlchemyTaskRepository(db_session)
-        goal_repo = SQLAlchemyGoalRepository(db_session)
-        account_repo = SQLAlchemyAccountRepository(db_session)
-
-        use_case = GenerateDueTasksUseCase(goal_repo, task_repo, account_repo)
-        use_case.execute()
+        use_case = GenerateDueTasksUseCase(SQLAlchemyUnitOfWork(db_session))
+        use_case.execute(batch=True)
         print("Scheduler finished.")
     finally:
         db_session.close()
 
+def run_nightly_archival():
+    """Job function for the scheduler: moves the history of long finished goals to the archive."""
+    print(f"Scheduler running at {__import__('datetime').datetime.now()}: Archiving finished goals...")
+    moved = run_archival(ARCHIVE_AFTER_DAYS)
+    print(f"Scheduler finished: {moved} tasks archived.")
+
+def run_nightly_script_cache_prune():
+    """Job function for the scheduler: removes cached scripts no goal uses any more."""
+    print(f"Scheduler running at {__import__('datetime').datetime.now()}: Pruning the script cache...")
+    removed = run_prune()
+    print(f"Scheduler finished: {removed} cached scripts removed.")
+
+# Every worker process has a scheduler, but the jobs only run in the one holding the lease,
+# so the web tier can run with several workers.
+lease = LeaderLease(SessionLocal, name="scheduler", ttl_seconds=SCHEDULER_LEASE_SECONDS)
 scheduler = BackgroundScheduler()
 
+# renew (or take over) the lease well before it expires
+scheduler.add_job(lease.try_acquire, "interval", seconds=max(1, SCHEDULER_LEASE_SECONDS // 3))
 # every day at 2:00 AM
-scheduler.add_job(run_daily_task_generation, "cron", hour=2, minute=0)
-scheduler.start()
+scheduler.add_job(lease.run_if_leader(run_daily_task_generation), "cron", hour=2, minute=0)
+# every day at 3:00 AM, after the generation
+if ARCHIVE_AFTER_DAYS > 0:
+    scheduler.add_job(lease.run_if_leader(run_nightly_archival), "cron", hour=3, minute=0)
+# every day at 3:30 AM
+scheduler.add_job(lease.run_if_leader(run_nightly_script_cache_prune), "cron", hour=3, minute=30)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lease.try_acquire()
+    scheduler.start()
+    yield
+    scheduler.shutdown(wait=False)
+    lease.release()
+
+app = FastAPI(title="Task Tracker", lifespan=lifespan)
+
+app.mount("/static", StaticFiles(directory="static"), name="static")
+# 304 for the often reloaded pages while no write happened since the browser's copy
+app.middleware("http")(conditional_get)
+
+app.include_router(dashboard.router, tags=["Dashboard"])
+app.include_router(platforms.router, tags=["Platforms & Accounts"])
+app.include_router(goals.router, tags=["Goals"])
+app.include_router(tasks.router, tags=["Tasks"])
 
 if __name__ == "__main__":
     print("Running initial task generation on startup...")
     run_daily_task_generation()
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,138 @@
+"""
+Throughput benchmark for the web pages.
+
+Seeds a throwaway SQLite database, serves
+the app on it with uvicorn in a child process and keeps a fixed number of requests in
+flight against each page for a few seconds, then prints the requests per second.
+
+Run it with:  python -m ui.benchmark [--concurrency 16] [--seconds 10] [--goals 20] [--tasks-per-line 15]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import List
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure import orm
+from infrastructure.database import Base
+from infrastructure.task_counters import rebuild_task_counts
+
+PATHS: List[str] = ["/all-tasks", "/"]
+
+
+def seed(db, goals: int, tasks_per_line: int) -> None:
+    """Fills the database with goals spread over a few platforms and accounts, and their tasks."""
+    today = date.today()
+    db.add_all([orm.Platform(id=p, name=f"platform-{p}", config={}) for p in range(1, 4)])
+    db.add_all([orm.Account(id=a, platform_id=a % 3 + 1, username=f"account-{a}") for a in range(1, 10)])
+    for g in range(1, goals + 1):
+        account_ids = None if g % 2 == 0 else [g % 9 + 1]
+        db.add(orm.Goal(
+            id=g, description=f"goal-{g}", platform_id=g % 3 + 1, start_date=today - timedelta(days=tasks_per_line),
+            policy_json='{"type": "FixedInterval", "days": 1}', account_ids_json=account_ids,
+            execution_strategy_json='{"type": "Manual"}', check_strategy_json='{"type": "Manual"}',
+            status="Active", task_distribution_strategy="all", catchup_strategy="all",
+            lines=[orm.GoalLine(account_id=a, next_due_date=today + timedelta(days=1)) for a in (account_ids or [None])]
+        ))
+        for a in account_ids or [None]:
+            for d in range(tasks_per_line):
+                db.add(orm.Task(goal_id=g, account_id=a, due_date=today - timedelta(days=d),
+                                status="Completed" if d % 3 else "Waiting"))
+    db.flush()
+    rebuild_task_counts(db)
+    db.commit()
+
+
+def seed_database(path: str, goals: int, tasks_per_line: int) -> str:
+    """Creates and fills the database file, and returns its URL."""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    seed(sessionmaker(bind=engine)(), goals, tasks_per_line)
+    engine.dispose()
+    return url
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def measure(client: httpx.AsyncClient, path: str, concurrency: int, seconds: float) -> float:
+    """Returns the requests per second served for the path."""
+    done = 0
+    deadline = time.monotonic() + seconds
+
+    async def worker():
+        nonlocal done
+        while time.monotonic() < deadline:
+            response = await client.get(path)
+            response.raise_for_status()
+            done += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done / (time.monotonic() - started)
+
+
+async def run(base_url: str, concurrency: int, seconds: float) -> None:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        for path in PATHS:
+            await measure(client, path, concurrency, 1)  # warm up
+            rps = await measure(client, path, concurrency, seconds)
+            print(f"{path:<12} {rps:8.1f} req/s  (concurrency {concurrency})")
+        caches = (await client.get("/caches")).json()
+        print("caches       " + ", ".join(f"{name} {c['hits']} hits / {c['misses']} misses" for name, c in caches.items()))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--goals", type=int, default=20)
+    parser.add_argument("--tasks-per-line", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=seed_database(
+            os.path.join(tmp, "benchmark.db"), args.goals, args.tasks_per_line
+        ))
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(run(f"http://127.0.0.1:{port}", args.concurrency, args.seconds))
+        finally:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Conditional GET for the pages that are reloaded over and over (browser tabs, a wall display).
+
+These pages show the catalog, the goals and the tasks. Their ETag is made of the "catalog" and
+"goals" data versions, which only the (rare) writes to platforms, accounts and goals bump, the
+sum of the task counters' revisions, which every task insert and status change moves while
+locking only the counters it changes, the day (the pages show what is due or overdue) and the
+templates' last change. No write takes a lock just to keep the tag current. The response has
+Cache-Control: no-cache so browsers always revalidate; a request whose If-None-Match still
+matches gets a 304 after three small reads, before any use case or repository runs.
+"""
+import os
+from datetime import date
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from infrastructure.data_versions import read_data_version
+from infrastructure.database import SessionLocal
+from infrastructure.task_counters import read_task_counts_revision
+
+CONDITIONAL_PATHS = {"/", "/all-tasks", "/goals", "/platforms"}
+
+
+def templates_stamp(directory: str = "templates") -> str:
+    """The last change to the templates, so a deploy with new templates does not get 304s for old pages."""
+    mtimes = [os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names]
+    return format(int(max(mtimes, default=0)), "x")
+
+TEMPLATES_STAMP = templates_stamp()
+
+
+def current_etag() -> str:
+    db = SessionLocal()
+    try:
+        versions = (read_data_version(db, "catalog"), read_data_version(db, "goals"), read_task_counts_revision(db))
+    finally:
+        db.close()
+    return f'W/"{"-".join(map(str, versions))}-{date.today().isoformat()}-{TEMPLATES_STAMP}"'
+
+
+async def conditional_get(request: Request, call_next):
+    if request.method != "GET" or request.url.path not in CONDITIONAL_PATHS:
+        return await call_next(request)
+
+    # read before the page is rendered, so the tag is never newer than what the page shows
+    etag = await run_in_threadpool(current_etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
@@ -2,15 +2,18 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 from infrastructure.database import get_db
 from infrastructure.repositories import (
-    SQLAlchemyPlatformRepository, SQLAlchemyAccountRepository,
-    SQLAlchemyGoalRepository, SQLAlchemyTaskRepository, SQLAlchemyTaskLogRepository
+    CachedPlatformRepository, CachedAccountRepository,
+    SQLAlchemyGoalRepository, SQLAlchemyTaskRepository, SQLAlchemyTaskLogRepository, SQLAlchemyUnitOfWork
 )
+from infrastructure.script_jobs import SQLAlchemyScriptJobRepository
+from infrastructure.script_outputs import SQLAlchemyScriptOutputRepository
 
+# Platforms and accounts are read through the process-wide catalog cache.
 def get_platform_repo(db: Session = Depends(get_db)):
-    return SQLAlchemyPlatformRepository(db)
+    return CachedPlatformRepository(db)
 
 def get_account_repo(db: Session = Depends(get_db)):
-    return SQLAlchemyAccountRepository(db)
+    return CachedAccountRepository(db)
 
 def get_goal_repo(db: Session = Depends(get_db)):
     return SQLAlchemyGoalRepository(db)
@@ -20,3 +23,13 @@ def get_task_repo(db: Session = Depends(get_db)):
 
 def get_task_log_repo(db: Session = Depends(get_db)):
     return SQLAlchemyTaskLogRepository(db)
+
+def get_script_output_repo(db: Session = Depends(get_db)):
+    return SQLAlchemyScriptOutputRepository(db)
+
+def get_script_job_repo(db: Session = Depends(get_db)):
+    return SQLAlchemyScriptJobRepository(db)
+
+# Use cases that write get the repositories through a unit of work, and commit it once.
+def get_uow(db: Session = Depends(get_db)):
+    return SQLAlchemyUnitOfWork(db)
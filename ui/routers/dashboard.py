@@ -1,12 +1,17 @@
 import subprocess
 import threading
-from fastapi import APIRouter, Request, Depends
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from application.usecases import (
     GetDashboardDataUseCase,
-    ListTasksUseCase,
+    ListTasksPageUseCase,
+    ListPlatformsUseCase,
+    ListAccountsUseCase,
+    ListGoalOptionsUseCase,
 )
 from ..dependencies import (
     get_db,
@@ -15,15 +20,15 @@ from ..dependencies import (
     get_goal_repo,
     get_platform_repo,
 )
+from infrastructure.repositories import catalog_cache, goal_json_cache
 from settings import SERVICES
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse, tags=["Dashboard"])
-def home(request: Request, db: Session = Depends(get_db)):
-    use_case = GetDashboardDataUseCase(get_account_repo(db))
-    platforms_data = use_case.execute()
+def home(request: Request, repo=Depends(get_account_repo)):
+    platforms_data = GetDashboardDataUseCase(repo).execute()
     return templates.TemplateResponse(
         "index.html",
         {
@@ -52,19 +57,71 @@ def start_service(service_name: str):
     return {"status": "started"}
 
 
+TASK_STATUSES = ["Waiting", "In Progress", "Completed", "Failed", "Skipped"]
+
+def task_filters(status: Optional[str] = None, platform_id: Optional[str] = None,
+                 account_id: Optional[str] = None, goal_id: Optional[str] = None,
+                 due_from: Optional[str] = None, due_to: Optional[str] = None) -> dict:
+    """
+    Task list filters from the query string. The filter form submits all of its
+    fields, so an empty value means "any" instead of failing validation.
+    """
+    try:
+        return {
+            "status": status or None,
+            "platform_id": int(platform_id) if platform_id else None,
+            "account_id": int(account_id) if account_id else None,
+            "goal_id": int(goal_id) if goal_id else None,
+            "due_from": date.fromisoformat(due_from) if due_from else None,
+            "due_to": date.fromisoformat(due_to) if due_to else None,
+        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid task filter")
+
 @router.get("/all-tasks", response_class=HTMLResponse)
-def get_all_tasks(req: Request, db: Session = Depends(get_db)):
-    tasks = ListTasksUseCase(get_task_repo(db)).execute()
-    goal_repo = get_goal_repo(db)
+def get_all_tasks(
+    req: Request,
+    filters: dict = Depends(task_filters),
+    after_due: Optional[date] = None,
+    after_id: Optional[int] = None,
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    after = (after_due, after_id) if after_due and after_id else None
 
-    for task in tasks:
-        if hasattr(task, "goal_id"):
-            goal = goal_repo.get_by_id(task.goal_id)
+    # the tasks come from one SELECT; the rest are the filter form's options: platforms and
+    # accounts from the catalog cache, goals from an id and label projection
+    page = ListTasksPageUseCase(get_task_repo(db)).execute(filters, after=after, page_size=page_size)
+    page["platforms"] = ListPlatformsUseCase(get_platform_repo(db)).execute()
+    page["accounts"] = ListAccountsUseCase(get_account_repo(db)).execute()
+    page["goals"] = ListGoalOptionsUseCase(get_goal_repo(db)).execute()
 
-            if goal is not None:
-                platform_repo = get_platform_repo(db)
-                goal.platform = platform_repo.get_by_id(goal.platform_id)
-            task.goal = goal
+    first_page_url = req.url.remove_query_params(["after_due", "after_id"])
+    next_page_url = None
+    if page["next_cursor"]:
+        due, task_id = page["next_cursor"]
+        next_page_url = first_page_url.include_query_params(after_due=due.isoformat(), after_id=task_id)
     return templates.TemplateResponse(
-        "all_tasks.html", {"request": req, "tasks": tasks, "page_title": "All Tasks"}
+        "all_tasks.html",
+        {
+            "request": req,
+            "tasks": page["tasks"],
+            "filters": filters,
+            "statuses": TASK_STATUSES,
+            "platforms": page["platforms"],
+            "accounts": page["accounts"],
+            "goals": page["goals"],
+            "current_url": f"{req.url.path}?{req.url.query}" if req.url.query else req.url.path,
+            "first_page_url": f"{first_page_url.path}?{first_page_url.query}" if after else None,
+            "next_page_url": f"{next_page_url.path}?{next_page_url.query}" if next_page_url else None,
+            "page_title": "All Tasks",
+        },
     )
+
+@router.get("/caches", response_class=JSONResponse)
+def cache_stats():
+    """Lookups of this process's catalog and decoded goal caches since it started, to size and check them."""
+    return {
+        "catalog": {"hits": catalog_cache.hits, "misses": catalog_cache.misses},
+        "goal_json": {"hits": goal_json_cache.hits, "misses": goal_json_cache.misses},
+    }
@@ -1,10 +1,11 @@
 import json
 from fastapi import APIRouter, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from application.usecases import ListGoalsUseCase, ListPlatformsUseCase, CreateGoalUseCase, GetGoalUseCase, UpdateGoalUseCase, DeleteGoalUseCase
-from ..dependencies import get_db, get_platform_repo, get_goal_repo
+from application.usecases import ListGoalsUseCase, ListPlatformsUseCase, ListAccountsByPlatformUseCase, CreateGoalUseCase, GetGoalUseCase, UpdateGoalUseCase, DeleteGoalUseCase
+from ..dependencies import get_db, get_platform_repo, get_account_repo, get_goal_repo, get_uow
 from datetime import date
 from typing import List, Optional
 
@@ -21,12 +22,24 @@ def parse_env_vars(form_data, field_name: str) -> dict:
                 env_vars[key.strip()] = value.strip()
     return env_vars
 
+def list_platforms_with_accounts(db) -> list:
+    """Platforms with their accounts, as the goal forms need them."""
+    # Both come from the catalog cache, so the lookup per platform does not query.
+    account_repo = get_account_repo(db)
+    platforms_with_accounts = []
+    for p in ListPlatformsUseCase(get_platform_repo(db)).execute():
+        accounts = ListAccountsByPlatformUseCase(account_repo).execute(p.id)
+        platforms_with_accounts.append({
+            "id": p.id, "name": p.name,
+            "accounts": [{"id": a.id, "username": a.username} for a in accounts]
+        })
+    return platforms_with_accounts
+
 
 @router.get("/goals", response_class=HTMLResponse)
 def get_goals_page(req: Request, db: Session = Depends(get_db)):
     """Displays a list of all created goals."""
-    use_case = ListGoalsUseCase(get_goal_repo(db))
-    goals = use_case.execute()
+    goals = ListGoalsUseCase(get_goal_repo(db)).execute()
 
     return templates.TemplateResponse(
         "goals.html",
@@ -35,20 +48,7 @@ def get_goals_page(req: Request, db: Session = Depends(get_db)):
 
 @router.get("/goals/add", response_class=HTMLResponse)
 def get_add_goal_form(req: Request, db: Session = Depends(get_db)):
-    platform_repo = get_platform_repo(db)
-    platforms_with_accounts = []
-    platforms = ListPlatformsUseCase(platform_repo).execute()
-
-    # This is inefficient but simple for now.
-    # TODO: create a usecase for this?
-    from infrastructure.repositories import SQLAlchemyAccountRepository
-    acc_repo = SQLAlchemyAccountRepository(db)
-    for p in platforms:
-        accounts = acc_repo.list_by_platform(p.id)
-        platforms_with_accounts.append({
-            "id": p.id, "name": p.name,
-            "accounts": [{"id": a.id, "username": a.username} for a in accounts]
-        })
+    platforms_with_accounts = list_platforms_with_accounts(db)
 
     return templates.TemplateResponse(
         "add_goal.html",
@@ -89,8 +89,8 @@ async def handle_add_goal(req: Request, db: Session = Depends(get_db)):
         "execution_script_env_vars": env_vars
     }
 
-    use_case = CreateGoalUseCase(get_goal_repo(db))
-    use_case.execute(goal_data)
+    # the form is read on the event loop; the use case runs on the threadpool
+    await run_in_threadpool(CreateGoalUseCase(get_uow(db)).execute, goal_data)
 
     return RedirectResponse(url="/all-tasks", status_code=303)
 
@@ -98,24 +98,12 @@ async def handle_add_goal(req: Request, db: Session = Depends(get_db)):
 @router.get("/goals/{goal_id}/edit", response_class=HTMLResponse)
 def get_edit_goal_form(req: Request, goal_id: int, db: Session = Depends(get_db)):
     """Displays the form to edit an existing goal, pre-filled with its data."""
-    goal_repo = get_goal_repo(db)
-    platform_repo = get_platform_repo(db)
-
-    goal = GetGoalUseCase(goal_repo).execute(goal_id=goal_id)
+    goal = GetGoalUseCase(get_goal_repo(db)).execute(goal_id=goal_id)
     if not goal:
         return HTMLResponse("Goal not found", status_code=404)
 
     # We need the same platform/account data as the 'add' page
-    from infrastructure.repositories import SQLAlchemyAccountRepository
-    acc_repo = SQLAlchemyAccountRepository(db)
-    platforms_with_accounts = []
-    platforms = ListPlatformsUseCase(platform_repo).execute()
-    for p in platforms:
-        accounts = acc_repo.list_by_platform(p.id)
-        platforms_with_accounts.append({
-            "id": p.id, "name": p.name,
-            "accounts": [{"id": a.id, "username": a.username} for a in accounts]
-        })
+    platforms_with_accounts = list_platforms_with_accounts(db)
 
     return templates.TemplateResponse(
         "edit_goal.html",
@@ -154,15 +142,13 @@ async def handle_edit_goal(req: Request, goal_id: int, db: Session = Depends(get
         "check_script_env_vars": parse_env_vars(form_data, "check_script_env_vars"),
     }
 
-    use_case = UpdateGoalUseCase(get_goal_repo(db))
-    use_case.execute(goal_id=goal_id, data=goal_data)
+    await run_in_threadpool(UpdateGoalUseCase(get_uow(db)).execute, goal_id=goal_id, data=goal_data)
 
     return RedirectResponse(url="/goals", status_code=303)
 
 
 @router.post("/goals/{goal_id}/delete")
-def handle_delete_goal(goal_id: int, db: Session = Depends(get_db)):
+def handle_delete_goal(goal_id: int, uow=Depends(get_uow)):
     """Handles the deletion of a goal."""
-    use_case = DeleteGoalUseCase(get_goal_repo(db))
-    use_case.execute(goal_id=goal_id)
+    DeleteGoalUseCase(uow).execute(goal_id=goal_id)
     return RedirectResponse(url="/goals", status_code=303)
@@ -10,16 +10,15 @@ from application.usecases import (
     ListAccountsByPlatformUseCase,
     DeleteAccountUseCase,
 )
-from ..dependencies import get_db, get_platform_repo, get_account_repo
+from ..dependencies import get_db, get_platform_repo, get_account_repo, get_uow
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
 @router.get("/platforms", response_class=HTMLResponse)
-def get_platforms_page(req: Request, db: Session = Depends(get_db)):
-    use_case = ListPlatformsUseCase(get_platform_repo(db))
-    platforms = use_case.execute()
+def get_platforms_page(req: Request, repo=Depends(get_platform_repo)):
+    platforms = ListPlatformsUseCase(repo).execute()
     return templates.TemplateResponse(
         "platforms.html",
         {"request": req, "platforms": platforms, "page_title": "Manage Platforms"},
@@ -28,24 +27,20 @@ def get_platforms_page(req: Request, db: Session = Depends(get_db)):
 
 @router.post("/platforms/add")
 def add_platform(
-    name: str = Form(...), config: str = Form("{}"), db: Session = Depends(get_db)
+    name: str = Form(...), config: str = Form("{}"), uow=Depends(get_uow)
 ):
     try:
         config_dict = json.loads(config)
     except Exception:
         config_dict = {}
-    use_case = CreatePlatformUseCase(get_platform_repo(db))
-    use_case.execute(name=name, config=config_dict)
+    CreatePlatformUseCase(uow).execute(name=name, config=config_dict)
     return RedirectResponse(url="/platforms", status_code=303)
 
 
 @router.get("/platforms/{platform_id}/accounts", response_class=HTMLResponse)
 def get_accounts_page(req: Request, platform_id: int, db: Session = Depends(get_db)):
-    plat_repo = get_platform_repo(db)
-    acc_repo = get_account_repo(db)
-
-    platform = GetPlatformUseCase(plat_repo).execute(platform_id)
-    accounts = ListAccountsByPlatformUseCase(acc_repo).execute(platform_id)
+    platform = GetPlatformUseCase(get_platform_repo(db)).execute(platform_id)
+    accounts = ListAccountsByPlatformUseCase(get_account_repo(db)).execute(platform_id)
 
     return templates.TemplateResponse(
         "accounts.html",
@@ -63,19 +58,17 @@ def add_account(
     platform_id: int,
     username: str = Form(...),
     notes: str = Form(None),
-    db: Session = Depends(get_db),
+    uow=Depends(get_uow),
 ):
-    use_case = CreateAccountUseCase(get_account_repo(db))
-    use_case.execute(platform_id=platform_id, username=username, notes=notes)
+    CreateAccountUseCase(uow).execute(platform_id=platform_id, username=username, notes=notes)
     return RedirectResponse(url=f"/platforms/{platform_id}/accounts", status_code=303)
 
 
 @router.post("/accounts/{account_id}/delete")
 def delete_account(
-    account_id: int, platform_id: int = Form(...), db: Session = Depends(get_db)
+    account_id: int, platform_id: int = Form(...), uow=Depends(get_uow)
 ):
-    use_case = DeleteAccountUseCase(get_account_repo(db))
-    use_case.execute(account_id=account_id)
+    DeleteAccountUseCase(uow).execute(account_id=account_id)
     return RedirectResponse(url=f"/platforms/{platform_id}/accounts", status_code=303)
 
 
@@ -84,9 +77,8 @@ import json
 
 
 @router.get("/platforms/{platform_id}/edit", response_class=HTMLResponse)
-def edit_platform_page(req: Request, platform_id: int, db: Session = Depends(get_db)):
-    plat_repo = get_platform_repo(db)
-    platform = GetPlatformUseCase(plat_repo).execute(platform_id)
+def edit_platform_page(req: Request, platform_id: int, repo=Depends(get_platform_repo)):
+    platform = GetPlatformUseCase(repo).execute(platform_id)
     return templates.TemplateResponse(
         "edit_platform.html",
         {
@@ -102,12 +94,11 @@ def edit_platform(
     platform_id: int,
     name: str = Form(...),
     config: str = Form("{}"),
-    db: Session = Depends(get_db),
+    uow=Depends(get_uow),
 ):
-    plat_repo = get_platform_repo(db)
     try:
         config_dict = json.loads(config)
     except Exception:
         config_dict = {}
-    UpdatePlatformUseCase(plat_repo).execute(platform_id, name, config_dict)
+    UpdatePlatformUseCase(uow).execute(platform_id, name, config_dict)
     return RedirectResponse(url="/platforms", status_code=303)
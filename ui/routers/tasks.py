@@ -1,42 +1,51 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, Form, Request
-from fastapi.responses import RedirectResponse, HTMLResponse
+import asyncio
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from fastapi.templating import Jinja2Templates
 from application.usecases import (
     ProcessTaskCompletionUseCase, StartTaskUseCase, FailTaskUseCase, ListTaskLogsUseCase,
-    RunExecutionScriptUseCase, RunCheckScriptUseCase, SkipTaskUseCase
+    RunExecutionScriptUseCase, RunCheckScriptUseCase, SkipTaskUseCase, BulkTransitionTasksUseCase,
+    GetScriptOutputUseCase, EnqueueScriptJobUseCase, GetScriptJobUseCase, GetScriptJobOutputUseCase,
+    ListScriptJobsUseCase, QueueFull
 )
-from infrastructure.database import SessionLocal
+from infrastructure.database import SessionLocal, get_db
 from domain.states import InvalidTransition
+from settings import JOB_MAX_ATTEMPTS, JOB_QUEUE_MAX_DEPTH, JOB_RETRY_BASE_SECONDS, SCRIPT_LIVE_FLUSH_SECONDS
 from application.usecases import SkipTaskUseCase
 
-from ..dependencies import get_db, get_task_repo, get_task_log_repo, get_goal_repo, get_account_repo, get_platform_repo
+from ..dependencies import (
+    get_task_repo, get_task_log_repo, get_script_output_repo, get_script_job_repo, get_uow
+)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+def enqueue_script_job(db: Session, task_id: int, kind: str, priority: int):
+    """Queues the run for the workers (python -m infrastructure.worker); 429 while the queue is full."""
+    try:
+        return EnqueueScriptJobUseCase(
+            get_uow(db), max_depth=JOB_QUEUE_MAX_DEPTH, max_attempts=JOB_MAX_ATTEMPTS
+        ).execute(task_id, kind, priority=priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(JOB_RETRY_BASE_SECONDS)})
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.post("/tasks/{task_id}/run-execution")
-def run_task_execution_script(task_id: int, background_tasks: BackgroundTasks, redirect_url: str = Form("/all-tasks")):
+def run_task_execution_script(task_id: int, redirect_url: str = Form("/all-tasks"), priority: int = Form(0),
+                              db: Session = Depends(get_db)):
     """
-    Schedules the script to run in the background with its own DB session.
+    Queues the execution script of the task. A worker runs it, so the run survives a restart
+    of the web server and scripts can run on other machines.
     """
-    def run_script_and_update_db(task_id: int):
-        """will be executed in the background"""
-        db = SessionLocal()
-        try:
-            task_repo = get_task_repo(db)
-            goal_repo = get_goal_repo(db)
-            log_repo = get_task_log_repo(db)
-            account_repo = get_account_repo(db)
-            platform_repo = get_platform_repo(db)
-            use_case = RunExecutionScriptUseCase(task_repo, goal_repo, log_repo, account_repo, platform_repo)
-            use_case.execute(task_id=task_id)
-        finally:
-            db.close()
-
-    background_tasks.add_task(run_script_and_update_db, task_id)
-
+    enqueue_script_job(db, task_id, "execution", priority)
     return RedirectResponse(url=redirect_url, status_code=303)
+
 @router.post("/tasks/generate-due")
 def generate_due_tasks(background_tasks: BackgroundTasks, redirect_url: str = Form("/all-tasks")):
     from application.usecases import GenerateDueTasksUseCase
@@ -44,11 +53,8 @@ def generate_due_tasks(background_tasks: BackgroundTasks, redirect_url: str = Fo
     def run_generation():
         db = SessionLocal()
         try:
-            task_repo = get_task_repo(db)
-            goal_repo = get_goal_repo(db)
-            account_repo = get_account_repo(db)
-            use_case = GenerateDueTasksUseCase(goal_repo, task_repo, account_repo)
-            use_case.execute()
+            use_case = GenerateDueTasksUseCase(get_uow(db))
+            use_case.execute(batch=True)
         finally:
             db.close()
 
@@ -56,65 +62,140 @@ def generate_due_tasks(background_tasks: BackgroundTasks, redirect_url: str = Fo
     return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/tasks/{task_id}/run-check")
-def run_task_check_script(task_id: int, background_tasks: BackgroundTasks, redirect_url: str = Form("/all-tasks")):
-    def run_check_and_update_db(task_id: int):
-        db = SessionLocal()
-        try:
-            task_repo = get_task_repo(db)
-            goal_repo = get_goal_repo(db)
-            log_repo = get_task_log_repo(db)
-            account_repo = get_account_repo(db)
-            platform_repo = get_platform_repo(db)
-            use_case = RunCheckScriptUseCase(task_repo, goal_repo, log_repo, account_repo, platform_repo)
-            use_case.execute(task_id=task_id)
-        finally:
-            db.close()
-
-    background_tasks.add_task(run_check_and_update_db, task_id)
+def run_task_check_script(task_id: int, redirect_url: str = Form("/all-tasks"), priority: int = Form(0),
+                          db: Session = Depends(get_db)):
+    enqueue_script_job(db, task_id, "check", priority)
     return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/tasks/{task_id}/skip")
-def skip_task(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), db: Session = Depends(get_db)):
+def skip_task(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), uow=Depends(get_uow)):
     """Endpoint to handle skipping a task."""
-    use_case = SkipTaskUseCase(get_task_repo(db), get_task_log_repo(db))
     try:
-        use_case.execute(task_id, notes=notes)
+        SkipTaskUseCase(uow).execute(task_id, notes=notes)
     except InvalidTransition as e:
         print(f"Could not skip task {task_id}: {e}")
     return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/tasks/{task_id}/complete")
-def mark_task_complete(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), db: Session = Depends(get_db)):
-    task_repo = get_task_repo(db)
-    log_repo = get_task_log_repo(db)
-    goal_repo = get_goal_repo(db)
-    use_case = ProcessTaskCompletionUseCase(task_repo, log_repo, goal_repo)
-    use_case.execute(task_id, notes=notes)
+def mark_task_complete(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), uow=Depends(get_uow)):
+    try:
+        ProcessTaskCompletionUseCase(uow).execute(task_id, notes=notes)
+    except InvalidTransition as e:
+        print(f"Could not complete task {task_id}: {e}")
     return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/tasks/{task_id}/start")
-def start_task(task_id: int, redirect_url: str = Form("/all-tasks"), db: Session = Depends(get_db)):
-    task_repo = get_task_repo(db)
-    log_repo = get_task_log_repo(db)
-    use_case = StartTaskUseCase(task_repo, log_repo)
-    use_case.execute(task_id)
+def start_task(task_id: int, redirect_url: str = Form("/all-tasks"), uow=Depends(get_uow)):
+    try:
+        StartTaskUseCase(uow).execute(task_id)
+    except InvalidTransition as e:
+        print(f"Could not start task {task_id}: {e}")
     return RedirectResponse(url=redirect_url, status_code=303)
 
 @router.post("/tasks/{task_id}/fail")
-def fail_task(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), db: Session = Depends(get_db)):
-    task_repo = get_task_repo(db)
-    log_repo = get_task_log_repo(db)
-    use_case = FailTaskUseCase(task_repo, log_repo)
-    use_case.execute(task_id, notes=notes)
+def fail_task(task_id: int, redirect_url: str = Form("/all-tasks"), notes: str = Form(None), uow=Depends(get_uow)):
+    try:
+        FailTaskUseCase(uow).execute(task_id, notes=notes)
+    except InvalidTransition as e:
+        print(f"Could not fail task {task_id}: {e}")
     return RedirectResponse(url=redirect_url, status_code=303)
 
+class BulkTaskAction(BaseModel):
+    task_ids: List[int] = Field(min_length=1, max_length=500)
+    action: Literal["start", "complete", "skip", "fail"]
+    notes: Optional[str] = None
+
+@router.post("/tasks/bulk", response_class=JSONResponse)
+def bulk_task_action(body: BulkTaskAction, uow=Depends(get_uow)):
+    """Applies one transition to many tasks in one transaction, and returns the outcome of each task."""
+    results = BulkTransitionTasksUseCase(uow).execute(body.task_ids, body.action, notes=body.notes)
+    return {"results": [result._asdict() for result in results]}
+
 @router.get("/tasks/{task_id}/logs", response_class=HTMLResponse)
 def get_task_logs(request: Request, task_id: int, db: Session = Depends(get_db)):
-    task_repo = get_task_repo(db)
-    log_repo = get_task_log_repo(db)
-    use_case = ListTaskLogsUseCase(log_repo, task_repo)
-    data = use_case.execute(task_id)
+    data = ListTaskLogsUseCase(get_task_log_repo(db), get_task_repo(db)).execute(task_id)
+    jobs = ListScriptJobsUseCase(get_script_job_repo(db)).execute(task_id)
     return templates.TemplateResponse(
         "task_logs.html",
-        {"request": request, "task": data["task"], "logs": data["logs"], "page_title": f"History for Task #{task_id}"}
-    )
\ No newline at end of file
+        {"request": request, "task": data["task"], "logs": data["logs"], "archived": data["archived"],
+         "jobs": jobs, "page_title": f"History for Task #{task_id}"}
+    )
+
+@router.get("/script-outputs/{output_id}", response_class=JSONResponse)
+def get_script_output(output_id: int, offset: int = Query(0, ge=0), limit: int = Query(65536, ge=1, le=1_000_000),
+                      repo=Depends(get_script_output_repo)):
+    """A range of the stored output of a script run; the log page fetches long outputs in pieces."""
+    try:
+        output = GetScriptOutputUseCase(repo).execute(output_id, offset=offset, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Script output not found")
+    return output._asdict()
+
+@router.get("/jobs/{job_id}", response_class=JSONResponse)
+def get_script_job(job_id: int, repo=Depends(get_script_job_repo)):
+    """Where a queued script run stands: queued, running, done or dead, with its attempts and last error."""
+    try:
+        job = GetScriptJobUseCase(repo).execute(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Script job not found")
+    return job._asdict()
+
+def read_job_output(job_id: int):
+    # a session per read: a stream stays open for as long as the script runs
+    db = SessionLocal()
+    try:
+        return GetScriptJobOutputUseCase(get_script_job_repo(db)).execute(job_id)
+    finally:
+        db.close()
+
+def server_event(event: str, data, event_id: Optional[str] = None) -> str:
+    return (f"id: {event_id}\n" if event_id else "") + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_script_job(request: Request, job_id: int):
+    """
+    Server-Sent Events tailing the output of a queued or running job, for the task history page.
+    A "line" event per line printed, its id "<attempt>-<line number>" so a reconnecting
+    EventSource resumes where it was, an "attempt" event when a new attempt starts over, and an
+    "end" event with the job's status once it is done or dead. Lines come as the worker writes
+    them (every SCRIPT_LIVE_FLUSH_SECONDS); lines that scrolled out of its buffer in between are
+    skipped, and the stored output in the task log has the whole run. A job that disappears
+    while it is tailed (its task was deleted or archived) ends with the status "gone".
+    """
+    try:
+        output = await run_in_threadpool(read_job_output, job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Script job not found")
+
+    attempt, sent = output.attempts, 0
+    last_event_id = request.headers.get("last-event-id", "")
+    if "-" in last_event_id:
+        resumed_attempt, _, resumed_line = last_event_id.partition("-")
+        if resumed_attempt.isdigit() and resumed_line.isdigit():
+            attempt, sent = int(resumed_attempt), int(resumed_line)
+
+    async def events():
+        nonlocal output, attempt, sent
+        while True:
+            if output.attempts != attempt:
+                attempt, sent = output.attempts, 0
+                yield server_event("attempt", attempt)
+            for number, (stream, line) in enumerate(output.lines, start=output.first_line + 1):
+                if number > sent:
+                    yield server_event("line", {"stream": stream, "line": line}, f"{attempt}-{number}")
+            sent = max(sent, output.first_line + len(output.lines))
+            if output.status not in ("queued", "running"):
+                yield server_event("end", output.status)
+                return
+            yield ": waiting\n\n"  # a comment, so a closed connection is noticed
+            await asyncio.sleep(SCRIPT_LIVE_FLUSH_SECONDS)
+            if await request.is_disconnected():
+                return
+            try:
+                output = await run_in_threadpool(read_job_output, job_id)
+            except ValueError:
+                yield server_event("end", "gone")
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})